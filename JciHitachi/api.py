@@ -1,8 +1,17 @@
 from __future__ import annotations
+import asyncio
+import datetime
+import json
+import os
 import random
+import tempfile
+import threading
 import time
 import warnings
-from typing import Optional, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Optional, Union
+
+import awscrt
 
 from . import aws_connection, connection, mqtt_connection
 from .model import (
@@ -637,6 +646,7 @@ class AWSThing:
         self._available: bool = True
         self._shadow: Optional[dict] = None
         self._status_code: Optional[JciHitachiAWSStatus] = None
+        self._status_updated_at: Optional[float] = None
         self._support_code: Optional[JciHitachiAWSStatusSupport] = None
         self._monthly_data: Optional[list[dict]] = None
 
@@ -826,6 +836,22 @@ class AWSThing:
     def status_code(self, x: JciHitachiAWSStatus) -> None:
         self._status_code = x
 
+    @property
+    def status_updated_at(self) -> Optional[float]:
+        """Time when the thing's status code was last received from the device.
+
+        Returns
+        -------
+        float or None
+            Value of `time.monotonic()`, or None if no status code has been received yet.
+        """
+
+        return self._status_updated_at
+
+    @status_updated_at.setter
+    def status_updated_at(self, x: Optional[float]) -> None:
+        self._status_updated_at = x
+
     @property
     def support_code(self) -> Optional[JciHitachiAWSStatusSupport]:
         """Thing's support code reported by the API.
@@ -876,6 +902,90 @@ class AWSThing:
         return self.supported_device_type.get(self._json["DeviceType"], "unknown")
 
 
+class MonthlyDataCache:
+    """Cache of monthly data (power consumption) of closed months by thing name.
+
+    Data of a month no longer changes once the month is over and the server has
+    aggregated it, so such months are fetched only once. Months are keyed by "YYYY-MM"
+    in the time zone they were refreshed with.
+
+    Parameters
+    ----------
+    path : str, optional
+        JSON file path persisting the cache across restarts.
+        If None is given, the cache is kept in memory, by default None.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._path: Optional[str] = path
+        self._lock: threading.Lock = threading.Lock()
+        self._data: dict[str, dict[str, list[dict]]] = self._read()
+
+    def _read(self) -> dict:
+        if self._path is None:
+            return {}
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+            raise ValueError("not a JSON object")
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            aws_connection._LOGGER.warning(
+                f"Monthly data cache {self._path} cannot be read: {e}"
+            )
+            return {}
+
+    def _write(self) -> None:
+        if self._path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self._path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".monthly-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, thing_name: str) -> dict[str, list[dict]]:
+        """Get cached months of a thing.
+
+        Parameters
+        ----------
+        thing_name : str
+            Thing name.
+
+        Returns
+        -------
+        dict
+            Monthly data by "YYYY-MM".
+        """
+
+        with self._lock:
+            return dict(self._data.get(thing_name, {}))
+
+    def update(self, thing_name: str, months: dict[str, list[dict]]) -> None:
+        """Add closed months of a thing.
+
+        Parameters
+        ----------
+        thing_name : str
+            Thing name.
+        months : dict
+            Monthly data by "YYYY-MM". Months without data should be given as empty lists.
+        """
+
+        if not months:
+            return
+        with self._lock:
+            self._data.setdefault(thing_name, {}).update(months)
+            self._write()
+
+
 class JciHitachiAWSAPI:
     """Jci-Hitachi API.
 
@@ -893,6 +1003,33 @@ class JciHitachiAWSAPI:
         For future use.
     print_response : bool, optional
         If set, all responses of httpx and MQTT will be printed, by default False.
+    http_session : JciHitachiAWSHttpSession, optional
+        Pooled HTTP session shared by all AWS http connections.
+        If None is given, a new session is created and owned by this instance, by default None.
+    token_store : AWSTokenStore, optional
+        Store persisting AWS tokens and identity across restarts.
+        If given, login reuses a still valid id token or renews it with the refresh token
+        instead of signing in with email and password, by default None.
+    retry_policy : JciHitachiAWSRetryPolicy, optional
+        Retry, backoff and circuit breaker policy of AWS http requests.
+        If None is given, a JciHitachiAWSRetryPolicy with default settings is used, by default None.
+    monthly_data_cache : MonthlyDataCache, optional
+        Cache of closed months used by `refresh_monthly_data_all`.
+        If None is given, an in-memory cache is used, by default None.
+    rate_limiter : JciHitachiAWSRateLimiter, optional
+        Rate limiter pacing MQTT publishes.
+        If None is given, publishes are not limited, by default None.
+    crt_resources : JciHitachiAWSCrtResources, optional
+        Native event loop group and bootstrap used by MQTT.
+        If None is given, the process-wide resources are shared, by default None.
+    mqtt5_options : JciHitachiAWSMqtt5Options, optional
+        If given, MQTT5 is used as the transport with these options instead of MQTT 3.1.1, by default None.
+    message_queue : JciHitachiAWSMessageQueue, optional
+        Queue of received MQTT messages shared with other instances.
+        If None is given, the MQTT connection has its own queue, by default None.
+    event_loop : JciHitachiAWSEventLoop, optional
+        Event loop executing MQTT commands shared with other instances.
+        If None is given, the MQTT connection runs its own loop thread, by default None.
     """
 
     def __init__(
@@ -903,6 +1040,15 @@ class JciHitachiAWSAPI:
         max_retries: int = 5,
         device_offline_timeout: float = 10.0,
         print_response: bool = False,
+        http_session: Optional[aws_connection.JciHitachiAWSHttpSession] = None,
+        token_store: Optional[aws_connection.AWSTokenStore] = None,
+        retry_policy: Optional[aws_connection.JciHitachiAWSRetryPolicy] = None,
+        monthly_data_cache: Optional[MonthlyDataCache] = None,
+        rate_limiter: Optional[aws_connection.JciHitachiAWSRateLimiter] = None,
+        crt_resources: Optional[aws_connection.JciHitachiAWSCrtResources] = None,
+        mqtt5_options: Optional[aws_connection.JciHitachiAWSMqtt5Options] = None,
+        message_queue: Optional[aws_connection.JciHitachiAWSMessageQueue] = None,
+        event_loop: Optional[aws_connection.JciHitachiAWSEventLoop] = None,
     ) -> None:
         self.email: str = email
         self.password: str = password
@@ -915,9 +1061,65 @@ class JciHitachiAWSAPI:
         self._shadow_names: Union[str, list] = ["info"]
         self._device_id: int = random.randint(1000, 6999)
         self._things: dict[str, AWSThing] = {}
-        self._aws_tokens: Optional[aws_connection.AWSTokens] = None
         self._aws_identity: Optional[aws_connection.AWSIdentity] = None
         self._task_id: int = 0
+        self._owns_http_session: bool = http_session is None
+        self._http_session: aws_connection.JciHitachiAWSHttpSession = (
+            http_session or aws_connection.JciHitachiAWSHttpSession()
+        )
+        self._token_store: Optional[aws_connection.AWSTokenStore] = token_store
+        self._retry_policy: aws_connection.JciHitachiAWSRetryPolicy = (
+            retry_policy or aws_connection.JciHitachiAWSRetryPolicy()
+        )
+        self._monthly_data_cache: MonthlyDataCache = (
+            monthly_data_cache or MonthlyDataCache()
+        )
+        self._rate_limiter: aws_connection.JciHitachiAWSRateLimiter = (
+            rate_limiter or aws_connection.JciHitachiAWSRateLimiter()
+        )
+        self._crt_resources: Optional[aws_connection.JciHitachiAWSCrtResources] = (
+            crt_resources
+        )
+        self._mqtt5_options: Optional[aws_connection.JciHitachiAWSMqtt5Options] = (
+            mqtt5_options
+        )
+        self._message_queue: Optional[aws_connection.JciHitachiAWSMessageQueue] = (
+            message_queue
+        )
+        self._event_loop: Optional[aws_connection.JciHitachiAWSEventLoop] = event_loop
+        self._status_callbacks: list[Callable[[str, JciHitachiAWSStatus], None]] = []
+        self._status_callbacks_lock: threading.Lock = threading.Lock()
+        self._mqtt_error_lock: threading.Lock = threading.Lock()
+        self._refresh_flights: aws_connection.JciHitachiSingleFlight = (
+            aws_connection.JciHitachiSingleFlight()
+        )
+        self._single_flight: aws_connection.JciHitachiSingleFlight = (
+            aws_connection.JciHitachiSingleFlight()
+        )
+        self._token_manager: aws_connection.JciHitachiAWSTokenManager = (
+            aws_connection.JciHitachiAWSTokenManager(
+                email,
+                password,
+                on_renewed=lambda aws_tokens: self._store_tokens(),
+                print_response=print_response,
+                session=self._http_session,
+                single_flight=self._single_flight,
+                retry_policy=self._retry_policy,
+            )
+        )
+        self._credentials_cache: aws_connection.JciHitachiAWSCredentialsCache = (
+            aws_connection.JciHitachiAWSCredentialsCache(
+                self._fetch_credentials, single_flight=self._single_flight
+            )
+        )
+
+    @property
+    def _aws_tokens(self) -> Optional[aws_connection.AWSTokens]:
+        return self._token_manager.aws_tokens
+
+    @_aws_tokens.setter
+    def _aws_tokens(self, x: Optional[aws_connection.AWSTokens]) -> None:
+        self._token_manager.aws_tokens = x
 
     @property
     def things(self) -> dict[str, AWSThing]:
@@ -948,16 +1150,37 @@ class JciHitachiAWSAPI:
         return self._task_id
 
     def _check_before_publish(self) -> None:
-        # Reauthenticate 5 mins before AWSTokens expiration.
-        current_time = time.time()
-        if self._aws_tokens is None or (
-            self._aws_tokens.expiration - current_time <= 300
-        ):
-            self.reauth()
-
-        if self._mqtt.mqtt_events.mqtt_error_event.is_set():
-            self._mqtt.mqtt_events.mqtt_error_event.clear()
-            self.reauth()
+        # Tokens are renewed in the background before expiration,
+        # so this only renews them if that has not happened in time.
+        self._token_manager.ensure_valid()
+
+        # Only the caller clearing the error reauthenticates.
+        with self._mqtt_error_lock:
+            mqtt_error_event = self._mqtt.mqtt_events.mqtt_error_event
+            if not mqtt_error_event.is_set():
+                return
+            mqtt_error_event.clear()
+        self._credentials_cache.invalidate()
+        self.reauth()
+
+    def _fetch_credentials(
+        self, aws_identity: aws_connection.AWSIdentity
+    ) -> Optional[awscrt.auth.AwsCredentials]:
+        self._check_before_publish()
+        conn = aws_connection.GetCredentials(
+            email=self.email,
+            password=self.password,
+            aws_tokens=self._aws_tokens,
+            print_response=self.print_response,
+            session=self._http_session,
+            retry_policy=self._retry_policy,
+        )
+        conn_status, aws_credentials = conn.get_data(aws_identity)
+        if conn_status != "OK":
+            aws_connection._LOGGER.error(
+                f"An error occurred when acquiring a new AwsCredentials: {conn_status}"
+            )
+        return aws_credentials
 
     def _get_valid_things(
         self, device_name: Optional[str] = None
@@ -967,64 +1190,132 @@ class JciHitachiAWSAPI:
                 continue
             yield name, thing
 
+    def _get_stale_things(
+        self, device_name: Optional[str] = None, max_age: Optional[float] = None
+    ) -> list[tuple[str, AWSThing]]:
+        now = time.monotonic()
+        return [
+            (name, thing)
+            for name, thing in self._get_valid_things(device_name)
+            if max_age is None
+            or thing.status_updated_at is None
+            or now - thing.status_updated_at > max_age
+        ]
+
     def _delay(self) -> None:
         time.sleep(0.2)
 
-    def login(self) -> None:
+    def _load_stored_tokens(
+        self,
+    ) -> tuple[
+        Optional[aws_connection.AWSTokens], Optional[aws_connection.AWSIdentity]
+    ]:
+        aws_tokens, aws_identity = self._read_stored_tokens()
+        if aws_tokens is None:
+            return None, None
+
+        # Renew stored tokens with the refresh token if they expire within 5 mins.
+        if aws_tokens.expiration - time.time() <= 300:
+            conn = aws_connection.JciHitachiAWSCognitoConnection(
+                email=self.email,
+                password=self.password,
+                aws_tokens=aws_tokens,
+                print_response=self.print_response,
+                session=self._http_session,
+                retry_policy=self._retry_policy,
+            )
+            aws_tokens = self._renewed_stored_tokens(
+                *conn.login(use_refresh_token=True)
+            )
+            if aws_tokens is None:
+                return None, None
+
+        return aws_tokens, aws_identity
+
+    def _read_stored_tokens(
+        self,
+    ) -> tuple[
+        Optional[aws_connection.AWSTokens], Optional[aws_connection.AWSIdentity]
+    ]:
+        if self._token_store is None:
+            return None, None
+        return self._token_store.load(self.email)
+
+    def _renewed_stored_tokens(
+        self, conn_status: str, aws_tokens: Optional[aws_connection.AWSTokens]
+    ) -> Optional[aws_connection.AWSTokens]:
+        if conn_status == "OK":
+            return aws_tokens
+        aws_connection._LOGGER.info(
+            f"Stored tokens cannot be refreshed, signing in with password: {conn_status}"
+        )
+        if self._is_auth_error(conn_status):
+            self._token_store.clear(self.email)
+        return None
+
+    @staticmethod
+    def _is_auth_error(conn_status: str) -> bool:
+        # Only rejected tokens are discarded; other failures may be transient.
+        return aws_connection.JciHitachiAWSCognitoConnection.is_auth_error(conn_status)
+
+    def _store_tokens(self) -> None:
+        if self._token_store is not None and self._aws_tokens is not None:
+            self._token_store.save(self.email, self._aws_tokens, self._aws_identity)
+
+    def login(self, use_token_store: bool = True) -> None:
         """Login API.
 
+        Parameters
+        ----------
+        use_token_store : bool, optional
+            Whether or not to reuse tokens from the token store if given, by default True.
+
         Raises
         ------
         RuntimeError
             If a login error occurs, RuntimeError will be raised.
         """
 
+        aws_tokens, aws_identity = (
+            self._load_stored_tokens() if use_token_store else (None, None)
+        )
+
+        # GetUser signs in with email and password if aws_tokens is None.
         conn = aws_connection.GetUser(
             email=self.email,
             password=self.password,
+            aws_tokens=aws_tokens,
             print_response=self.print_response,
+            session=self._http_session,
+            retry_policy=self._retry_policy,
         )
         self._aws_tokens = conn.aws_tokens
-        conn_status, self._aws_identity = conn.get_data()
+        if aws_identity is None:
+            conn_status, self._aws_identity = conn.get_data()
+        else:
+            self._aws_identity = aws_identity
+        self._store_tokens()
 
         conn = aws_connection.GetAllDevice(
-            self._aws_tokens, print_response=self.print_response
+            self._aws_tokens,
+            print_response=self.print_response,
+            session=self._http_session,
+            retry_policy=self._retry_policy,
+            token_refresher=self._token_manager.renew,
         )
         conn_status, conn_json = conn.get_data()
 
-        if conn_status == "OK":
-            # things
-            self._things = AWSThing.from_device_names(conn_json, self.device_names)
-            self.device_names = list(self._things.keys())
-            thing_names = [value.thing_name for value in self._things.values()]
-
-            # mqtt
-            def get_credential_callable():
-                self._check_before_publish()
-                conn = aws_connection.GetCredentials(
-                    email=self.email,
-                    password=self.password,
-                    aws_tokens=self._aws_tokens,
-                    print_response=self.print_response,
-                )
-                conn_status, aws_credentials = conn.get_data(self._aws_identity)
-                if conn_status != "OK":
-                    aws_connection._LOGGER.error(
-                        f"An error occurred when acquiring a new AwsCredentials: {conn_status}"
-                    )
-                return aws_credentials
-
-            self._mqtt = aws_connection.JciHitachiAWSMqttConnection(
-                get_credential_callable, print_response=self.print_response
-            )
-            self._mqtt.configure(self._aws_identity.identity_id)
+        if (
+            conn_status != "OK"
+            and aws_tokens is not None
+            and self._is_auth_error(conn_status)
+        ):
+            # Stored tokens might have been revoked.
+            self._token_store.clear(self.email)
+            return self.login(use_token_store=False)
 
-            if not self._mqtt.connect(
-                self._aws_identity.host_identity_id, self._shadow_names, thing_names
-            ):
-                raise RuntimeError(
-                    "An error occurred when connecting to MQTT endpoint."
-                )
+        if conn_status == "OK":
+            self._connect(conn_json)
 
             # status
             self.refresh_status(refresh_support_code=True, refresh_shadow=True)
@@ -1033,25 +1324,145 @@ class JciHitachiAWSAPI:
                 f"An error occurred when retrieving devices info: {conn_status}"
             )
 
+    def _connect(self, devices_json: dict) -> None:
+        thing_names = self._configure_mqtt(devices_json)
+
+        if not self._mqtt.connect(
+            self._aws_identity.host_identity_id, self._shadow_names, thing_names
+        ):
+            raise RuntimeError("An error occurred when connecting to MQTT endpoint.")
+
+        self._token_manager.start()
+
+    def _configure_mqtt(self, devices_json: dict) -> list[str]:
+        # things
+        self._things = AWSThing.from_device_names(devices_json, self.device_names)
+        self.device_names = list(self._things.keys())
+        thing_names = [value.thing_name for value in self._things.values()]
+
+        # mqtt
+        def get_credential_callable():
+            return self._credentials_cache.get(self._aws_identity)
+
+        self._mqtt = aws_connection.JciHitachiAWSMqttConnection(
+            get_credential_callable,
+            print_response=self.print_response,
+            rate_limiter=self._rate_limiter,
+            crt_resources=self._crt_resources,
+            mqtt5_options=self._mqtt5_options,
+            message_queue=self._message_queue,
+            event_loop=self._event_loop,
+        )
+        self._mqtt.configure(self._aws_identity.identity_id)
+        self._mqtt.add_status_listener(self._on_status_update)
+        return thing_names
+
+    def _on_status_update(self, thing_name: str, status: JciHitachiAWSStatus) -> None:
+        for name, thing in self._get_valid_things():
+            if thing.thing_name != thing_name:
+                continue
+            thing.status_code = status
+            thing.status_updated_at = time.monotonic()
+
+            with self._status_callbacks_lock:
+                callbacks = list(self._status_callbacks)
+            for callback in callbacks:
+                try:
+                    callback(name, status)
+                except Exception as e:
+                    aws_connection._LOGGER.error(
+                        f"A status callback raised an exception: {e}"
+                    )
+
+    def subscribe_status(
+        self, callback: Callable[[str, JciHitachiAWSStatus], None]
+    ) -> Callable[[], None]:
+        """Subscribe to status updates pushed by the API.
+
+        The callback is called with every status received, including replies to
+        requests from other clients such as the official app. The thing's status code
+        is updated before the callback is called. Callbacks are called on an MQTT thread,
+        so they should return quickly.
+
+        Parameters
+        ----------
+        callback : Callable
+            Callable which takes a device name and its JciHitachiAWSStatus.
+
+        Returns
+        -------
+        Callable
+            Callable which takes no arguments and unsubscribes.
+        """
+
+        with self._status_callbacks_lock:
+            self._status_callbacks.append(callback)
+
+        def unsubscribe():
+            with self._status_callbacks_lock:
+                if callback in self._status_callbacks:
+                    self._status_callbacks.remove(callback)
+
+        return unsubscribe
+
+    async def status_updates(
+        self, max_queue: int = 100
+    ) -> AsyncIterator[tuple[str, JciHitachiAWSStatus]]:
+        """Iterate over status updates pushed by the API. See `subscribe_status`.
+
+        Parameters
+        ----------
+        max_queue : int, optional
+            Maximum number of updates buffered while the consumer is busy.
+            The oldest update is dropped when it is full, by default 100.
+
+        Yields
+        ------
+        (str, JciHitachiAWSStatus)
+            Device name and its status.
+        """
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(max_queue)
+
+        def put(item):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(item)
+
+        unsubscribe = self.subscribe_status(
+            lambda name, status: loop.call_soon_threadsafe(put, (name, status))
+        )
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            unsubscribe()
+
     def logout(self) -> None:
         """Logout API."""
 
+        self._disconnect()
+        if self._owns_http_session:
+            self._http_session.close()
+
+    def _disconnect(self) -> None:
+        self._token_manager.stop()
+        self._credentials_cache.close()
         self._mqtt.disconnect()
 
     def reauth(self) -> None:
-        """Reauthenticate with AWS Cognito Service."""
+        """Reauthenticate with AWS Cognito Service.
 
-        conn = aws_connection.JciHitachiAWSCognitoConnection(
-            email=self.email,
-            password=self.password,
-            aws_tokens=self._aws_tokens,
-            print_response=self.print_response,
-        )
-        conn_status, self._aws_tokens = conn.login(use_refresh_token=False)
-        if conn_status != "OK":
-            raise RuntimeError(
-                f"An error occurred when reauthenticating with AWS Cognito Service: {conn_status}"
-            )
+        The refresh token is used if available; password authentication is only used if it is rejected.
+
+        Raises
+        ------
+        RuntimeError
+            If an error occurs, RuntimeError will be raised.
+        """
+
+        self._token_manager.renew()
 
     def change_password(self, new_password: str) -> None:
         """Change password.
@@ -1078,6 +1489,8 @@ class JciHitachiAWSAPI:
             self.password,
             aws_tokens=self._aws_tokens,
             print_response=self.print_response,
+            session=self._http_session,
+            retry_policy=self._retry_policy,
         )
         aws_conn_status, _ = conn.get_data(new_password)
         if aws_conn_status != "OK":
@@ -1111,36 +1524,188 @@ class JciHitachiAWSAPI:
         """
 
         thing = self._things[device_name]
-        current_timestamp_millis = time.time() * 1000
-
-        conn = aws_connection.GetAvailableAggregationMonthlyData(
-            self._aws_tokens, print_response=self.print_response
+        thing.monthly_data = sorted(
+            self._get_monthly_data(thing.thing_name, *self._monthly_range(months)),
+            key=lambda x: x["Timestamp"],
         )
 
-        conn_status, response = conn.get_data(
-            thing.thing_name,
+    @staticmethod
+    def _monthly_range(months: int) -> tuple[int, int]:
+        current_timestamp_millis = time.time() * 1000
+        return (
             int(
                 current_timestamp_millis - months * 2678400000
             ),  # 2678400000 ms == 31 days
             int(current_timestamp_millis),
         )
+
+    def _get_monthly_data(
+        self, thing_name: str, start_timestamp: int, end_timestamp: int
+    ) -> list[dict]:
+        conn = aws_connection.GetAvailableAggregationMonthlyData(
+            self._aws_tokens,
+            print_response=self.print_response,
+            session=self._http_session,
+            retry_policy=self._retry_policy,
+            token_refresher=self._token_manager.renew,
+        )
+
+        conn_status, response = conn.get_data(
+            thing_name, start_timestamp, end_timestamp
+        )
+        return self._monthly_data_result(conn_status, response)
+
+    @staticmethod
+    def _monthly_data_result(conn_status: str, response: dict) -> list[dict]:
         if conn_status != "OK":
             raise RuntimeError(
                 f"An error occurred when getting monthly data: {conn_status}"
             )
+        return response["results"]["Data"]
+
+    @staticmethod
+    def _month_key(timestamp_millis: int, tz: datetime.tzinfo) -> str:
+        return datetime.datetime.fromtimestamp(timestamp_millis / 1000, tz=tz).strftime(
+            "%Y-%m"
+        )
+
+    def _refresh_cached_monthly_data(
+        self,
+        thing: AWSThing,
+        months: int,
+        now: datetime.datetime,
+        grace_period: float = 259200.0,
+    ) -> None:
+        # Calendar months from the oldest requested one to the current one, in the time zone of now.
+        # A naive now is in local time, whose offset is looked up at each date instead of being fixed.
+        month_starts = []
+        year, month = now.year, now.month
+        for _ in range(months):
+            month_starts.insert(0, datetime.datetime(year, month, 1, tzinfo=now.tzinfo))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        month_ends = month_starts[1:] + [None]
+        month_keys = [start.strftime("%Y-%m") for start in month_starts]
+        # Closed months may still be aggregated by the server for a while after they are over.
+        final_keys = [
+            key
+            for key, end in zip(month_keys, month_ends)
+            if end is not None and now.timestamp() - end.timestamp() >= grace_period
+        ]
+
+        cached = self._monthly_data_cache.get(thing.thing_name)
+        # Fetched from the earliest month which is not both final and cached.
+        fetch_index = min(
+            index
+            for index, key in enumerate(month_keys)
+            if key not in final_keys or key not in cached
+        )
+        fetch_from = month_starts[fetch_index]
+        # One day of overlap covers records stamped at month starts in another time zone.
+        records = self._get_monthly_data(
+            thing.thing_name,
+            int((fetch_from - datetime.timedelta(days=1)).timestamp() * 1000),
+            int(now.timestamp() * 1000),
+        )
+
+        fetched: dict[str, list[dict]] = {key: [] for key in month_keys[fetch_index:]}
+        for record in records:
+            key = self._month_key(record["Timestamp"], now.tzinfo)
+            if key in fetched:
+                fetched[key].append(record)
 
+        # Final months no longer change, so months without data, e.g. before the device
+        # was added, are cached as well.
+        self._monthly_data_cache.update(
+            thing.thing_name,
+            {key: fetched[key] for key in final_keys if key in fetched},
+        )
+        cached.update(fetched)
         thing.monthly_data = sorted(
-            response["results"]["Data"], key=lambda x: x["Timestamp"]
+            (record for key in month_keys for record in cached.get(key, [])),
+            key=lambda x: x["Timestamp"],
         )
 
+    def refresh_monthly_data_all(
+        self,
+        months: int,
+        device_names: Optional[list[str]] = None,
+        max_concurrency: int = 4,
+        tz: Optional[datetime.tzinfo] = None,
+        grace_period: float = 259200.0,
+    ) -> None:
+        """Refresh monthly data (power consumption) of multiple devices concurrently.
+
+        Unlike `refresh_monthly_data`, months are calendar months, including the current one.
+        Closed months are kept in the monthly data cache once grace_period has passed,
+        so only recent months and months missing from the cache are requested.
+
+        Parameters
+        ----------
+        months : int
+            Number of months to get, including the current month.
+        device_names : list of str, optional
+            Device names. If None is given, all devices will be refreshed, by default None.
+        max_concurrency : int, optional
+            Maximum number of devices fetched at the same time, by default 4.
+        tz : datetime.tzinfo, optional
+            Time zone of calendar months, which should match the one of the devices.
+            If None is given, the local time zone is used, by default None.
+        grace_period : float, optional
+            Seconds after the end of a month during which it is still fetched
+            instead of being cached, by default 3 days.
+
+        Raises
+        ------
+        ValueError
+            If months is less than 1.
+        RuntimeError
+            If an error occurs, RuntimeError will be raised after other devices are refreshed.
+        """
+
+        if months < 1:
+            raise ValueError("months must be at least 1.")
+        if device_names is None:
+            things = [thing for _, thing in self._get_valid_things()]
+        else:
+            things = [self._things[device_name] for device_name in device_names]
+
+        # Without tz, now is naive, so that months are bucketed with the local DST rules.
+        now = datetime.datetime.now(tz=tz)
+        errors = {}
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_concurrency, len(things) or 1))
+        ) as executor:
+            futures = {
+                thing.name: executor.submit(
+                    self._refresh_cached_monthly_data, thing, months, now, grace_period
+                )
+                for thing in things
+            }
+            for device_name, future in futures.items():
+                try:
+                    future.result()
+                except RuntimeError as e:
+                    errors[device_name] = e
+
+        if errors:
+            raise RuntimeError(
+                "An error occurred when refreshing monthly data of devices: "
+                + ", ".join(f"{name}: {e}" for name, e in errors.items())
+            )
+
     def refresh_status(
         self,
         device_name: Optional[str] = None,
         refresh_support_code: bool = False,
         refresh_shadow: bool = False,
-    ) -> None:
+        raise_on_error: bool = True,
+        max_age: Optional[float] = None,
+    ) -> dict[str, Optional[RuntimeError]]:
         """Refresh device status from the API.
 
+        A device which is already being refreshed with the same options by another call
+        is not requested again; the call waits for that refresh and shares its outcome.
+
         Parameters
         ----------
         device_name : str, optional
@@ -1151,81 +1716,235 @@ class JciHitachiAWSAPI:
             Whether or not to refresh support code, by default False.
         refresh_shadow : bool, optional
             Whether or not to refresh AWS IoT Shadow, by default False.
+        raise_on_error : bool, optional
+            Responses of all devices are applied and failed devices are marked unavailable.
+            Then, if True, RuntimeError of the first device that failed to refresh is raised,
+            by default True.
+        max_age : float, optional
+            If given, only devices whose status was updated more than max_age seconds ago
+            are refreshed, by default None.
+
+        Returns
+        -------
+        dict
+            RuntimeError raised by each device, or None if it was refreshed successfully
+            or is still fresh.
 
         Raises
         ------
         RuntimeError
-            If an error occurs, RuntimeError will be raised.
+            If an error occurs and raise_on_error is True, RuntimeError will be raised.
         """
 
-        # queue tasks
-        for name, thing in self._get_valid_things(device_name):
-            self._check_before_publish()
-
-            if refresh_support_code:
-                self._mqtt.publish(
-                    self._aws_identity.host_identity_id,
-                    thing.thing_name,
-                    "support",
-                    self._mqtt_timeout,
+        outcomes = dict.fromkeys(
+            name for name, _ in self._get_valid_things(device_name)
+        )
+        things = self._get_stale_things(device_name, max_age)
+        if not things:
+            return outcomes
+
+        things, flights = self._begin_refresh(
+            things, refresh_support_code, refresh_shadow
+        )
+        try:
+            if things:
+                # queue tasks
+                execution_pools = aws_connection.JciHitachiExecutionPools()
+                for name, thing in things:
+                    self._check_before_publish()
+                    self._queue_refresh(
+                        thing, refresh_support_code, refresh_shadow, execution_pools
+                    )
+
+                # execute
+                support_results, shadow_results, status_results, _ = self._mqtt.execute(
+                    concurrently=True, execution_pools=execution_pools
+                )
+
+                # gather results
+                self._gather_refresh_results(
+                    outcomes,
+                    things,
+                    refresh_support_code,
+                    refresh_shadow,
+                    support_results,
+                    shadow_results,
+                    status_results,
                 )
-            if refresh_shadow:
-                self._mqtt.publish_shadow(thing.thing_name, "get", shadow_name="info")
+        except BaseException as e:
+            self._end_refresh(things, refresh_support_code, refresh_shadow, e)
+            raise
+        self._end_refresh(things, refresh_support_code, refresh_shadow, outcomes)
+
+        for name, future in flights.items():
+            outcomes[name] = future.result()
+        return self._refresh_outcomes(outcomes, raise_on_error)
+
+    def _begin_refresh(
+        self,
+        things: list[tuple[str, AWSThing]],
+        refresh_support_code: bool,
+        refresh_shadow: bool,
+    ) -> tuple[list[tuple[str, AWSThing]], dict[str, Future]]:
+        # Things being refreshed by another caller are waited for instead of being requested again.
+        owned, flights = [], {}
+        for name, thing in things:
+            future, is_leader = self._refresh_flights.begin(
+                (thing.thing_name, refresh_support_code, refresh_shadow)
+            )
+            if is_leader:
+                owned.append((name, thing))
+            else:
+                flights[name] = future
+        return owned, flights
 
+    def _end_refresh(
+        self,
+        things: list[tuple[str, AWSThing]],
+        refresh_support_code: bool,
+        refresh_shadow: bool,
+        outcomes: Union[dict[str, Optional[RuntimeError]], BaseException],
+    ) -> None:
+        for name, thing in things:
+            key = (thing.thing_name, refresh_support_code, refresh_shadow)
+            if isinstance(outcomes, BaseException):
+                self._refresh_flights.end(key, exception=outcomes)
+            else:
+                self._refresh_flights.end(key, outcomes[name])
+
+    @staticmethod
+    def _refresh_outcomes(
+        outcomes: dict[str, Optional[RuntimeError]], raise_on_error: bool
+    ) -> dict[str, Optional[RuntimeError]]:
+        if raise_on_error:
+            for outcome in outcomes.values():
+                if outcome is not None:
+                    raise outcome
+        return outcomes
+
+    def _queue_refresh(
+        self,
+        thing: AWSThing,
+        refresh_support_code: bool,
+        refresh_shadow: bool,
+        execution_pools: aws_connection.JciHitachiExecutionPools,
+    ) -> None:
+        if refresh_support_code:
             self._mqtt.publish(
                 self._aws_identity.host_identity_id,
                 thing.thing_name,
-                "status",
+                "support",
                 self._mqtt_timeout,
+                execution_pools=execution_pools,
+            )
+        if refresh_shadow:
+            self._mqtt.publish_shadow(
+                thing.thing_name,
+                "get",
+                shadow_name="info",
+                execution_pools=execution_pools,
             )
 
-        # execute
-        support_results, shadow_results, status_results, _ = self._mqtt.execute()
+        self._mqtt.publish(
+            self._aws_identity.host_identity_id,
+            thing.thing_name,
+            "status",
+            self._mqtt_timeout,
+            execution_pools=execution_pools,
+        )
+
+    def _gather_refresh_results(
+        self,
+        outcomes: dict[str, Optional[RuntimeError]],
+        things: list[tuple[str, AWSThing]],
+        refresh_support_code: bool,
+        refresh_shadow: bool,
+        support_results: Optional[list],
+        shadow_results: Optional[list],
+        status_results: Optional[list],
+    ) -> dict[str, Optional[RuntimeError]]:
+        # A pool which came back empty got no responses, i.e. every thing timed out.
+        support_responses = self._execution_responses(support_results)
+        shadow_responses = self._execution_responses(shadow_results)
+        status_responses = self._execution_responses(status_results)
+        for name, thing in things:
+            try:
+                self._apply_refresh_results(
+                    name,
+                    thing,
+                    refresh_support_code,
+                    refresh_shadow,
+                    support_responses,
+                    shadow_responses,
+                    status_responses,
+                )
+            except RuntimeError as e:
+                thing.available = False
+                outcomes[name] = e
+            else:
+                thing.available = True
+                outcomes[name] = None
+        return outcomes
+
+    @staticmethod
+    def _execution_responses(results: Optional[list]) -> dict[str, Any]:
+        # Responses correlated to the caller's own requests, rather than the latest ones of a thing.
+        return {
+            result.thing_name: result.response
+            for result in results or []
+            if isinstance(result, aws_connection.JciHitachiExecutionResult)
+        }
 
-        # gather results
-        for name, thing in self._get_valid_things(device_name):
-            if refresh_support_code:
-                if thing.thing_name in support_results:
-                    if thing.thing_name not in self._mqtt.mqtt_events.device_support:
-                        raise RuntimeError(
-                            f"An event occurred but wasn't accompanied with data when refreshing {name} support code."
-                        )
-                    thing.support_code = self._mqtt.mqtt_events.device_support[
-                        thing.thing_name
-                    ]
-                else:
-                    raise RuntimeError(
-                        f"Timed out refreshing {name} support code. Please ensure the device is online and avoid opening the official app."
-                    )
-            if refresh_shadow:
-                if thing.thing_name in shadow_results:
-                    if thing.thing_name not in self._mqtt.mqtt_events.device_shadow:
-                        raise RuntimeError(
-                            f"An event occurred but wasn't accompanied with data when refreshing {name} shadow."
-                        )
-                    thing.shadow = self._mqtt.mqtt_events.device_shadow[
-                        thing.thing_name
-                    ]
-                else:
+    def _apply_refresh_results(
+        self,
+        name: str,
+        thing: AWSThing,
+        refresh_support_code: bool,
+        refresh_shadow: bool,
+        support_responses: dict[str, Any],
+        shadow_responses: dict[str, Any],
+        status_responses: dict[str, Any],
+    ) -> None:
+        if refresh_support_code:
+            if thing.thing_name in support_responses:
+                if support_responses[thing.thing_name] is None:
                     raise RuntimeError(
-                        f"Timed out refreshing {name} shadow. Please ensure the device is online and avoid opening the official app."
+                        f"An event occurred but wasn't accompanied with data when refreshing {name} support code."
                     )
-
-            if thing.thing_name in status_results:
-                if thing.thing_name not in self._mqtt.mqtt_events.device_status:
+                thing.support_code = support_responses[thing.thing_name]
+            else:
+                raise RuntimeError(
+                    f"Timed out refreshing {name} support code. Please ensure the device is online and avoid opening the official app."
+                )
+        if refresh_shadow:
+            if thing.thing_name in shadow_responses:
+                if shadow_responses[thing.thing_name] is None:
                     raise RuntimeError(
-                        f"An event occurred but wasn't accompanied with data when refreshing {name} status code."
+                        f"An event occurred but wasn't accompanied with data when refreshing {name} shadow."
                     )
-                thing.status_code = self._mqtt.mqtt_events.device_status[
-                    thing.thing_name
-                ]
+                thing.shadow = shadow_responses[thing.thing_name]
             else:
                 raise RuntimeError(
-                    f"Timed out refreshing {name} status code. Please ensure the device is online and avoid opening the official app."
+                    f"Timed out refreshing {name} shadow. Please ensure the device is online and avoid opening the official app."
+                )
+
+        if thing.thing_name in status_responses:
+            if status_responses[thing.thing_name] is None:
+                raise RuntimeError(
+                    f"An event occurred but wasn't accompanied with data when refreshing {name} status code."
                 )
+            thing.status_code = status_responses[thing.thing_name]
+            thing.status_updated_at = time.monotonic()
+        else:
+            raise RuntimeError(
+                f"Timed out refreshing {name} status code. Please ensure the device is online and avoid opening the official app."
+            )
 
     def get_status(
-        self, device_name: Optional[str] = None, legacy: bool = False
+        self,
+        device_name: Optional[str] = None,
+        legacy: bool = False,
+        max_age: Optional[float] = None,
     ) -> dict[str, JciHitachiAWSStatus]:
         """Get device status after refreshing status.
 
@@ -1237,6 +1956,10 @@ class JciHitachiAWSAPI:
             by default None.
         legacy : bool, optional
             Whether or not to return status with legacy status name, by default False.
+        max_age : float, optional
+            If given, status older than max_age seconds is refreshed before being returned.
+            Devices failing to refresh are marked unavailable and their last known status
+            is returned, by default None.
 
         Returns
         -------
@@ -1244,6 +1967,9 @@ class JciHitachiAWSAPI:
             A dict of JciHitachiAWSStatus instances.
         """
 
+        if max_age is not None:
+            self.refresh_status(device_name, raise_on_error=False, max_age=max_age)
+
         statuses = {}
         for name, thing in self._get_valid_things(device_name):
             if legacy:
@@ -1345,23 +2071,880 @@ class JciHitachiAWSAPI:
                     return True
             return False
 
-        self._mqtt.publish(
-            self._aws_identity.host_identity_id,
-            thing.thing_name,
-            "control",
-            self._mqtt_timeout,
-            {
-                status_name: status_value,
-                "TaskID": self.task_id,
-                "Timestamp": int(time.time()),
+        execution_pools = aws_connection.JciHitachiExecutionPools()
+        payload = {status_name: status_value}
+        self._publish_control(thing, payload, execution_pools)
+
+        _, _, _, control_results = self._mqtt.execute(
+            control=True, execution_pools=execution_pools
+        )
+
+        return self._control_results(
+            thing, payload, {status_name: status_name}, control_results
+        )[status_name]
+
+    def set_statuses(
+        self, device_name: str, statuses: dict[str, Union[int, str]]
+    ) -> dict[str, bool]:
+        """Set multiple statuses to a thing in one control request.
+
+        Parameters
+        ----------
+        device_name : str
+            Device name.
+        statuses : dict
+            Status values by status name. Integer values are treated as status values
+            and string values as status string values.
+
+        Returns
+        -------
+        dict of bool
+            For each status name, True if the status has been successfully set. Otherwise, False.
+
+        Raises
+        ------
+        RuntimeError
+            If an error occurs, RuntimeError will be raised.
+        """
+
+        self._check_before_publish()
+
+        thing = self._things[device_name]
+        results = {name: False for name in statuses}
+        payload, status_names = self._control_payload(thing, statuses)
+        if not payload:
+            return results
+
+        execution_pools = aws_connection.JciHitachiExecutionPools()
+        self._publish_control(thing, payload, execution_pools)
+
+        _, _, _, control_results = self._mqtt.execute(
+            control=True, execution_pools=execution_pools
+        )
+
+        results.update(
+            self._control_results(thing, payload, status_names, control_results)
+        )
+        return results
+
+    def set_status_many(
+        self,
+        statuses: list[tuple[str, str, Union[int, str]]],
+        max_concurrency: int = 8,
+    ) -> dict[str, bool]:
+        """Set statuses to many things concurrently.
+
+        Statuses of the same device are sent in one control request, and
+        requests of different devices are executed together. Every device name is
+        looked up and every request is built before anything is sent. Unlike `set_statuses`,
+        a device is set all or nothing: if any of its statuses is invalid, nothing is sent
+        to it and its result is False.
+
+        Parameters
+        ----------
+        statuses : list of tuple
+            Tuples of device name, status name and status value. Integer values are treated
+            as status values and string values as status string values.
+        max_concurrency : int, optional
+            Maximum number of control requests in flight, by default 8.
+
+        Returns
+        -------
+        dict of bool
+            For each device name, True if all of its statuses have been successfully set. Otherwise, False.
+
+        Raises
+        ------
+        KeyError
+            If a device name is unknown. Nothing is sent in that case.
+        RuntimeError
+            If an error occurs, RuntimeError will be raised.
+        """
+
+        self._check_before_publish()
+
+        execution_pools = aws_connection.JciHitachiExecutionPools()
+        results, requests = self._queue_status_many(statuses, execution_pools)
+        if not requests:
+            return results
+
+        _, _, _, control_results = self._mqtt.execute(
+            control=True,
+            max_concurrency=max_concurrency,
+            execution_pools=execution_pools,
+        )
+        return self._gather_status_many_results(results, requests, control_results)
+
+    def _queue_status_many(
+        self,
+        statuses: list[tuple[str, str, Union[int, str]]],
+        execution_pools: aws_connection.JciHitachiExecutionPools,
+    ) -> tuple[dict[str, bool], dict[str, tuple]]:
+        device_statuses = {}
+        for device_name, status_name, status_value in statuses:
+            device_statuses.setdefault(device_name, {})[status_name] = status_value
+
+        # Everything is validated first, so that an unknown device does not leave requests queued.
+        things = {
+            device_name: self._things[device_name] for device_name in device_statuses
+        }
+        results = {device_name: False for device_name in device_statuses}
+        requests = {}
+        for device_name, thing_statuses in device_statuses.items():
+            thing = things[device_name]
+            payload, status_names = self._control_payload(thing, thing_statuses)
+            if len(status_names) != len(thing_statuses):
+                continue
+            requests[device_name] = (thing, payload, status_names)
+
+        for thing, payload, _ in requests.values():
+            self._publish_control(thing, payload, execution_pools)
+        return results, requests
+
+    def _gather_status_many_results(
+        self,
+        results: dict[str, bool],
+        requests: dict[str, tuple],
+        control_results: Optional[list],
+    ) -> dict[str, bool]:
+        for device_name, (thing, payload, status_names) in requests.items():
+            results[device_name] = all(
+                self._control_results(
+                    thing, payload, status_names, control_results
+                ).values()
+            )
+        return results
+
+    def _publish_control(
+        self,
+        thing: AWSThing,
+        payload: dict[str, int],
+        execution_pools: aws_connection.JciHitachiExecutionPools,
+    ) -> None:
+        self._mqtt.publish(
+            self._aws_identity.host_identity_id,
+            thing.thing_name,
+            "control",
+            self._mqtt_timeout,
+            {
+                **payload,
+                "TaskID": self.task_id,
+                "Timestamp": int(time.time()),
             },
+            execution_pools=execution_pools,
         )
 
-        _, _, _, control_results = self._mqtt.execute(control=True)
+    @staticmethod
+    def _control_payload(
+        thing: AWSThing, statuses: dict[str, Union[int, str]]
+    ) -> tuple[dict[str, int], dict[str, str]]:
+        payload, status_names = {}, {}
+        for name, value in statuses.items():
+            is_str = isinstance(value, str)
+            is_valid, status_name, status_value = JciHitachiAWSStatus.str2id(
+                device_type=thing.type,
+                status_name=name,
+                status_value=None if is_str else value,
+                status_str_value=value if is_str else None,
+                support_code=thing.support_code,
+            )
+            if is_valid:
+                payload[status_name] = status_value
+                status_names[name] = status_name
+        return payload, status_names
 
-        if thing.thing_name in control_results:
-            device_control = self._mqtt.mqtt_events.device_control.get(thing.thing_name)
-            if device_control.get(status_name) == status_value:
-                thing.status_code.set_new_status(status_name, status_value)
-                return True
-        return False
+    def _control_results(
+        self,
+        thing: AWSThing,
+        payload: dict[str, int],
+        status_names: dict[str, str],
+        control_results: Optional[list],
+    ) -> dict[str, bool]:
+        device_control = self._execution_responses(control_results).get(
+            thing.thing_name
+        )
+        results = {}
+        for name, status_name in status_names.items():
+            results[name] = (
+                device_control is not None
+                and device_control.get(status_name) == payload[status_name]
+            )
+            if results[name]:
+                thing.status_code.set_new_status(status_name, payload[status_name])
+        return results
+
+
+class AsyncJciHitachiAWSAPI:
+    """Asynchronous Jci-Hitachi API.
+
+    Wraps a `JciHitachiAWSAPI` and provides coroutine counterparts of its blocking methods,
+    with the same semantics and results. Waiting for the cloud or device responses does not
+    hold any thread, so the API can be driven directly from a running event loop.
+    Things and statuses are shared with the wrapped API, which can still be used for
+    methods without a coroutine counterpart.
+
+    Parameters
+    ----------
+    email : str
+        User email.
+    password : str
+        User password.
+    device_names : list of str or str or None, optional
+        Device names. If None is given, all available devices will be included, by default None.
+    **kwargs
+        Other arguments of JciHitachiAWSAPI.
+    """
+
+    def __init__(
+        self,
+        email: str,
+        password: str,
+        device_names: Optional[Union[list[str], str]] = None,
+        **kwargs,
+    ) -> None:
+        self._api: JciHitachiAWSAPI = JciHitachiAWSAPI(
+            email, password, device_names, **kwargs
+        )
+
+    @property
+    def api(self) -> JciHitachiAWSAPI:
+        """Wrapped blocking API.
+
+        Returns
+        -------
+        JciHitachiAWSAPI
+            Blocking API sharing things and connections with this API.
+        """
+
+        return self._api
+
+    @property
+    def things(self) -> dict[str, AWSThing]:
+        """Things of the wrapped API. See `JciHitachiAWSAPI.things`."""
+
+        return self._api.things
+
+    async def _check_before_publish(self) -> None:
+        # Renewing tokens and reauthenticating are rare, so they are left to a worker thread
+        # only when the blocking check would actually do either.
+        if (
+            self._api._token_manager.needs_sync_renewal()
+            or self._api._mqtt.mqtt_events.mqtt_error_event.is_set()
+        ):
+            await asyncio.to_thread(self._api._check_before_publish)
+
+    async def _load_stored_tokens(
+        self,
+    ) -> tuple[
+        Optional[aws_connection.AWSTokens], Optional[aws_connection.AWSIdentity]
+    ]:
+        api = self._api
+        aws_tokens, aws_identity = api._read_stored_tokens()
+        if aws_tokens is None:
+            return None, None
+
+        # Renew stored tokens with the refresh token if they expire within 5 mins.
+        if aws_tokens.expiration - time.time() <= 300:
+            conn = aws_connection.AsyncJciHitachiAWSCognitoConnection(
+                email=api.email,
+                password=api.password,
+                aws_tokens=aws_tokens,
+                print_response=api.print_response,
+                session=api._http_session,
+                retry_policy=api._retry_policy,
+            )
+            aws_tokens = api._renewed_stored_tokens(
+                *await conn.login(use_refresh_token=True)
+            )
+            if aws_tokens is None:
+                return None, None
+
+        return aws_tokens, aws_identity
+
+    async def login(self, use_token_store: bool = True) -> None:
+        """Login API.
+
+        Parameters
+        ----------
+        use_token_store : bool, optional
+            Whether or not to reuse tokens from the token store if given, by default True.
+
+        Raises
+        ------
+        RuntimeError
+            If a login error occurs, RuntimeError will be raised.
+        """
+
+        api = self._api
+        aws_tokens, aws_identity = (
+            await self._load_stored_tokens() if use_token_store else (None, None)
+        )
+
+        # AsyncGetUser signs in with email and password on the first request if aws_tokens is None.
+        conn = aws_connection.AsyncGetUser(
+            email=api.email,
+            password=api.password,
+            aws_tokens=aws_tokens,
+            print_response=api.print_response,
+            session=api._http_session,
+            retry_policy=api._retry_policy,
+        )
+        if aws_identity is None:
+            conn_status, api._aws_identity = await conn.get_data()
+        else:
+            api._aws_identity = aws_identity
+        api._aws_tokens = conn.aws_tokens
+        api._store_tokens()
+
+        conn = aws_connection.AsyncGetAllDevice(
+            api._aws_tokens,
+            print_response=api.print_response,
+            session=api._http_session,
+            retry_policy=api._retry_policy,
+            token_refresher=api._token_manager.renew,
+        )
+        conn_status, conn_json = await conn.get_data()
+
+        if (
+            conn_status != "OK"
+            and aws_tokens is not None
+            and api._is_auth_error(conn_status)
+        ):
+            # Stored tokens might have been revoked.
+            api._token_store.clear(api.email)
+            return await self.login(use_token_store=False)
+
+        if conn_status == "OK":
+            thing_names = api._configure_mqtt(conn_json)
+            if not await api._mqtt.connect_async(
+                api._aws_identity.host_identity_id, api._shadow_names, thing_names
+            ):
+                raise RuntimeError(
+                    "An error occurred when connecting to MQTT endpoint."
+                )
+            api._token_manager.start()
+
+            # status
+            await self.refresh_status(refresh_support_code=True, refresh_shadow=True)
+        else:
+            raise RuntimeError(
+                f"An error occurred when retrieving devices info: {conn_status}"
+            )
+
+    async def logout(self) -> None:
+        """Logout API."""
+
+        # Disconnecting joins the event loop thread of the MQTT connection.
+        await asyncio.to_thread(self._api._disconnect)
+        if self._api._owns_http_session:
+            await self._api._http_session.aclose()
+
+    async def refresh_monthly_data(self, months: int, device_name: str) -> None:
+        """Refresh available monthly data (power consumption) from the API.
+
+        Parameters
+        ----------
+        months : int
+            Number of months to get.
+        device_name : str
+            Device name.
+
+        Raises
+        ------
+        RuntimeError
+            If an error occurs, RuntimeError will be raised.
+        """
+
+        api = self._api
+        thing = api._things[device_name]
+        conn = aws_connection.AsyncGetAvailableAggregationMonthlyData(
+            api._aws_tokens,
+            print_response=api.print_response,
+            session=api._http_session,
+            retry_policy=api._retry_policy,
+            token_refresher=api._token_manager.renew,
+        )
+        conn_status, response = await conn.get_data(
+            thing.thing_name, *api._monthly_range(months)
+        )
+        thing.monthly_data = sorted(
+            api._monthly_data_result(conn_status, response),
+            key=lambda x: x["Timestamp"],
+        )
+
+    async def refresh_status(
+        self,
+        device_name: Optional[str] = None,
+        refresh_support_code: bool = False,
+        refresh_shadow: bool = False,
+        raise_on_error: bool = True,
+        max_age: Optional[float] = None,
+    ) -> dict[str, Optional[RuntimeError]]:
+        """Refresh device status from the API.
+
+        See `JciHitachiAWSAPI.refresh_status`.
+        """
+
+        api = self._api
+        outcomes = dict.fromkeys(name for name, _ in api._get_valid_things(device_name))
+        things = api._get_stale_things(device_name, max_age)
+        if not things:
+            return outcomes
+
+        things, flights = api._begin_refresh(
+            things, refresh_support_code, refresh_shadow
+        )
+        try:
+            if things:
+                await self._check_before_publish()
+                execution_pools = aws_connection.JciHitachiExecutionPools()
+                for name, thing in things:
+                    api._queue_refresh(
+                        thing, refresh_support_code, refresh_shadow, execution_pools
+                    )
+
+                (
+                    support_results,
+                    shadow_results,
+                    status_results,
+                    _,
+                ) = await api._mqtt.execute_async(
+                    concurrently=True, execution_pools=execution_pools
+                )
+
+                api._gather_refresh_results(
+                    outcomes,
+                    things,
+                    refresh_support_code,
+                    refresh_shadow,
+                    support_results,
+                    shadow_results,
+                    status_results,
+                )
+        except BaseException as e:
+            api._end_refresh(things, refresh_support_code, refresh_shadow, e)
+            raise
+        api._end_refresh(things, refresh_support_code, refresh_shadow, outcomes)
+
+        for name, future in flights.items():
+            outcomes[name] = await asyncio.wrap_future(future)
+        return api._refresh_outcomes(outcomes, raise_on_error)
+
+    async def get_status(
+        self,
+        device_name: Optional[str] = None,
+        legacy: bool = False,
+        max_age: Optional[float] = None,
+    ) -> dict[str, JciHitachiAWSStatus]:
+        """Get device status after refreshing status.
+
+        See `JciHitachiAWSAPI.get_status`.
+        """
+
+        if max_age is not None:
+            await self.refresh_status(
+                device_name, raise_on_error=False, max_age=max_age
+            )
+        return self._api.get_status(device_name, legacy)
+
+    async def set_status(
+        self,
+        status_name: str,
+        device_name: str,
+        status_value: int = None,
+        status_str_value: str = None,
+    ) -> bool:
+        """Set status to a thing. Either status_value or status_str_value must be specified.
+
+        Parameters
+        ----------
+        status_name : str
+            Status name.
+        device_name : str
+            Device name.
+        status_value : int, optional
+            Status value, by default None.
+        status_str_value : str, optional
+            Status string value, by default None.
+
+        Returns
+        -------
+        bool
+            Return True if the command has been successfully executed. Otherwise, return False.
+
+        Raises
+        ------
+        RuntimeError
+            If an error occurs, RuntimeError will be raised.
+        """
+
+        results = await self.set_statuses(
+            device_name,
+            {
+                status_name: (
+                    status_str_value if status_str_value is not None else status_value
+                )
+            },
+        )
+        return results[status_name]
+
+    async def set_statuses(
+        self, device_name: str, statuses: dict[str, Union[int, str]]
+    ) -> dict[str, bool]:
+        """Set multiple statuses to a thing in one control request.
+
+        See `JciHitachiAWSAPI.set_statuses`.
+        """
+
+        await self._check_before_publish()
+
+        api = self._api
+        thing = api._things[device_name]
+        results = {name: False for name in statuses}
+        payload, status_names = api._control_payload(thing, statuses)
+        if not payload:
+            return results
+
+        execution_pools = aws_connection.JciHitachiExecutionPools()
+        api._publish_control(thing, payload, execution_pools)
+
+        _, _, _, control_results = await api._mqtt.execute_async(
+            control=True, execution_pools=execution_pools
+        )
+
+        results.update(
+            api._control_results(thing, payload, status_names, control_results)
+        )
+        return results
+
+    async def set_status_many(
+        self,
+        statuses: list[tuple[str, str, Union[int, str]]],
+        max_concurrency: int = 8,
+    ) -> dict[str, bool]:
+        """Set statuses to many things concurrently.
+
+        See `JciHitachiAWSAPI.set_status_many`.
+        """
+
+        await self._check_before_publish()
+
+        api = self._api
+        execution_pools = aws_connection.JciHitachiExecutionPools()
+        results, requests = api._queue_status_many(statuses, execution_pools)
+        if not requests:
+            return results
+
+        _, _, _, control_results = await api._mqtt.execute_async(
+            control=True,
+            max_concurrency=max_concurrency,
+            execution_pools=execution_pools,
+        )
+        return api._gather_status_many_results(results, requests, control_results)
+
+
+class JciHitachiAWSHub:
+    """Managing many Jci-Hitachi accounts in one process.
+
+    Accounts share one HTTP session, one publish rate limiter, the native MQTT resources,
+    one event loop thread executing MQTT commands and one queue of received MQTT messages,
+    and are driven through `AsyncJciHitachiAWSAPI` on the caller's event loop.
+    Calls to different accounts run concurrently without holding a thread each.
+
+    Parameters
+    ----------
+    max_concurrency : int, optional
+        Maximum number of account calls running at the same time, by default 32.
+    rate_limiter : JciHitachiAWSRateLimiter, optional
+        Rate limiter shared by all accounts. Its global rate caps publishes of all accounts
+        together, while its account rate still limits each account separately.
+        If None is given, publishes are not limited, by default None.
+    http_session : JciHitachiAWSHttpSession, optional
+        HTTP session shared by all accounts.
+        If None is given, a new session is created and owned by the hub, by default None.
+    crt_resources : JciHitachiAWSCrtResources, optional
+        Native MQTT resources shared by all accounts.
+        If None is given, the process-wide resources are used, by default None.
+    crt_threads : int, optional
+        If given and crt_resources is None, the hub creates its own native MQTT resources
+        with this number of event loop threads, e.g. to serve many accounts, by default None.
+    token_store : AWSTokenStore, optional
+        Token store shared by all accounts, by default None.
+    message_queue : JciHitachiAWSMessageQueue, optional
+        Queue of received MQTT messages shared by all accounts.
+        If None is given, a new queue is created and owned by the hub, by default None.
+    event_loop : JciHitachiAWSEventLoop, optional
+        Event loop executing MQTT commands of all accounts.
+        If None is given, a new loop is created and owned by the hub, by default None.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        rate_limiter: Optional[aws_connection.JciHitachiAWSRateLimiter] = None,
+        http_session: Optional[aws_connection.JciHitachiAWSHttpSession] = None,
+        crt_resources: Optional[aws_connection.JciHitachiAWSCrtResources] = None,
+        crt_threads: Optional[int] = None,
+        token_store: Optional[aws_connection.AWSTokenStore] = None,
+        message_queue: Optional[aws_connection.JciHitachiAWSMessageQueue] = None,
+        event_loop: Optional[aws_connection.JciHitachiAWSEventLoop] = None,
+    ) -> None:
+        if crt_resources is None and crt_threads is not None:
+            crt_resources = aws_connection.JciHitachiAWSCrtResources(crt_threads)
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
+        self._rate_limiter: aws_connection.JciHitachiAWSRateLimiter = (
+            rate_limiter or aws_connection.JciHitachiAWSRateLimiter()
+        )
+        self._owns_http_session: bool = http_session is None
+        self._http_session: aws_connection.JciHitachiAWSHttpSession = (
+            http_session or aws_connection.JciHitachiAWSHttpSession()
+        )
+        self._crt_resources: Optional[aws_connection.JciHitachiAWSCrtResources] = (
+            crt_resources
+        )
+        self._token_store: Optional[aws_connection.AWSTokenStore] = token_store
+        self._owns_message_queue: bool = message_queue is None
+        self._message_queue: aws_connection.JciHitachiAWSMessageQueue = (
+            message_queue or aws_connection.JciHitachiAWSMessageQueue()
+        )
+        self._owns_event_loop: bool = event_loop is None
+        self._event_loop: aws_connection.JciHitachiAWSEventLoop = (
+            event_loop or aws_connection.JciHitachiAWSEventLoop()
+        )
+
+        self._apis: dict[str, AsyncJciHitachiAWSAPI] = {}
+        self._metrics: dict[str, dict[str, float]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def accounts(self) -> list[str]:
+        """Emails of managed accounts.
+
+        Returns
+        -------
+        list of str
+            Account emails.
+        """
+
+        with self._lock:
+            return list(self._apis.keys())
+
+    @property
+    def metrics(self) -> dict[str, dict[str, float]]:
+        """Call metrics of all accounts by operation.
+
+        Returns
+        -------
+        dict
+            For each operation, the number of `calls`, `failures` and `in_flight` calls,
+            and the `total_seconds` spent.
+        """
+
+        with self._lock:
+            return {op: dict(metrics) for op, metrics in self._metrics.items()}
+
+    def api(self, account: str) -> AsyncJciHitachiAWSAPI:
+        """Get the API of an account.
+
+        Parameters
+        ----------
+        account : str
+            Account email.
+
+        Returns
+        -------
+        AsyncJciHitachiAWSAPI
+            API of the account.
+        """
+
+        with self._lock:
+            return self._apis[account]
+
+    def add_account(
+        self,
+        email: str,
+        password: str,
+        device_names: Optional[Union[list[str], str]] = None,
+        **kwargs,
+    ) -> AsyncJciHitachiAWSAPI:
+        """Add an account. `login` should be called before using it.
+
+        Parameters
+        ----------
+        email : str
+            User email.
+        password : str
+            User password.
+        device_names : list of str or str or None, optional
+            Device names. If None is given, all available devices will be included, by default None.
+        **kwargs
+            Other arguments of JciHitachiAWSAPI.
+
+        Returns
+        -------
+        AsyncJciHitachiAWSAPI
+            API of the account.
+        """
+
+        kwargs.setdefault("http_session", self._http_session)
+        kwargs.setdefault("rate_limiter", self._rate_limiter)
+        kwargs.setdefault("crt_resources", self._crt_resources)
+        kwargs.setdefault("token_store", self._token_store)
+        kwargs.setdefault("message_queue", self._message_queue)
+        kwargs.setdefault("event_loop", self._event_loop)
+        api = AsyncJciHitachiAWSAPI(email, password, device_names, **kwargs)
+        with self._lock:
+            if email in self._apis:
+                raise ValueError(f"Account {email} has already been added.")
+            self._apis[email] = api
+        return api
+
+    async def remove_account(self, account: str) -> None:
+        """Log out and remove an account.
+
+        Parameters
+        ----------
+        account : str
+            Account email.
+        """
+
+        with self._lock:
+            api = self._apis.pop(account)
+        if api.api._mqtt is not None:
+            await self._run("logout", api.logout)
+
+    async def _run(self, op: str, fn: Callable, *args, **kwargs):
+        with self._lock:
+            metrics = self._metrics.setdefault(
+                op, {"calls": 0, "failures": 0, "in_flight": 0, "total_seconds": 0.0}
+            )
+            metrics["calls"] += 1
+            metrics["in_flight"] += 1
+        start = time.monotonic()
+        try:
+            async with self._semaphore:
+                return await fn(*args, **kwargs)
+        except BaseException:
+            with self._lock:
+                metrics["failures"] += 1
+            raise
+        finally:
+            with self._lock:
+                metrics["in_flight"] -= 1
+                metrics["total_seconds"] += time.monotonic() - start
+
+    async def login(
+        self, account: Optional[str] = None
+    ) -> dict[str, Optional[BaseException]]:
+        """Log in accounts concurrently.
+
+        Parameters
+        ----------
+        account : str, optional
+            Account email. If None is given, all accounts will be logged in, by default None.
+
+        Returns
+        -------
+        dict
+            Exception raised by each account, or None if it was logged in successfully.
+        """
+
+        accounts = [account] if account is not None else self.accounts
+        results = await asyncio.gather(
+            *(self._run("login", self.api(email).login) for email in accounts),
+            return_exceptions=True,
+        )
+        return {
+            email: result if isinstance(result, BaseException) else None
+            for email, result in zip(accounts, results)
+        }
+
+    async def refresh(
+        self, account: str, device_name: Optional[str] = None, **kwargs
+    ) -> dict[str, JciHitachiAWSStatus]:
+        """Refresh and get device status of an account.
+
+        Parameters
+        ----------
+        account : str
+            Account email.
+        device_name : str, optional
+            Device name. If None is given, all devices' status will be refreshed, by default None.
+        **kwargs
+            Other arguments of `JciHitachiAWSAPI.refresh_status`.
+
+        Returns
+        -------
+        dict of JciHitachiAWSStatus.
+            A dict of JciHitachiAWSStatus instances.
+
+        Raises
+        ------
+        RuntimeError
+            If an error occurs, RuntimeError will be raised.
+        """
+
+        api = self.api(account)
+
+        async def refresh():
+            await api.refresh_status(device_name, **kwargs)
+            return await api.get_status(device_name)
+
+        return await self._run("refresh", refresh)
+
+    async def set(
+        self,
+        account: str,
+        device_name: str,
+        status_name: str,
+        status_value: Optional[int] = None,
+        status_str_value: Optional[str] = None,
+    ) -> bool:
+        """Set status to a device of an account.
+
+        Parameters
+        ----------
+        account : str
+            Account email.
+        device_name : str
+            Device name.
+        status_name : str
+            Status name.
+        status_value : int, optional
+            Status value, by default None.
+        status_str_value : str, optional
+            Status string value, by default None.
+
+        Returns
+        -------
+        bool
+            Return True if the command has been successfully executed. Otherwise, return False.
+
+        Raises
+        ------
+        RuntimeError
+            If an error occurs, RuntimeError will be raised.
+        """
+
+        return await self._run(
+            "set",
+            self.api(account).set_status,
+            status_name,
+            device_name,
+            status_value,
+            status_str_value,
+        )
+
+    async def close(self) -> None:
+        """Log out all accounts and release shared resources."""
+
+        await asyncio.gather(
+            *(self.remove_account(email) for email in self.accounts),
+            return_exceptions=True,
+        )
+        if self._owns_http_session:
+            await self._http_session.aclose()
+        if self._owns_message_queue:
+            self._message_queue.close()
+        if self._owns_event_loop:
+            await asyncio.to_thread(self._event_loop.stop)
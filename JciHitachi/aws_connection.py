@@ -1,18 +1,33 @@
 from __future__ import annotations
 import asyncio
+import concurrent.futures
 import datetime
+import itertools
 import json
 import logging
+import os
+import tempfile
 import threading
 import time
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from collections import deque
+from dataclasses import asdict, dataclass, field
 from random import random, choices
-from typing import Callable, Optional, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Hashable,
+    Iterator,
+    Optional,
+    Union,
+)
 
 import awscrt
+import awscrt.mqtt5
 import httpx
-from awsiot import iotshadow, mqtt_connection_builder
+from awsiot import iotshadow, mqtt5_client_builder, mqtt_connection_builder
 
 from .model import JciHitachiAWSStatus, JciHitachiAWSStatusSupport
 
@@ -29,6 +44,13 @@ QOS = awscrt.mqtt.QoS.AT_LEAST_ONCE
 
 _LOGGER = logging.getLogger(__name__)
 
+try:
+    import orjson
+
+    _json_loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:  # pragma: no cover
+    _json_loads = json.loads
+
 
 @dataclass
 class AWSTokens:
@@ -60,6 +82,28 @@ class JciHitachiMqttEvents:
     mqtt_error_event: threading.Event = field(default_factory=threading.Event)
 
 
+@dataclass
+class JciHitachiAWSMqtt5Options:
+    """Options of the MQTT5 transport.
+
+    Parameters
+    ----------
+    receive_maximum : int, optional
+        Maximum number of unacknowledged QoS 1 messages the broker may send at once, by default 100.
+    session_expiry_interval_sec : int, optional
+        Seconds the broker keeps the session, including subscriptions, after a disconnection, by default 3600.
+    outbound_topic_alias_cache_size : int, optional
+        Number of outbound topics aliased in an LRU cache, by default 25.
+    inbound_topic_alias_cache_size : int, optional
+        Number of inbound topic aliases the broker may use, by default 25.
+    """
+
+    receive_maximum: int = 100
+    session_expiry_interval_sec: int = 3600
+    outbound_topic_alias_cache_size: int = 25
+    inbound_topic_alias_cache_size: int = 25
+
+
 @dataclass
 class JciHitachiExecutionPools:
     status_execution_pool: list = field(default_factory=list)
@@ -68,12 +112,626 @@ class JciHitachiExecutionPools:
     control_execution_pool: list = field(default_factory=list)
 
 
+@dataclass
+class JciHitachiExecutionResult:
+    """Result of a command executed successfully.
+
+    Parameters
+    ----------
+    thing_name : str
+        Thing name the command was sent to.
+    response : Any, optional
+        Response correlated to the command, by default None.
+    """
+
+    thing_name: str
+    response: Any = None
+
+
+class JciHitachiSingleFlight:
+    """Coordinating concurrent calls so that only one call per key is in flight at a time.
+
+    Callers arriving while a call with the same key is in flight wait for that call
+    and share its result or exception instead of making their own call.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, concurrent.futures.Future] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a call with the key is in flight.
+
+        Parameters
+        ----------
+        key : Hashable
+            Call key.
+
+        Returns
+        -------
+        bool
+            Return True if a call is in flight.
+        """
+
+        with self._lock:
+            return key in self._calls
+
+    def begin(self, key: Hashable) -> tuple[concurrent.futures.Future, bool]:
+        """Start a call with the key unless one is in flight, without waiting for it.
+
+        The caller starting the call must finish it with `end`.
+
+        Parameters
+        ----------
+        key : Hashable
+            Call key.
+
+        Returns
+        -------
+        (concurrent.futures.Future, bool)
+            Future of the call in flight, and whether the caller started it.
+        """
+
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = concurrent.futures.Future()
+            self._calls[key] = future
+            return future, True
+
+    def end(
+        self,
+        key: Hashable,
+        result: Any = None,
+        exception: Optional[BaseException] = None,
+    ) -> None:
+        """Finish a call started by `begin`, sharing its result or exception with waiting callers.
+
+        Parameters
+        ----------
+        key : Hashable
+            Call key.
+        result : Any, optional
+            Result of the call, by default None.
+        exception : BaseException, optional
+            Exception raised by the call, by default None.
+        """
+
+        with self._lock:
+            future = self._calls.pop(key)
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        check: Optional[Callable[[], Any]] = None,
+    ) -> Any:
+        """Call fn unless a call with the same key is in flight, in which case wait for its result.
+
+        Parameters
+        ----------
+        key : Hashable
+            Call key.
+        fn : Callable
+            Callable which takes no arguments.
+        check : Callable, optional
+            Callable which takes no arguments, called under the lock before starting a new call.
+            If it returns anything other than None, that is returned instead of calling fn,
+            e.g. when a call that has just finished already did the work, by default None.
+
+        Returns
+        -------
+        Any
+            Result of the call.
+        """
+
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                if check is not None:
+                    result = check()
+                    if result is not None:
+                        return result
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+
+        if not is_leader:
+            _LOGGER.debug(f"Waiting for the in-flight call {key}.")
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AWSTokenStore(ABC):
+    """Abstract class for token stores persisting AWSTokens and AWSIdentity by account."""
+
+    @abstractmethod
+    def load(self, key: str) -> tuple[Optional[AWSTokens], Optional[AWSIdentity]]:
+        """Load tokens and identity of an account.
+
+        Parameters
+        ----------
+        key : str
+            Account key, e.g. user email.
+
+        Returns
+        -------
+        (AWSTokens or None, AWSIdentity or None)
+            Stored tokens and identity, or None if not stored.
+        """
+
+    @abstractmethod
+    def save(
+        self, key: str, aws_tokens: AWSTokens, aws_identity: Optional[AWSIdentity]
+    ) -> None:
+        """Save tokens and identity of an account.
+
+        Parameters
+        ----------
+        key : str
+            Account key, e.g. user email.
+        aws_tokens : AWSTokens
+            AWS tokens.
+        aws_identity : AWSIdentity or None
+            AWS identity.
+        """
+
+    @abstractmethod
+    def clear(self, key: str) -> None:
+        """Remove tokens and identity of an account.
+
+        Parameters
+        ----------
+        key : str
+            Account key, e.g. user email.
+        """
+
+    @staticmethod
+    def _serialize(aws_tokens: AWSTokens, aws_identity: Optional[AWSIdentity]) -> dict:
+        return {
+            "aws_tokens": asdict(aws_tokens),
+            "aws_identity": asdict(aws_identity) if aws_identity is not None else None,
+        }
+
+    @staticmethod
+    def _deserialize(
+        data: Optional[dict],
+    ) -> tuple[Optional[AWSTokens], Optional[AWSIdentity]]:
+        if not data:
+            return None, None
+        aws_tokens = AWSTokens(**data["aws_tokens"])
+        aws_identity = (
+            AWSIdentity(**data["aws_identity"]) if data.get("aws_identity") else None
+        )
+        return aws_tokens, aws_identity
+
+
+class InMemoryAWSTokenStore(AWSTokenStore):
+    """Token store keeping tokens in memory, e.g. for sharing among API instances in one process."""
+
+    def __init__(self):
+        self._data: dict[str, dict] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def load(self, key: str) -> tuple[Optional[AWSTokens], Optional[AWSIdentity]]:
+        with self._lock:
+            return self._deserialize(self._data.get(key))
+
+    def save(
+        self, key: str, aws_tokens: AWSTokens, aws_identity: Optional[AWSIdentity]
+    ) -> None:
+        with self._lock:
+            self._data[key] = self._serialize(aws_tokens, aws_identity)
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class FileAWSTokenStore(AWSTokenStore):
+    """Token store keeping tokens in a JSON file, so restarted processes can reuse them.
+
+    The file is only readable by the owner since it contains credentials.
+
+    Parameters
+    ----------
+    path : str
+        File path.
+    """
+
+    def __init__(self, path: str):
+        self._path: str = path
+        self._lock: threading.Lock = threading.Lock()
+
+    def _read(self) -> dict:
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            _LOGGER.warning(f"Token store {self._path} cannot be read: {e}")
+            return {}
+
+    def _write(self, data: dict) -> None:
+        directory = os.path.dirname(os.path.abspath(self._path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tokens-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, key: str) -> tuple[Optional[AWSTokens], Optional[AWSIdentity]]:
+        with self._lock:
+            try:
+                return self._deserialize(self._read().get(key))
+            except (KeyError, TypeError) as e:
+                _LOGGER.warning(f"Token store {self._path} has an invalid entry: {e}")
+                return None, None
+
+    def save(
+        self, key: str, aws_tokens: AWSTokens, aws_identity: Optional[AWSIdentity]
+    ) -> None:
+        with self._lock:
+            data = self._read()
+            data[key] = self._serialize(aws_tokens, aws_identity)
+            self._write(data)
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            data = self._read()
+            if data.pop(key, None) is not None:
+                self._write(data)
+
+
+class JciHitachiAWSHttpSession:
+    """Pooled keep-alive HTTP clients shared by AWS http connections.
+
+    One `httpx.Client` is kept per endpoint host, so consecutive requests to the same host
+    reuse established TCP and TLS connections instead of handshaking on every call.
+
+    Parameters
+    ----------
+    proxy : str, optional
+        Proxy setting. Format:"schema://IP:port", e.g., http://127.0.0.1:8080, by default None.
+    max_connections : int, optional
+        Maximum number of connections per host, by default 10.
+    max_keepalive_connections : int, optional
+        Maximum number of idle connections kept alive per host, by default 5.
+    keepalive_expiry : float, optional
+        Seconds an idle connection is kept alive, by default 30.0.
+    http2 : bool, optional
+        Whether to enable HTTP/2. Requires the `h2` package, by default False.
+    timeout : float, optional
+        Connect, read, write and pool timeout in seconds, by default 10.0.
+    """
+
+    def __init__(
+        self,
+        proxy: Optional[str] = None,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 5,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        timeout: float = 10.0,
+    ):
+        self._proxy: Optional[str] = proxy
+        self._limits: httpx.Limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._http2: bool = http2
+        self._timeout: httpx.Timeout = httpx.Timeout(timeout)
+        self._clients: dict[str, httpx.Client] = {}
+        self._async_clients: dict[str, httpx.AsyncClient] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def __del__(self):
+        self.close()
+
+    def _client_kwargs(self) -> dict:
+        return {
+            "limits": self._limits,
+            "http2": self._http2,
+            "timeout": self._timeout,
+            "proxy": self._proxy,
+            "verify": True if self._proxy is None else False,
+        }
+
+    def get_client(self, host: str) -> httpx.Client:
+        """Get the pooled client of a host, creating it on first use.
+
+        Parameters
+        ----------
+        host : str
+            Endpoint host.
+
+        Returns
+        -------
+        httpx.Client
+            Client bound to the host.
+        """
+
+        with self._lock:
+            client = self._clients.get(host)
+            if client is None:
+                client = httpx.Client(
+                    base_url=f"https://{host}", **self._client_kwargs()
+                )
+                self._clients[host] = client
+        return client
+
+    def get_async_client(self, host: str) -> httpx.AsyncClient:
+        """Get the pooled asynchronous client of a host, creating it on first use.
+
+        An asynchronous client should only be used within one event loop.
+
+        Parameters
+        ----------
+        host : str
+            Endpoint host.
+
+        Returns
+        -------
+        httpx.AsyncClient
+            Asynchronous client bound to the host.
+        """
+
+        with self._lock:
+            client = self._async_clients.get(host)
+            if client is None:
+                client = httpx.AsyncClient(
+                    base_url=f"https://{host}", **self._client_kwargs()
+                )
+                self._async_clients[host] = client
+        return client
+
+    def close(self) -> None:
+        """Close all pooled synchronous clients. Clients are recreated lazily if the session is used again."""
+
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    async def aclose(self) -> None:
+        """Close all pooled clients, including asynchronous ones."""
+
+        self.close()
+        with self._lock:
+            async_clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        for client in async_clients:
+            await client.aclose()
+
+
+class JciHitachiAWSCircuitOpenError(RuntimeError):
+    """Raised when a request is rejected because the circuit of its endpoint host is open."""
+
+
+class JciHitachiAWSRetryPolicy:
+    """Retry, backoff and circuit breaker policy for AWS http connections.
+
+    Transient failures, i.e. errors raised before a request reached the host and retryable
+    HTTP status codes, are retried with exponential backoff and full jitter. Requests which are
+    not idempotent are only retried if the host cannot have acted on them. After failure_threshold
+    consecutive failed requests to a host, its circuit opens and requests fail fast until
+    reset_timeout has passed, after which one trial request is let through.
+
+    Parameters
+    ----------
+    max_retries : int, optional
+        Maximum number of retries of a transient failure, by default 3.
+    backoff_base : float, optional
+        Backoff of the first retry in seconds, doubled on every retry, by default 0.5.
+    backoff_max : float, optional
+        Maximum backoff in seconds, by default 8.0.
+    retry_status_codes : tuple of int, optional
+        HTTP status codes considered transient, by default (429, 500, 502, 503, 504).
+    retry_errors : tuple of type, optional
+        Transport errors considered transient, by default connection and pool errors,
+        which are raised before the request is sent.
+    failure_threshold : int, optional
+        Consecutive failed requests after which the circuit of a host opens, by default 5.
+    reset_timeout : float, optional
+        Seconds an open circuit rejects requests before letting a trial request through, by default 30.0.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        retry_status_codes: tuple[int, ...] = (429, 500, 502, 503, 504),
+        retry_errors: tuple[type[Exception], ...] = (
+            httpx.ConnectError,
+            httpx.ConnectTimeout,
+            httpx.PoolTimeout,
+        ),
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.max_retries: int = max_retries
+        self.backoff_base: float = backoff_base
+        self.backoff_max: float = backoff_max
+        self.retry_status_codes: tuple[int, ...] = retry_status_codes
+        self.retry_errors: tuple[type[Exception], ...] = retry_errors
+        self.failure_threshold: int = failure_threshold
+        self.reset_timeout: float = reset_timeout
+
+        self._failures: dict[str, int] = {}
+        self._opened_at: dict[str, float] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        """Backoff before a retry.
+
+        Parameters
+        ----------
+        attempt : int
+            Number of retries made so far.
+
+        Returns
+        -------
+        float
+            Seconds to wait.
+        """
+
+        return random() * min(self.backoff_max, self.backoff_base * 2**attempt)
+
+    def is_open(self, host: str) -> bool:
+        """Whether the circuit of a host is open.
+
+        Parameters
+        ----------
+        host : str
+            Endpoint host.
+
+        Returns
+        -------
+        bool
+            Return True if requests to the host currently fail fast.
+        """
+
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            return (
+                opened_at is not None
+                and time.monotonic() - opened_at < self.reset_timeout
+            )
+
+    def before_request(self, host: str) -> None:
+        """Check the circuit of a host before sending a request.
+
+        Parameters
+        ----------
+        host : str
+            Endpoint host.
+
+        Raises
+        ------
+        JciHitachiAWSCircuitOpenError
+            If the circuit of the host is open.
+        """
+
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return
+            if time.monotonic() - opened_at < self.reset_timeout:
+                raise JciHitachiAWSCircuitOpenError(
+                    f"Requests to {host} are suspended after repeated failures."
+                )
+            # Half-open: let this request through as a trial and hold back others.
+            self._opened_at[host] = time.monotonic()
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if failures >= self.failure_threshold:
+                if host not in self._opened_at:
+                    _LOGGER.error(
+                        f"Circuit of {host} opened after {failures} consecutive failures."
+                    )
+                self._opened_at[host] = time.monotonic()
+
+    def retry_delay(
+        self,
+        host: str,
+        attempt: int,
+        response: Optional[httpx.Response],
+        error: Optional[Exception],
+        idempotent: bool = True,
+    ) -> Optional[float]:
+        """Record the outcome of a request and decide whether to retry it.
+
+        A failure is recorded only once the request is given up, so that the circuit
+        counts failed requests rather than attempts.
+
+        Parameters
+        ----------
+        host : str
+            Endpoint host.
+        attempt : int
+            Number of retries made so far.
+        response : httpx.Response or None
+            Response, or None if the request raised an error.
+        error : Exception or None
+            Error raised by the request.
+        idempotent : bool, optional
+            Whether the request can safely be sent again after the host may have acted on it.
+            If False, only errors in retry_errors and HTTP 429 are retried, by default True.
+
+        Returns
+        -------
+        float or None
+            Seconds to wait before retrying, or None if the request should not be retried.
+        """
+
+        if error is None and response.status_code not in self.retry_status_codes:
+            self.record_success(host)
+            return None
+
+        if error is not None:
+            retryable = isinstance(error, self.retry_errors)
+        else:
+            retryable = (
+                idempotent or response.status_code == httpx.codes.too_many_requests
+            )
+        if not retryable or attempt >= self.max_retries or self.is_open(host):
+            self.record_failure(host)
+            return None
+        _LOGGER.debug(
+            f"Retrying a request to {host} after a transient failure: "
+            f"{error if error is not None else response.status_code}"
+        )
+        return self.backoff(attempt)
+
+
 class JciHitachiAWSHttpConnection(ABC):
     """Abstract class for AWS http connections."""
 
+    # Whether a request can safely be retried after the host may have acted on it.
+    _idempotent: bool = True
+
     @abstractmethod
-    def __init__(self, print_response: bool):
+    def __init__(
+        self,
+        print_response: bool,
+        session: Optional[JciHitachiAWSHttpSession] = None,
+        retry_policy: Optional[JciHitachiAWSRetryPolicy] = None,
+    ):
         self._print_response = print_response
+        self._session = session
+        self._retry_policy = retry_policy
+        self._token_refresher: Optional[Callable[[], AWSTokens]] = None
 
     @abstractmethod
     def _generate_headers(self): ...
@@ -87,6 +745,131 @@ class JciHitachiAWSHttpConnection(ABC):
     def get_data(self):
         raise NotImplementedError
 
+    def _post(
+        self,
+        host: str,
+        path: str,
+        json_data: Optional[dict],
+        headers: dict[str, str],
+        proxy: Optional[str] = None,
+    ) -> httpx.Response:
+        if self._session is not None:
+            return self._session.get_client(host).post(
+                path, json=json_data, headers=headers
+            )
+        return httpx.post(
+            f"https://{host}{path}",
+            json=json_data,
+            headers=headers,
+            proxy=proxy,
+            verify=True if proxy is None else False,
+        )
+
+    async def _async_post(
+        self,
+        host: str,
+        path: str,
+        json_data: Optional[dict],
+        headers: dict[str, str],
+        proxy: Optional[str] = None,
+    ) -> httpx.Response:
+        if self._session is not None:
+            return await self._session.get_async_client(host).post(
+                path, json=json_data, headers=headers
+            )
+        async with httpx.AsyncClient(
+            proxy=proxy, verify=True if proxy is None else False
+        ) as client:
+            return await client.post(
+                f"https://{host}{path}", json=json_data, headers=headers
+            )
+
+    def _needs_token_refresh(self, response: httpx.Response) -> bool:
+        return False
+
+    def _refresh_tokens(self) -> None:
+        _LOGGER.debug("Invalid session token, refreshing tokens and replaying.")
+        self._aws_tokens = self._token_refresher()
+
+    def _request(
+        self,
+        host: str,
+        path: str,
+        json_data: Optional[dict],
+        headers_fn: Callable[[], dict[str, str]],
+        proxy: Optional[str] = None,
+    ) -> httpx.Response:
+        policy = self._retry_policy
+        attempt = 0
+        refreshed = False
+        while True:
+            if policy is None:
+                response = self._post(host, path, json_data, headers_fn(), proxy)
+            else:
+                policy.before_request(host)
+                response, error = None, None
+                try:
+                    response = self._post(host, path, json_data, headers_fn(), proxy)
+                except httpx.TransportError as e:
+                    error = e
+
+                delay = policy.retry_delay(
+                    host, attempt, response, error, self._idempotent
+                )
+                if delay is not None:
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+                if error is not None:
+                    raise error
+            # Replaying with renewed tokens does not depend on the retry policy.
+            if not refreshed and self._needs_token_refresh(response):
+                refreshed = True
+                self._refresh_tokens()
+                continue
+            return response
+
+    async def _async_request(
+        self,
+        host: str,
+        path: str,
+        json_data: Optional[dict],
+        headers_fn: Callable[[], dict[str, str]],
+        proxy: Optional[str] = None,
+    ) -> httpx.Response:
+        policy = self._retry_policy
+        attempt = 0
+        refreshed = False
+        while True:
+            if policy is None:
+                response = await self._async_post(
+                    host, path, json_data, headers_fn(), proxy
+                )
+            else:
+                policy.before_request(host)
+                response, error = None, None
+                try:
+                    response = await self._async_post(
+                        host, path, json_data, headers_fn(), proxy
+                    )
+                except httpx.TransportError as e:
+                    error = e
+
+                delay = policy.retry_delay(
+                    host, attempt, response, error, self._idempotent
+                )
+                if delay is not None:
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+                if error is not None:
+                    raise error
+            if not refreshed and self._needs_token_refresh(response):
+                refreshed = True
+                await asyncio.to_thread(self._refresh_tokens)
+                continue
+            return response
+
     def maybe_print_http_response(self, response: httpx.Response) -> None:
         if not self._print_response:
             return
@@ -119,10 +902,18 @@ class JciHitachiAWSCognitoConnection(JciHitachiAWSHttpConnection):
         by default None.
     proxy : str, optional
         Proxy setting. Format:"schema://IP:port", e.g., http://127.0.0.1:8080, by default None.
+        Ignored if session is given.
     print_response : bool, optional
         If set, all responses of httpx will be printed, by default False.
+    session : JciHitachiAWSHttpSession, optional
+        Pooled session used to send requests.
+        If None is given, a new connection is opened for every request, by default None.
+    retry_policy : JciHitachiAWSRetryPolicy, optional
+        Retry and circuit breaker policy. If None is given, requests are not retried, by default None.
     """
 
+    _endpoint: str = AWS_COGNITO_IDP_ENDPOINT
+
     def __init__(
         self,
         email: str,
@@ -130,8 +921,10 @@ class JciHitachiAWSCognitoConnection(JciHitachiAWSHttpConnection):
         aws_tokens: Optional[AWSTokens] = None,
         proxy: Optional[str] = None,
         print_response: bool = False,
+        session: Optional[JciHitachiAWSHttpSession] = None,
+        retry_policy: Optional[JciHitachiAWSRetryPolicy] = None,
     ):
-        super().__init__(print_response)
+        super().__init__(print_response, session, retry_policy)
         self._login_response = None
         self._email = email
         self._password = password
@@ -172,19 +965,9 @@ class JciHitachiAWSCognitoConnection(JciHitachiAWSHttpConnection):
         headers = self._generate_headers(target)
 
         if endpoint is None:
-            endpoint = (
-                AWS_COGNITO_ENDPOINT
-                if self.__class__.__name__ == "GetCredentials"
-                else AWS_COGNITO_IDP_ENDPOINT
-            )
+            endpoint = self._endpoint
 
-        req = httpx.post(
-            f"https://{endpoint}/",
-            json=json_data,
-            headers=headers,
-            proxy=self._proxy,
-            verify=True if self._proxy is None else False,
-        )
+        req = self._request(endpoint, "/", json_data, lambda: headers, self._proxy)
 
         self.maybe_print_http_response(req)
 
@@ -194,8 +977,31 @@ class JciHitachiAWSCognitoConnection(JciHitachiAWSHttpConnection):
     def aws_tokens(self) -> AWSTokens:
         return self._aws_tokens
 
-    def login(self, use_refresh_token: bool = False) -> tuple(str, AWSTokens):
-        """Login API.
+    @staticmethod
+    def is_auth_error(conn_status: str) -> bool:
+        """Whether a status means the tokens or credentials were rejected.
+
+        Other failures, e.g. throttling, server or network errors, may be transient.
+
+        Parameters
+        ----------
+        conn_status : str
+            Status returned by an API.
+
+        Returns
+        -------
+        bool
+            Return True if the tokens or credentials were rejected.
+        """
+
+        return conn_status.startswith("NotAuthorizedException") or conn_status in (
+            "Invalid session token",
+            "HTTP exception 401",
+            "HTTP exception 403",
+        )
+
+    def login(self, use_refresh_token: bool = False) -> tuple(str, AWSTokens):
+        """Login API.
 
         Parameters
         ----------
@@ -209,6 +1015,15 @@ class JciHitachiAWSCognitoConnection(JciHitachiAWSHttpConnection):
             (status, aws tokens).
         """
 
+        login_json_data, use_refresh_token = self._login_json(use_refresh_token)
+        status, response = self._send(
+            "AWSCognitoIdentityProviderService.InitiateAuth",
+            login_json_data,
+            AWS_COGNITO_IDP_ENDPOINT,
+        )
+        return status, self._login_result(status, response, use_refresh_token)
+
+    def _login_json(self, use_refresh_token: bool) -> tuple[dict, bool]:
         # https://docs.aws.amazon.com/cognito-user-identity-pools/latest/APIReference/API_InitiateAuth.html
         if use_refresh_token and self._aws_tokens is not None:
             login_json_data = {
@@ -228,13 +1043,11 @@ class JciHitachiAWSCognitoConnection(JciHitachiAWSHttpConnection):
                 },
                 "ClientId": AWS_COGNITO_CLIENT_ID,
             }
+        return login_json_data, use_refresh_token
 
-        status, response = self._send(
-            "AWSCognitoIdentityProviderService.InitiateAuth",
-            login_json_data,
-            AWS_COGNITO_IDP_ENDPOINT,
-        )
-
+    def _login_result(
+        self, status: str, response: dict, use_refresh_token: bool
+    ) -> Optional[AWSTokens]:
         aws_tokens = None
         if status == "OK":
             auth_result = response["AuthenticationResult"]
@@ -246,7 +1059,7 @@ class JciHitachiAWSCognitoConnection(JciHitachiAWSHttpConnection):
                 else auth_result["RefreshToken"],
                 expiration=time.time() + auth_result["ExpiresIn"],
             )
-        return status, aws_tokens
+        return aws_tokens
 
 
 class ChangePassword(JciHitachiAWSCognitoConnection):
@@ -261,21 +1074,25 @@ class ChangePassword(JciHitachiAWSCognitoConnection):
         User password.
     """
 
+    _target: str = "AWSCognitoIdentityProviderService.ChangePassword"
+    _idempotent: bool = False
+
     def __init__(self, email, password, **kwargs):
         super().__init__(email, password, **kwargs)
 
-    def get_data(self, new_password):
-        json_data = {
+    def _get_data_json(self, new_password: str) -> dict:
+        return {
             "AccessToken": self._aws_tokens.access_token,
             "PreviousPassword": self._password,
             "ProposedPassword": new_password,
         }
 
-        status, response = self._send(
-            "AWSCognitoIdentityProviderService.ChangePassword", json_data
-        )
+    def _get_data_result(self, status: str, response: dict) -> None:
+        return None
 
-        return status, None
+    def get_data(self, new_password):
+        status, response = self._send(self._target, self._get_data_json(new_password))
+        return status, self._get_data_result(status, response)
 
 
 class GetUser(JciHitachiAWSCognitoConnection):
@@ -290,18 +1107,17 @@ class GetUser(JciHitachiAWSCognitoConnection):
         User password.
     """
 
+    _target: str = "AWSCognitoIdentityProviderService.GetUser"
+
     def __init__(self, email, password, **kwargs):
         super().__init__(email, password, **kwargs)
 
-    def get_data(self):
-        json_data = {
+    def _get_data_json(self) -> dict:
+        return {
             "AccessToken": self._aws_tokens.access_token,
         }
 
-        status, response = self._send(
-            "AWSCognitoIdentityProviderService.GetUser", json_data
-        )
-
+    def _get_data_result(self, status: str, response: dict) -> Optional[AWSIdentity]:
         aws_identity = None
         if status == "OK":
             user_attributes = {
@@ -313,7 +1129,11 @@ class GetUser(JciHitachiAWSCognitoConnection):
                 user_name=response["Username"],
                 user_attributes=user_attributes,
             )
-        return status, aws_identity
+        return aws_identity
+
+    def get_data(self):
+        status, response = self._send(self._target, self._get_data_json())
+        return status, self._get_data_result(status, response)
 
 
 class GetCredentials(JciHitachiAWSCognitoConnection):
@@ -327,21 +1147,23 @@ class GetCredentials(JciHitachiAWSCognitoConnection):
         User password.
     """
 
+    _endpoint: str = AWS_COGNITO_ENDPOINT
+    _target: str = "AWSCognitoIdentityService.GetCredentialsForIdentity"
+
     def __init__(self, email, password, **kwargs):
         super().__init__(email, password, **kwargs)
 
-    def get_data(self, aws_identity):
-        json_data = {
+    def _get_data_json(self, aws_identity: AWSIdentity) -> dict:
+        return {
             "IdentityId": aws_identity.identity_id,
             "Logins": {
                 f"{AWS_COGNITO_IDP_ENDPOINT}/{AWS_COGNITO_USERPOOL_ID}": self._aws_tokens.id_token,
             },
         }
 
-        status, response = self._send(
-            "AWSCognitoIdentityService.GetCredentialsForIdentity", json_data
-        )
-
+    def _get_data_result(
+        self, status: str, response: dict
+    ) -> Optional[awscrt.auth.AwsCredentials]:
         aws_credentials = None
         if status == "OK":
             aws_credentials = awscrt.auth.AwsCredentials(
@@ -352,185 +1174,1493 @@ class GetCredentials(JciHitachiAWSCognitoConnection):
                     response["Credentials"]["Expiration"]
                 ),
             )
-        return status, aws_credentials
+        return aws_credentials
 
+    def get_data(self, aws_identity):
+        status, response = self._send(self._target, self._get_data_json(aws_identity))
+        return status, self._get_data_result(status, response)
 
-class JciHitachiAWSIoTConnection(JciHitachiAWSHttpConnection):
-    """Connecting to Jci-Hitachi AWS IoT API.
+
+class AsyncJciHitachiAWSCognitoConnection(JciHitachiAWSCognitoConnection):
+    """Connecting to Jci-Hitachi AWS Cognito API asynchronously.
+
+    Unlike `JciHitachiAWSCognitoConnection`, no login is performed on construction.
+    If aws_tokens is not given, the login procedure is performed on the first request.
 
     Parameters
     ----------
-    aws_tokens : AWSTokens
-        AWS tokens.
+    email : str
+        User email.
+    password : str
+        User password.
+    aws_tokens : AWSTokens, optional
+        If aws_tokens is given, it is used by request, by default None.
     proxy : str, optional
         Proxy setting. Format:"schema://IP:port", e.g., http://127.0.0.1:8080, by default None.
+        Ignored if session is given.
     print_response : bool, optional
         If set, all responses of httpx will be printed, by default False.
+    session : JciHitachiAWSHttpSession, optional
+        Pooled session used to send requests.
+        If None is given, a new connection is opened for every request, by default None.
+    retry_policy : JciHitachiAWSRetryPolicy, optional
+        Retry and circuit breaker policy. If None is given, requests are not retried, by default None.
     """
 
     def __init__(
         self,
-        aws_tokens: AWSTokens,
+        email: str,
+        password: str,
+        aws_tokens: Optional[AWSTokens] = None,
         proxy: Optional[str] = None,
         print_response: bool = False,
+        session: Optional[JciHitachiAWSHttpSession] = None,
+        retry_policy: Optional[JciHitachiAWSRetryPolicy] = None,
     ):
-        super().__init__(print_response)
-        self._aws_tokens = aws_tokens
+        JciHitachiAWSHttpConnection.__init__(
+            self, print_response, session, retry_policy
+        )
+        self._login_response = None
+        self._email = email
+        self._password = password
         self._proxy = proxy
+        self._aws_tokens = aws_tokens
 
-    def _generate_headers(self, need_access_token: bool) -> dict[str, str]:
-        headers = {
-            "authorization": f"Bearer {self._aws_tokens.id_token}",
-            "User-Agent": "Dalvik/2.1.0",
-            "content-type": "application/json",
-            "Accept": "application/json",
-        }
-        if need_access_token:
-            headers["accesstoken"] = f"Bearer {self._aws_tokens.access_token}"
-        return headers
+    async def _send(
+        self, target: str, json_data: Optional[dict] = None, endpoint: str = None
+    ) -> tuple[str, dict]:
+        headers = self._generate_headers(target)
 
-    def _handle_response(self, response: httpx.Response) -> tuple[int, str, dict]:
-        response_json = response.json()
-        if response.status_code == httpx.codes.ok:
-            code = response_json["status"]["code"]
-            if code == 0:
-                return code, "OK", response_json
-            elif code == 6:
-                return code, "Invalid email or password", response_json
-            elif code == 12:
-                return code, "Invalid session token", response_json
-            else:
-                return code, "Unknown error", response_json
-        else:
-            return (
-                response.status_code,
-                f"HTTP exception {response.status_code}",
-                response_json,
-            )
+        if endpoint is None:
+            endpoint = self._endpoint
 
-    def _send(
-        self, api_name: str, json: Optional[dict] = None, need_access_token: bool = True
-    ) -> tuple[str, dict]:
-        req = httpx.post(
-            f"https://{AWS_IOT_ENDPOINT}{api_name}",
-            headers=self._generate_headers(need_access_token),
-            json=json,
-            proxy=self._proxy,
-            verify=True if self._proxy is None else False,
+        req = await self._async_request(
+            endpoint, "/", json_data, lambda: headers, self._proxy
         )
 
         self.maybe_print_http_response(req)
 
-        code, message, response_json = self._handle_response(req)
+        return self._handle_response(req)
 
-        return message, response_json
+    async def _ensure_aws_tokens(self) -> None:
+        if self._aws_tokens is None:
+            conn_status, self._aws_tokens = await self.login()
+            if conn_status != "OK":
+                raise RuntimeError(
+                    f"An error occurred when signing into AWS Cognito Service: {conn_status}"
+                )
 
+    async def login(self, use_refresh_token: bool = False) -> tuple(str, AWSTokens):
+        """Login API.
+
+        Parameters
+        ----------
+        use_refresh_token : bool, optional
+            Whether or not to use AWSTokens.refresh_token to login.
+            If AWSTokens is not provided, fallback to email and password, by default False
+
+        Returns
+        -------
+        (str, AWSTokens)
+            (status, aws tokens).
+        """
+
+        login_json_data, use_refresh_token = self._login_json(use_refresh_token)
+        status, response = await self._send(
+            "AWSCognitoIdentityProviderService.InitiateAuth",
+            login_json_data,
+            AWS_COGNITO_IDP_ENDPOINT,
+        )
+        return status, self._login_result(status, response, use_refresh_token)
 
-class GetAllDevice(JciHitachiAWSIoTConnection):
-    """API internal endpoint.
+
+class AsyncChangePassword(AsyncJciHitachiAWSCognitoConnection, ChangePassword):
+    """Asynchronous counterpart of `ChangePassword`.
 
     Parameters
     ----------
-    aws_tokens : AWSTokens
-        AWS tokens.
+    email : str
+        User email.
+    password : str
+        User password.
     """
 
-    def __init__(self, aws_tokens: AWSTokens, **kwargs):
-        super().__init__(aws_tokens, **kwargs)
+    async def get_data(self, new_password):
+        await self._ensure_aws_tokens()
+        status, response = await self._send(
+            self._target, self._get_data_json(new_password)
+        )
+        return status, self._get_data_result(status, response)
 
-    def get_data(self) -> tuple[str, dict]:
-        return self._send("/GetAllDevice", need_access_token=False)
 
+class AsyncGetUser(AsyncJciHitachiAWSCognitoConnection, GetUser):
+    """Asynchronous counterpart of `GetUser`.
 
-class GetAllGroup(JciHitachiAWSIoTConnection):
-    """API internal endpoint.
+    Parameters
+    ----------
+    email : str
+        User email.
+    password : str
+        User password.
+    """
+
+    async def get_data(self):
+        await self._ensure_aws_tokens()
+        status, response = await self._send(self._target, self._get_data_json())
+        return status, self._get_data_result(status, response)
+
+
+class AsyncGetCredentials(AsyncJciHitachiAWSCognitoConnection, GetCredentials):
+    """Asynchronous counterpart of `GetCredentials`.
 
     Parameters
     ----------
-    aws_tokens : AWSTokens
-        AWS tokens.
+    email : str
+        User email.
+    password : str
+        User password.
     """
 
-    def __init__(self, aws_tokens: AWSTokens, **kwargs):
-        super().__init__(aws_tokens, **kwargs)
+    async def get_data(self, aws_identity):
+        await self._ensure_aws_tokens()
+        status, response = await self._send(
+            self._target, self._get_data_json(aws_identity)
+        )
+        return status, self._get_data_result(status, response)
 
-    def get_data(self) -> tuple[str, dict]:
-        return self._send("/GetAllGroup")
 
+class JciHitachiAWSTokenManager:
+    """Keeping AWSTokens valid by renewing them with the refresh token in the background.
 
-class GetAllRegion(JciHitachiAWSIoTConnection):
-    """API internal endpoint.
+    Password authentication is only used if there are no tokens yet or the refresh token is rejected.
 
     Parameters
     ----------
-    aws_tokens : AWSTokens
-        AWS tokens.
+    email : str
+        User email.
+    password : str
+        User password.
+    aws_tokens : AWSTokens, optional
+        Current AWS tokens, by default None.
+    renew_before : float, optional
+        Seconds before expiration to renew tokens, by default 300.0.
+    jitter : float, optional
+        Maximum random seconds added to renew_before, which spreads renewals of many managers, by default 60.0.
+    retry_interval : float, optional
+        Seconds to wait before retrying a failed background renewal, by default 30.0.
+    on_renewed : Callable, optional
+        Callable which takes the renewed AWSTokens, by default None.
+    proxy : str, optional
+        Proxy setting. Format:"schema://IP:port", e.g., http://127.0.0.1:8080, by default None.
+    print_response : bool, optional
+        If set, all responses of httpx will be printed, by default False.
+    session : JciHitachiAWSHttpSession, optional
+        Pooled session used to send requests, by default None.
+    single_flight : JciHitachiSingleFlight, optional
+        Coordinator merging concurrent renewals into one Cognito login.
+        If None is given, a new coordinator is created, by default None.
+    retry_policy : JciHitachiAWSRetryPolicy, optional
+        Retry and circuit breaker policy, by default None.
     """
 
-    def __init__(self, aws_tokens: AWSTokens, **kwargs):
-        super().__init__(aws_tokens, **kwargs)
+    def __init__(
+        self,
+        email: str,
+        password: str,
+        aws_tokens: Optional[AWSTokens] = None,
+        renew_before: float = 300.0,
+        jitter: float = 60.0,
+        retry_interval: float = 30.0,
+        on_renewed: Optional[Callable[[AWSTokens], None]] = None,
+        proxy: Optional[str] = None,
+        print_response: bool = False,
+        session: Optional[JciHitachiAWSHttpSession] = None,
+        single_flight: Optional[JciHitachiSingleFlight] = None,
+        retry_policy: Optional[JciHitachiAWSRetryPolicy] = None,
+    ):
+        self._email: str = email
+        self._password: str = password
+        self._aws_tokens: Optional[AWSTokens] = aws_tokens
+        self._renew_before: float = renew_before
+        self._jitter: float = jitter
+        self._retry_interval: float = retry_interval
+        self._on_renewed: Optional[Callable[[AWSTokens], None]] = on_renewed
+        self._proxy: Optional[str] = proxy
+        self._print_response: bool = print_response
+        self._session: Optional[JciHitachiAWSHttpSession] = session
+        self._single_flight: JciHitachiSingleFlight = (
+            single_flight or JciHitachiSingleFlight()
+        )
+        self._retry_policy: Optional[JciHitachiAWSRetryPolicy] = retry_policy
+
+        self._timer: Optional[threading.Timer] = None
+        self._running: bool = False
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def aws_tokens(self) -> Optional[AWSTokens]:
+        """Current AWS tokens.
+
+        Returns
+        -------
+        AWSTokens or None
+            AWS tokens.
+        """
+
+        return self._aws_tokens
+
+    @aws_tokens.setter
+    def aws_tokens(self, x: Optional[AWSTokens]) -> None:
+        self._aws_tokens = x
+        self._schedule()
+
+    @property
+    def running(self) -> bool:
+        """Whether background renewal is running.
+
+        Returns
+        -------
+        bool
+            Return True if background renewal is running.
+        """
+
+        return self._running
+
+    def needs_renewal(self, margin: Optional[float] = None) -> bool:
+        """Whether tokens are missing or expire within a margin.
+
+        Parameters
+        ----------
+        margin : float, optional
+            Seconds before expiration. If None is given, renew_before is used, by default None.
+
+        Returns
+        -------
+        bool
+            Return True if tokens need to be renewed.
+        """
+
+        margin = self._renew_before if margin is None else margin
+        return (
+            self._aws_tokens is None
+            or self._aws_tokens.expiration - time.time() <= margin
+        )
+
+    def needs_sync_renewal(self) -> bool:
+        """Whether `ensure_valid` would renew tokens synchronously.
+
+        While background renewal is running, tokens are only renewed synchronously
+        if the background renewal has not happened in time.
+
+        Returns
+        -------
+        bool
+            Return True if tokens need to be renewed synchronously.
+        """
+
+        return self.needs_renewal(
+            self._retry_interval if self._running else self._renew_before
+        )
+
+    def _login(self) -> tuple[str, Optional[AWSTokens]]:
+        if self._aws_tokens is not None:
+            conn = JciHitachiAWSCognitoConnection(
+                email=self._email,
+                password=self._password,
+                aws_tokens=self._aws_tokens,
+                proxy=self._proxy,
+                print_response=self._print_response,
+                session=self._session,
+                retry_policy=self._retry_policy,
+            )
+            conn_status, aws_tokens = conn.login(use_refresh_token=True)
+            # Transient failures are retried later rather than spending a password login.
+            if conn_status == "OK" or not conn.is_auth_error(conn_status):
+                return conn_status, aws_tokens
+            _LOGGER.info(
+                f"The refresh token was rejected, falling back to password authentication: {conn_status}"
+            )
+            return conn.login(use_refresh_token=False)
+
+        try:
+            conn = JciHitachiAWSCognitoConnection(
+                email=self._email,
+                password=self._password,
+                proxy=self._proxy,
+                print_response=self._print_response,
+                session=self._session,
+                retry_policy=self._retry_policy,
+            )
+        except RuntimeError as e:
+            return str(e), None
+        return "OK", conn.aws_tokens
+
+    def renew(self) -> AWSTokens:
+        """Renew tokens now.
+
+        If a renewal is already in flight, wait for it and return its result instead.
+
+        Returns
+        -------
+        AWSTokens
+            Renewed AWS tokens.
+
+        Raises
+        ------
+        RuntimeError
+            If renewal fails, RuntimeError will be raised.
+        """
+
+        return self._single_flight.do(("renew", self._email), self._renew)
+
+    def _renew(self) -> AWSTokens:
+        conn_status, aws_tokens = self._login()
+        if conn_status != "OK":
+            raise RuntimeError(
+                f"An error occurred when reauthenticating with AWS Cognito Service: {conn_status}"
+            )
+        self._aws_tokens = aws_tokens
+
+        self._schedule()
+        if self._on_renewed is not None:
+            self._on_renewed(aws_tokens)
+        return aws_tokens
+
+    def ensure_valid(self) -> AWSTokens:
+        """Renew tokens synchronously only if they are about to expire.
+
+        While background renewal is running, tokens are renewed synchronously only
+        if the background renewal has not happened in time.
+
+        Returns
+        -------
+        AWSTokens
+            Valid AWS tokens.
+        """
+
+        if self.needs_sync_renewal():
+            # Tokens renewed by a call that finished meanwhile are not renewed again.
+            return self._single_flight.do(
+                ("renew", self._email),
+                self._renew,
+                check=lambda: None if self.needs_sync_renewal() else self._aws_tokens,
+            )
+        return self._aws_tokens
+
+    def _schedule(self, delay: Optional[float] = None) -> None:
+        if delay is None:
+            if self._aws_tokens is None:
+                delay = 0.0
+            else:
+                delay = max(
+                    0.0,
+                    self._aws_tokens.expiration
+                    - time.time()
+                    - self._renew_before
+                    - random() * self._jitter,
+                )
+
+        # Checked under the lock, so that a timer is never left running after stop().
+        with self._lock:
+            if not self._running:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self._background_renew)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _background_renew(self) -> None:
+        if not self._running:
+            return
+        try:
+            self.renew()
+        except Exception as e:
+            _LOGGER.error(f"Background token renewal failed: {e}")
+            self._schedule(self._retry_interval)
+
+    def start(self) -> None:
+        """Start background renewal."""
+
+        with self._lock:
+            self._running = True
+        self._schedule()
+
+    def stop(self) -> None:
+        """Stop background renewal."""
+
+        with self._lock:
+            self._running = False
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+class JciHitachiAWSCredentialsCache:
+    """Caching AwsCredentials by identity until close to their expiration.
+
+    The next credentials are fetched by a timer before the cached ones expire, so that
+    awscrt rarely has to wait for GetCredentialsForIdentity when it reconnects.
+
+    Parameters
+    ----------
+    fetch_callable : Callable
+        Callable which takes an AWSIdentity and returns new AwsCredentials or None.
+    refresh_before : float, optional
+        Seconds before expiration from which cached credentials are no longer returned, by default 60.0.
+    prefetch_before : float, optional
+        Seconds before expiration from which the next credentials are prefetched in the background, by default 300.0.
+    single_flight : JciHitachiSingleFlight, optional
+        Coordinator merging concurrent fetches of an identity into one call.
+        If None is given, a new coordinator is created, by default None.
+    """
+
+    def __init__(
+        self,
+        fetch_callable: Callable[[AWSIdentity], Optional[awscrt.auth.AwsCredentials]],
+        refresh_before: float = 60.0,
+        prefetch_before: float = 300.0,
+        single_flight: Optional[JciHitachiSingleFlight] = None,
+    ):
+        self._fetch_callable = fetch_callable
+        self._refresh_before: float = refresh_before
+        self._prefetch_before: float = prefetch_before
+        self._credentials: dict[str, awscrt.auth.AwsCredentials] = {}
+        self._prefetching: set[str] = set()
+        self._timers: dict[str, threading.Timer] = {}
+        self._closed: bool = False
+        self._lock: threading.Lock = threading.Lock()
+        self._single_flight: JciHitachiSingleFlight = (
+            single_flight or JciHitachiSingleFlight()
+        )
+
+    def _remaining(self, aws_credentials: awscrt.auth.AwsCredentials) -> float:
+        if aws_credentials.expiration is None:
+            return float("inf")
+        return aws_credentials.expiration.timestamp() - time.time()
+
+    def _fetch(
+        self,
+        aws_identity: AWSIdentity,
+        check: Optional[Callable[[], Optional[awscrt.auth.AwsCredentials]]] = None,
+    ) -> Optional[awscrt.auth.AwsCredentials]:
+        def fn():
+            aws_credentials = self._fetch_callable(aws_identity)
+            if aws_credentials is not None:
+                with self._lock:
+                    self._credentials[aws_identity.identity_id] = aws_credentials
+                self._schedule_prefetch(aws_identity, aws_credentials)
+            return aws_credentials
+
+        return self._single_flight.do(
+            ("credentials", aws_identity.identity_id), fn, check
+        )
+
+    def _valid(self, aws_identity: AWSIdentity) -> Optional[awscrt.auth.AwsCredentials]:
+        with self._lock:
+            aws_credentials = self._credentials.get(aws_identity.identity_id)
+        if (
+            aws_credentials is not None
+            and self._remaining(aws_credentials) > self._refresh_before
+        ):
+            return aws_credentials
+        return None
+
+    def _schedule_prefetch(
+        self, aws_identity: AWSIdentity, aws_credentials: awscrt.auth.AwsCredentials
+    ) -> None:
+        remaining = self._remaining(aws_credentials)
+        if remaining == float("inf"):
+            return
+        delay = remaining - self._prefetch_before
+        if delay <= 0:
+            # Short-lived credentials are renewed halfway to the refresh deadline.
+            delay = max(0.0, (remaining - self._refresh_before) / 2)
+
+        with self._lock:
+            if self._closed:
+                return
+            timer = self._timers.pop(aws_identity.identity_id, None)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(delay, self._prefetch, args=(aws_identity,))
+            timer.daemon = True
+            self._timers[aws_identity.identity_id] = timer
+        timer.start()
+
+    def _prefetch(self, aws_identity: AWSIdentity) -> None:
+        with self._lock:
+            if aws_identity.identity_id in self._prefetching:
+                return
+            self._prefetching.add(aws_identity.identity_id)
+
+        def fn():
+            try:
+                self._fetch(aws_identity)
+            except Exception as e:
+                _LOGGER.error(f"Prefetching AwsCredentials failed: {e}")
+            finally:
+                with self._lock:
+                    self._prefetching.discard(aws_identity.identity_id)
+
+        threading.Thread(target=fn, daemon=True).start()
+
+    def get(self, aws_identity: AWSIdentity) -> Optional[awscrt.auth.AwsCredentials]:
+        """Get credentials of an identity, fetching new ones only if the cached ones are about to expire.
+
+        Parameters
+        ----------
+        aws_identity : AWSIdentity
+            AWS identity.
+
+        Returns
+        -------
+        AwsCredentials or None
+            AWS credentials, or None if they cannot be acquired.
+        """
+
+        aws_credentials = self._valid(aws_identity)
+        if aws_credentials is not None:
+            if self._remaining(aws_credentials) <= self._prefetch_before:
+                self._prefetch(aws_identity)
+            return aws_credentials
+
+        return self._fetch(aws_identity, lambda: self._valid(aws_identity))
+
+    def invalidate(self, identity_id: Optional[str] = None) -> None:
+        """Drop cached credentials.
+
+        Parameters
+        ----------
+        identity_id : str, optional
+            Identity ID. If None is given, credentials of all identities are dropped, by default None.
+        """
+
+        with self._lock:
+            if identity_id is None:
+                self._credentials.clear()
+            else:
+                self._credentials.pop(identity_id, None)
+
+    def close(self) -> None:
+        """Cancel scheduled prefetches."""
+
+        with self._lock:
+            self._closed = True
+            timers, self._timers = list(self._timers.values()), {}
+        for timer in timers:
+            timer.cancel()
+
+
+class JciHitachiAWSIoTConnection(JciHitachiAWSHttpConnection):
+    """Connecting to Jci-Hitachi AWS IoT API.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    proxy : str, optional
+        Proxy setting. Format:"schema://IP:port", e.g., http://127.0.0.1:8080, by default None.
+        Ignored if session is given.
+    print_response : bool, optional
+        If set, all responses of httpx will be printed, by default False.
+    session : JciHitachiAWSHttpSession, optional
+        Pooled session used to send requests.
+        If None is given, a new connection is opened for every request, by default None.
+    retry_policy : JciHitachiAWSRetryPolicy, optional
+        Retry and circuit breaker policy. If None is given, requests are not retried, by default None.
+    token_refresher : Callable, optional
+        Callable which takes no arguments and returns renewed AWSTokens.
+        If given, a request answered with an invalid session token (code 12)
+        or HTTP 401 is replayed once with renewed tokens, regardless of retry_policy,
+        by default None.
+    """
+
+    def __init__(
+        self,
+        aws_tokens: AWSTokens,
+        proxy: Optional[str] = None,
+        print_response: bool = False,
+        session: Optional[JciHitachiAWSHttpSession] = None,
+        retry_policy: Optional[JciHitachiAWSRetryPolicy] = None,
+        token_refresher: Optional[Callable[[], AWSTokens]] = None,
+    ):
+        super().__init__(print_response, session, retry_policy)
+        self._aws_tokens = aws_tokens
+        self._proxy = proxy
+        self._token_refresher = token_refresher
+
+    def _needs_token_refresh(self, response: httpx.Response) -> bool:
+        if self._token_refresher is None:
+            return False
+        if response.status_code == httpx.codes.unauthorized:
+            return True
+        if response.status_code == httpx.codes.ok:
+            try:
+                return response.json()["status"]["code"] == 12
+            except (ValueError, KeyError, TypeError):
+                return False
+        return False
+
+    def _generate_headers(self, need_access_token: bool) -> dict[str, str]:
+        headers = {
+            "authorization": f"Bearer {self._aws_tokens.id_token}",
+            "User-Agent": "Dalvik/2.1.0",
+            "content-type": "application/json",
+            "Accept": "application/json",
+        }
+        if need_access_token:
+            headers["accesstoken"] = f"Bearer {self._aws_tokens.access_token}"
+        return headers
+
+    def _handle_response(self, response: httpx.Response) -> tuple[int, str, dict]:
+        response_json = response.json()
+        if response.status_code == httpx.codes.ok:
+            code = response_json["status"]["code"]
+            if code == 0:
+                return code, "OK", response_json
+            elif code == 6:
+                return code, "Invalid email or password", response_json
+            elif code == 12:
+                return code, "Invalid session token", response_json
+            else:
+                return code, "Unknown error", response_json
+        else:
+            return (
+                response.status_code,
+                f"HTTP exception {response.status_code}",
+                response_json,
+            )
+
+    def _send(
+        self, api_name: str, json: Optional[dict] = None, need_access_token: bool = True
+    ) -> tuple[str, dict]:
+        req = self._request(
+            AWS_IOT_ENDPOINT,
+            api_name,
+            json,
+            lambda: self._generate_headers(need_access_token),
+            self._proxy,
+        )
+
+        self.maybe_print_http_response(req)
+
+        code, message, response_json = self._handle_response(req)
+
+        return message, response_json
+
+
+class GetAllDevice(JciHitachiAWSIoTConnection):
+    """API internal endpoint.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+    def __init__(self, aws_tokens: AWSTokens, **kwargs):
+        super().__init__(aws_tokens, **kwargs)
+
+    def get_data(self) -> tuple[str, dict]:
+        return self._send("/GetAllDevice", need_access_token=False)
+
+
+class GetAllGroup(JciHitachiAWSIoTConnection):
+    """API internal endpoint.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+    def __init__(self, aws_tokens: AWSTokens, **kwargs):
+        super().__init__(aws_tokens, **kwargs)
+
+    def get_data(self) -> tuple[str, dict]:
+        return self._send("/GetAllGroup")
+
+
+class GetAllRegion(JciHitachiAWSIoTConnection):
+    """API internal endpoint.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+    def __init__(self, aws_tokens: AWSTokens, **kwargs):
+        super().__init__(aws_tokens, **kwargs)
+
+    def get_data(self) -> tuple[str, dict]:
+        return self._send("/GetAllRegion", need_access_token=False)
+
+
+class GetAvailableAggregationMonthlyData(JciHitachiAWSIoTConnection):
+    """API internal endpoint.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+    def __init__(self, aws_tokens: AWSTokens, **kwargs):
+        super().__init__(aws_tokens, **kwargs)
+
+    def get_data(
+        self, thing_name: str, time_start: int, time_end: int
+    ) -> tuple[str, dict]:
+        json_data = {
+            "ThingName": thing_name,
+            "TimeStart": time_start,
+            "TimeEnd": time_end,
+        }
+        return self._send("/GetAvailableAggregationMonthlyData", json_data)
+
+
+class GetHistoryEventByUser(JciHitachiAWSIoTConnection):
+    """API internal endpoint.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+    def __init__(self, aws_tokens: AWSTokens, **kwargs):
+        super().__init__(aws_tokens, **kwargs)
+
+    def get_data(self, time_start: int, time_end: int) -> tuple[str, dict]:
+        json_data = {
+            "TimeStart": time_start,
+            "TimeEnd": time_end,
+        }
+        return self._send("/GetHistoryEventByUser", json_data)
+
+    @staticmethod
+    def _windows(
+        time_start: int, time_end: int, window: int, checkpoint: Optional[int]
+    ) -> Iterator[tuple[int, int]]:
+        if window <= 0:
+            raise ValueError("window must be positive.")
+        if checkpoint is not None:
+            time_start = max(time_start, checkpoint)
+        while time_start < time_end:
+            window_end = min(time_start + window, time_end)
+            yield time_start, window_end
+            time_start = window_end
+
+    @staticmethod
+    def _window_events(
+        conn_status: str, response: dict, checkpoint: Optional[int]
+    ) -> list[dict]:
+        if conn_status != "OK":
+            raise RuntimeError(
+                f"An error occurred when getting history events: {conn_status}"
+            )
+        events = response.get("results", {}).get("Data") or []
+        if checkpoint is not None:
+            events = [event for event in events if event["Timestamp"] > checkpoint]
+        return sorted(events, key=lambda event: event["Timestamp"])
+
+    def iter_events(
+        self,
+        time_start: int,
+        time_end: int,
+        window: int = 86400000,
+        max_concurrency: int = 4,
+        checkpoint: Optional[int] = None,
+    ) -> Iterator[dict]:
+        """Iterate over history events of a long time range.
+
+        The range is split into windows fetched concurrently, at most max_concurrency
+        at a time, and events are yielded in time order. Only the windows in flight are
+        held in memory. Events are read from `results.Data` of each response and ordered
+        by their `Timestamp`.
+
+        Parameters
+        ----------
+        time_start : int
+            Start of the range, in milliseconds since epoch.
+        time_end : int
+            End of the range, in milliseconds since epoch.
+        window : int, optional
+            Length of a window in milliseconds, by default 86400000 (1 day).
+        max_concurrency : int, optional
+            Maximum number of windows fetched at the same time, by default 4.
+        checkpoint : int, optional
+            Timestamp of the last event already processed. Iteration resumes after it,
+            by default None.
+
+        Yields
+        ------
+        dict
+            History event.
+
+        Raises
+        ------
+        RuntimeError
+            If a window cannot be fetched.
+        """
+
+        windows = self._windows(time_start, time_end, window, checkpoint)
+        pending: deque[concurrent.futures.Future] = deque()
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, max_concurrency)
+        ) as executor:
+            try:
+                for window_start, window_end in windows:
+                    pending.append(
+                        executor.submit(self.get_data, window_start, window_end)
+                    )
+                    if len(pending) < max_concurrency:
+                        continue
+                    yield from self._window_events(
+                        *pending.popleft().result(), checkpoint
+                    )
+                while pending:
+                    yield from self._window_events(
+                        *pending.popleft().result(), checkpoint
+                    )
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+class ListSubUser(JciHitachiAWSIoTConnection):
+    """API internal endpoint.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+    def __init__(self, aws_tokens: AWSTokens, **kwargs):
+        super().__init__(aws_tokens, **kwargs)
+
+    def get_data(self) -> tuple[str, dict]:
+        return self._send("/ListSubUser")
+
+
+class AsyncJciHitachiAWSIoTConnection(JciHitachiAWSIoTConnection):
+    """Connecting to Jci-Hitachi AWS IoT API asynchronously.
+
+    Asynchronous endpoints reuse `get_data` of their synchronous counterparts,
+    which return the awaitable produced by `_send`.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    proxy : str, optional
+        Proxy setting. Format:"schema://IP:port", e.g., http://127.0.0.1:8080, by default None.
+        Ignored if session is given.
+    print_response : bool, optional
+        If set, all responses of httpx will be printed, by default False.
+    session : JciHitachiAWSHttpSession, optional
+        Pooled session used to send requests.
+        If None is given, a new connection is opened for every request, by default None.
+    retry_policy : JciHitachiAWSRetryPolicy, optional
+        Retry and circuit breaker policy. If None is given, requests are not retried, by default None.
+    token_refresher : Callable, optional
+        Callable which takes no arguments and returns renewed AWSTokens, by default None.
+    """
+
+    async def _send(
+        self, api_name: str, json: Optional[dict] = None, need_access_token: bool = True
+    ) -> tuple[str, dict]:
+        req = await self._async_request(
+            AWS_IOT_ENDPOINT,
+            api_name,
+            json,
+            lambda: self._generate_headers(need_access_token),
+            self._proxy,
+        )
+
+        self.maybe_print_http_response(req)
+
+        code, message, response_json = self._handle_response(req)
+
+        return message, response_json
+
+
+class AsyncGetAllDevice(AsyncJciHitachiAWSIoTConnection, GetAllDevice):
+    """Asynchronous counterpart of `GetAllDevice`.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+
+class AsyncGetAllGroup(AsyncJciHitachiAWSIoTConnection, GetAllGroup):
+    """Asynchronous counterpart of `GetAllGroup`.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+
+class AsyncGetAllRegion(AsyncJciHitachiAWSIoTConnection, GetAllRegion):
+    """Asynchronous counterpart of `GetAllRegion`.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+
+class AsyncGetAvailableAggregationMonthlyData(
+    AsyncJciHitachiAWSIoTConnection, GetAvailableAggregationMonthlyData
+):
+    """Asynchronous counterpart of `GetAvailableAggregationMonthlyData`.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+
+class AsyncGetHistoryEventByUser(
+    AsyncJciHitachiAWSIoTConnection, GetHistoryEventByUser
+):
+    """Asynchronous counterpart of `GetHistoryEventByUser`.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+    async def iter_events(
+        self,
+        time_start: int,
+        time_end: int,
+        window: int = 86400000,
+        max_concurrency: int = 4,
+        checkpoint: Optional[int] = None,
+    ) -> AsyncIterator[dict]:
+        """Asynchronously iterate over history events of a long time range.
+
+        See `GetHistoryEventByUser.iter_events`.
+        """
+
+        windows = self._windows(time_start, time_end, window, checkpoint)
+        pending: deque[asyncio.Task] = deque()
+        try:
+            for window_start, window_end in windows:
+                pending.append(
+                    asyncio.ensure_future(self.get_data(window_start, window_end))
+                )
+                if len(pending) < max_concurrency:
+                    continue
+                for event in self._window_events(
+                    *(await pending.popleft()), checkpoint
+                ):
+                    yield event
+            while pending:
+                for event in self._window_events(
+                    *(await pending.popleft()), checkpoint
+                ):
+                    yield event
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+class AsyncListSubUser(AsyncJciHitachiAWSIoTConnection, ListSubUser):
+    """Asynchronous counterpart of `ListSubUser`.
+
+    Parameters
+    ----------
+    aws_tokens : AWSTokens
+        AWS tokens.
+    """
+
+
+class JciHitachiAWSRequestCorrelator:
+    """Matching MQTT responses to the requests awaiting them.
+
+    Each in-flight request owns a future keyed by thing name, request type and a
+    correlation token echoed in its response, e.g. `TaskID` of a control request or the
+    client token of a shadow request. A response resolves the request with the same token.
+    A response without a token, e.g. a status response, resolves the oldest request instead.
+    A response with an unknown token resolves nothing.
+    """
+
+    def __init__(self):
+        self._pending: dict[
+            tuple[str, str], list[tuple[Hashable, concurrent.futures.Future]]
+        ] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def register(
+        self, thing_name: str, kind: str, token: Hashable
+    ) -> concurrent.futures.Future:
+        """Register an in-flight request.
+
+        Parameters
+        ----------
+        thing_name : str
+            Thing name.
+        kind : str
+            Request type, e.g. `status`, `support`, `control` or `shadow`.
+        token : Hashable
+            Correlation token.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future resolved with the response.
+        """
+
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._pending.setdefault((thing_name, kind), []).append((token, future))
+        return future
+
+    def resolve(
+        self, thing_name: str, kind: str, result: Any, token: Hashable = None
+    ) -> bool:
+        """Resolve the request a response belongs to.
+
+        Parameters
+        ----------
+        thing_name : str
+            Thing name.
+        kind : str
+            Request type.
+        result : Any
+            Response.
+        token : Hashable, optional
+            Correlation token carried in the response, by default None.
+
+        Returns
+        -------
+        bool
+            Return True if a request was resolved.
+        """
+
+        with self._lock:
+            pending = self._pending.get((thing_name, kind))
+            if not pending:
+                return False
+            index = next(
+                (i for i, (t, _) in enumerate(pending) if t == token),
+                0 if token is None else None,
+            )
+            if index is None:
+                return False
+            _, future = pending.pop(index)
+            if not pending:
+                del self._pending[(thing_name, kind)]
+        if not future.done():
+            future.set_result(result)
+        return True
+
+    def discard(self, thing_name: str, kind: str, future: concurrent.futures.Future):
+        """Remove a request which is no longer awaited.
+
+        Parameters
+        ----------
+        thing_name : str
+            Thing name.
+        kind : str
+            Request type.
+        future : concurrent.futures.Future
+            Future returned by `register`.
+        """
+
+        with self._lock:
+            pending = self._pending.get((thing_name, kind))
+            if not pending:
+                return
+            pending[:] = [(t, f) for t, f in pending if f is not future]
+            if not pending:
+                del self._pending[(thing_name, kind)]
+
+    def pending(self, thing_name: str, kind: str) -> int:
+        with self._lock:
+            return len(self._pending.get((thing_name, kind), []))
+
+
+class JciHitachiAWSRateLimiter:
+    """Token bucket rate limiter pacing MQTT publishes.
+
+    Every publish takes one token from the global bucket, one from the bucket of its account
+    and one from the bucket of its thing. Publishes go out immediately while the buckets have
+    tokens and are delayed until tokens are refilled otherwise. The limiter is thread-safe and
+    can be shared by multiple connections, in which case accounts are still limited separately
+    and the global bucket caps publishes of all accounts together.
+
+    Publishes are not limited by default. AWS IoT Core allows 100 publishes per second
+    per connection, so rates are only needed to go easy on the devices.
+
+    Parameters
+    ----------
+    rate : float or None, optional
+        Sustained publishes per second of an account. If None is given, accounts are not limited, by default None.
+    burst : int, optional
+        Maximum publishes of an account sent without delay, by default 10.
+    thing_rate : float or None, optional
+        Sustained publishes per second of a thing. If None is given, things are not limited, by default None.
+    thing_burst : int, optional
+        Maximum publishes of a thing sent without delay, by default 3.
+    global_rate : float or None, optional
+        Sustained publishes per second of all accounts together.
+        If None is given, the total is not limited, by default None.
+    global_burst : int, optional
+        Maximum publishes of all accounts together sent without delay, by default 100.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: int = 10,
+        thing_rate: Optional[float] = None,
+        thing_burst: int = 3,
+        global_rate: Optional[float] = None,
+        global_burst: int = 100,
+    ):
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive.")
+        if thing_rate is not None and thing_rate <= 0:
+            raise ValueError("thing_rate must be positive.")
+        if global_rate is not None and global_rate <= 0:
+            raise ValueError("global_rate must be positive.")
+        if burst < 1 or thing_burst < 1 or global_burst < 1:
+            raise ValueError("burst, thing_burst and global_burst must be at least 1.")
+
+        self.rate: Optional[float] = rate
+        self.burst: int = burst
+        self.thing_rate: Optional[float] = thing_rate
+        self.thing_burst: int = thing_burst
+        self.global_rate: Optional[float] = global_rate
+        self.global_burst: int = global_burst
+
+        # key -> (tokens, last refill time)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def _take(self, key: str, rate: float, burst: int, now: float) -> float:
+        tokens, last = self._buckets.get(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - last) * rate) - 1
+        self._buckets[key] = (tokens, now)
+        return max(0.0, -tokens / rate)
+
+    def reserve(
+        self, thing_name: Optional[str] = None, identity_id: Optional[str] = None
+    ) -> float:
+        """Reserve a publish.
+
+        Parameters
+        ----------
+        thing_name : str, optional
+            Thing name of the publish, by default None.
+        identity_id : str, optional
+            Identity ID of the account publishing, by default None.
+
+        Returns
+        -------
+        float
+            Seconds to wait before publishing.
+        """
+
+        now = time.monotonic()
+        delay = 0.0
+        with self._lock:
+            if self.global_rate is not None:
+                delay = self._take("global", self.global_rate, self.global_burst, now)
+            if self.rate is not None:
+                delay = max(
+                    delay,
+                    self._take(f"account:{identity_id}", self.rate, self.burst, now),
+                )
+            if self.thing_rate is not None and thing_name is not None:
+                delay = max(
+                    delay,
+                    self._take(
+                        f"thing:{thing_name}", self.thing_rate, self.thing_burst, now
+                    ),
+                )
+        return delay
+
+    async def acquire(
+        self, thing_name: Optional[str] = None, identity_id: Optional[str] = None
+    ) -> None:
+        """Wait until a publish is allowed.
+
+        Parameters
+        ----------
+        thing_name : str, optional
+            Thing name of the publish, by default None.
+        identity_id : str, optional
+            Identity ID of the account publishing, by default None.
+        """
+
+        delay = self.reserve(thing_name, identity_id)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class JciHitachiAWSMessageQueue:
+    """Bounded queue handing received MQTT messages from awscrt callbacks to worker threads.
+
+    Callbacks only enqueue messages, so slow processing never stalls the native network thread.
+    Messages with the same key, e.g. the same thing, are processed one at a time in arrival order.
+    When the queue is full, the oldest queued message with the same drop key, e.g. the same thing
+    and message kind, is dropped so the latest value wins; if there is none, the oldest message
+    is dropped. A status message therefore never replaces a control response of the same thing.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of queued messages, by default 1000.
+    workers : int, optional
+        Number of worker threads, by default 1.
+    """
+
+    def __init__(self, maxsize: int = 1000, workers: int = 1):
+        self.maxsize: int = maxsize
+        self.workers: int = workers
+
+        self._queue: deque[tuple[Hashable, Hashable, Callable, tuple]] = deque()
+        self._active_keys: set[Hashable] = set()
+        self._condition: threading.Condition = threading.Condition()
+        self._running: int = 0
+        self._closed: bool = False
+        self._dropped: int = 0
+        self._processed: int = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of queued messages."""
+
+        with self._condition:
+            return len(self._queue)
+
+    @property
+    def dropped(self) -> int:
+        """Number of messages dropped because the queue was full."""
+
+        with self._condition:
+            return self._dropped
+
+    @property
+    def processed(self) -> int:
+        """Number of messages processed."""
+
+        with self._condition:
+            return self._processed
+
+    def put(
+        self, key: Hashable, fn: Callable, *args, drop_key: Hashable = None
+    ) -> None:
+        """Queue a message.
+
+        Parameters
+        ----------
+        key : Hashable
+            Message key, e.g. thing name.
+        fn : Callable
+            Callable processing the message.
+        *args
+            Arguments of fn.
+        drop_key : Hashable, optional
+            Key of messages superseding each other, e.g. thing name and message kind.
+            If None is given, key is used, by default None.
+        """
+
+        if drop_key is None:
+            drop_key = key
+        with self._condition:
+            if len(self._queue) >= self.maxsize:
+                index = next(
+                    (i for i, item in enumerate(self._queue) if item[1] == drop_key),
+                    0,
+                )
+                del self._queue[index]
+                self._dropped += 1
+                _LOGGER.warning("MQTT message queue is full, dropping a message.")
+            self._queue.append((key, drop_key, fn, args))
+            self._closed = False
+            while self._running < self.workers:
+                threading.Thread(
+                    target=self._work,
+                    name=f"JciHitachiAWSMessageWorker-{self._running}",
+                    daemon=True,
+                ).start()
+                self._running += 1
+            self._condition.notify()
+
+    def _next(self) -> Optional[tuple[Hashable, Hashable, Callable, tuple]]:
+        for i, item in enumerate(self._queue):
+            if item[0] not in self._active_keys:
+                del self._queue[i]
+                self._active_keys.add(item[0])
+                return item
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                item = self._next()
+                while item is None:
+                    if self._closed:
+                        self._running -= 1
+                        return
+                    self._condition.wait()
+                    item = self._next()
+
+            key, _, fn, args = item
+            try:
+                fn(*args)
+            except Exception as e:
+                _LOGGER.error(f"An error occurred when processing a MQTT message: {e}")
+            finally:
+                with self._condition:
+                    self._active_keys.discard(key)
+                    self._processed += 1
+                    self._condition.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued messages are processed.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Timeout in seconds, by default None.
+
+        Returns
+        -------
+        bool
+            Return True if the queue is drained, otherwise False on timeout.
+        """
+
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._queue and not self._active_keys, timeout
+            )
+
+    def close(self) -> None:
+        """Stop worker threads once queued messages are processed."""
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
 
-    def get_data(self) -> tuple[str, dict]:
-        return self._send("/GetAllRegion", need_access_token=False)
 
+class JciHitachiAWSCrtResources:
+    """Native event loop group, host resolver and client bootstrap shared by MQTT connections.
 
-class GetAvailableAggregationMonthlyData(JciHitachiAWSIoTConnection):
-    """API internal endpoint.
+    Every connection configured with the same resources shares their native threads
+    and DNS cache instead of creating its own.
 
     Parameters
     ----------
-    aws_tokens : AWSTokens
-        AWS tokens.
+    num_threads : int or None, optional
+        Number of event loop threads. One thread serves many connections, as they are mostly idle.
+        If None is given, one thread per processor is used, by default 1.
+    max_hosts : int, optional
+        Maximum number of hosts cached by the host resolver, by default 16.
     """
 
-    def __init__(self, aws_tokens: AWSTokens, **kwargs):
-        super().__init__(aws_tokens, **kwargs)
+    _default: Optional[JciHitachiAWSCrtResources] = None
+    _default_lock: threading.Lock = threading.Lock()
 
-    def get_data(
-        self, thing_name: str, time_start: int, time_end: int
-    ) -> tuple[str, dict]:
-        json_data = {
-            "ThingName": thing_name,
-            "TimeStart": time_start,
-            "TimeEnd": time_end,
-        }
-        return self._send("/GetAvailableAggregationMonthlyData", json_data)
+    def __init__(self, num_threads: Optional[int] = 1, max_hosts: int = 16):
+        self.event_loop_group: awscrt.io.EventLoopGroup = awscrt.io.EventLoopGroup(
+            num_threads
+        )
+        self.host_resolver: awscrt.io.DefaultHostResolver = (
+            awscrt.io.DefaultHostResolver(self.event_loop_group, max_hosts)
+        )
+        self.client_bootstrap: awscrt.io.ClientBootstrap = awscrt.io.ClientBootstrap(
+            self.event_loop_group, self.host_resolver
+        )
 
+    @classmethod
+    def get_default(cls) -> JciHitachiAWSCrtResources:
+        """Get the process-wide resources, creating them on first use.
 
-class GetHistoryEventByUser(JciHitachiAWSIoTConnection):
-    """API internal endpoint.
+        Returns
+        -------
+        JciHitachiAWSCrtResources
+            Shared resources.
+        """
 
-    Parameters
-    ----------
-    aws_tokens : AWSTokens
-        AWS tokens.
-    """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
 
-    def __init__(self, aws_tokens: AWSTokens, **kwargs):
-        super().__init__(aws_tokens, **kwargs)
+    @classmethod
+    def set_default(cls, resources: Optional[JciHitachiAWSCrtResources]) -> None:
+        """Replace the process-wide resources, e.g. to size them before any connection is configured.
 
-    def get_data(self, time_start: int, time_end: int) -> tuple[str, dict]:
-        json_data = {
-            "TimeStart": time_start,
-            "TimeEnd": time_end,
-        }
-        return self._send("/GetHistoryEventByUser", json_data)
+        Parameters
+        ----------
+        resources : JciHitachiAWSCrtResources or None
+            Resources to share. If None is given, default resources are created on next use.
+        """
 
+        with cls._default_lock:
+            cls._default = resources
 
-class ListSubUser(JciHitachiAWSIoTConnection):
-    """API internal endpoint.
 
-    Parameters
-    ----------
-    aws_tokens : AWSTokens
-        AWS tokens.
+class JciHitachiAWSEventLoop:
+    """Event loop run by a daemon thread, on which MQTT commands are executed.
+
+    The thread is started on first use. One loop can be shared by many connections,
+    so that they don't start a thread each.
     """
 
-    def __init__(self, aws_tokens: AWSTokens, **kwargs):
-        super().__init__(aws_tokens, **kwargs)
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock: threading.Lock = threading.Lock()
 
-    def get_data(self) -> tuple[str, dict]:
-        return self._send("/ListSubUser")
+    def get(self) -> asyncio.AbstractEventLoop:
+        """Get the event loop, starting its thread if it is not running.
+
+        Returns
+        -------
+        asyncio.AbstractEventLoop
+            Running event loop.
+        """
+
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="JciHitachiAWSMqttLoop",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def stop(self) -> None:
+        """Stop the event loop and its thread. The loop is started again on next use."""
+
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop, self._thread = None, None
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not threading.current_thread():
+            thread.join()
+            loop.close()
 
 
 class JciHitachiAWSMqttConnection:
@@ -542,24 +2672,106 @@ class JciHitachiAWSMqttConnection:
         Callable which takes no arguments and returns AwsCredentials.
     print_response : bool, optional
         If set, all responses of MQTT will be printed, by default False.
+    rate_limiter : JciHitachiAWSRateLimiter, optional
+        Rate limiter pacing publishes to the broker.
+        If None is given, publishes are not limited, by default None.
+    crt_resources : JciHitachiAWSCrtResources, optional
+        Native resources used by the connection.
+        If None is given, the process-wide resources are used, by default None.
+    message_queue_size : int, optional
+        Maximum number of received messages waiting to be processed, by default 1000.
+    message_workers : int, optional
+        Number of threads processing received messages.
+        If 0 is given, messages are processed in awscrt callbacks, by default 1.
+    mqtt5_options : JciHitachiAWSMqtt5Options, optional
+        If given, MQTT5 is used as the transport with these options instead of MQTT 3.1.1, by default None.
+    message_queue : JciHitachiAWSMessageQueue, optional
+        Queue of received messages shared with other connections, which is not closed on disconnect.
+        If given, message_queue_size and message_workers are ignored, by default None.
+    event_loop : JciHitachiAWSEventLoop, optional
+        Event loop shared with other connections, which is not stopped on disconnect.
+        If None is given, the connection runs its own loop thread, by default None.
     """
 
     def __init__(
-        self, get_credentials_callable: Callable, print_response: bool = False
+        self,
+        get_credentials_callable: Callable,
+        print_response: bool = False,
+        rate_limiter: Optional[JciHitachiAWSRateLimiter] = None,
+        crt_resources: Optional[JciHitachiAWSCrtResources] = None,
+        message_queue_size: int = 1000,
+        message_workers: int = 1,
+        mqtt5_options: Optional[JciHitachiAWSMqtt5Options] = None,
+        message_queue: Optional[JciHitachiAWSMessageQueue] = None,
+        event_loop: Optional[JciHitachiAWSEventLoop] = None,
     ):
         self._get_credentials_callable: Callable = get_credentials_callable
         self._print_response: bool = print_response
+        self._rate_limiter: JciHitachiAWSRateLimiter = (
+            rate_limiter or JciHitachiAWSRateLimiter()
+        )
+        self._crt_resources: Optional[JciHitachiAWSCrtResources] = crt_resources
+        self._owns_message_queue: bool = message_queue is None
+        if message_queue is None and message_workers > 0:
+            message_queue = JciHitachiAWSMessageQueue(
+                message_queue_size, message_workers
+            )
+        self._message_queue: Optional[JciHitachiAWSMessageQueue] = message_queue
+        self._owns_event_loop: bool = event_loop is None
+        self._event_loop: JciHitachiAWSEventLoop = (
+            event_loop or JciHitachiAWSEventLoop()
+        )
 
         self._mqttc: Optional[awscrt.mqtt.Connection] = None
+        self._mqtt5_client: Optional[awscrt.mqtt5.Client] = None
+        self._mqtt5_options: Optional[JciHitachiAWSMqtt5Options] = mqtt5_options
+        self._identity_id: Optional[str] = None
         self._shadow_mqttc: Optional[iotshadow.IotShadowClient] = None
         self._client_tokens: dict[str, str] = {}
         self._mqtt_events: JciHitachiMqttEvents = JciHitachiMqttEvents()
         self._execution_lock: threading.Lock = threading.Lock()
         self._execution_pools: JciHitachiExecutionPools = JciHitachiExecutionPools()
+        self._execution_pools_lock: threading.Lock = threading.Lock()
+        self._loop_lock: threading.Lock = threading.Lock()
+        self._device_locks: dict[str, asyncio.Lock] = {}
+        self._execution_alock: Optional[asyncio.Lock] = None
+        self._correlator: JciHitachiAWSRequestCorrelator = (
+            JciHitachiAWSRequestCorrelator()
+        )
+        self._shadow_token_counter: itertools.count = itertools.count()
+        self._status_listeners: list[Callable[[str, JciHitachiAWSStatus], None]] = []
+        self._status_listeners_lock: threading.Lock = threading.Lock()
+        self._publish_handlers: dict[tuple[str, str], Callable[[str, Any], None]] = {
+            ("status", "response"): self._on_status_response,
+            ("registration", "response"): self._on_registration_response,
+            ("control", "response"): self._on_control_response,
+        }
 
     def __del__(self):
         self.disconnect()
 
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        return self._event_loop.get()
+
+    def _stop_loop(self) -> None:
+        with self._loop_lock:
+            self._device_locks = {}
+            self._execution_alock = None
+        if self._owns_event_loop:
+            self._event_loop.stop()
+
+    @property
+    def message_queue(self) -> Optional[JciHitachiAWSMessageQueue]:
+        """Queue of received messages, exposing its depth and drop counters.
+
+        Returns
+        -------
+        JciHitachiAWSMessageQueue or None
+            Message queue, or None if messages are processed in awscrt callbacks.
+        """
+
+        return self._message_queue
+
     @property
     def mqtt_events(self) -> JciHitachiMqttEvents:
         """MQTT events.
@@ -572,9 +2784,44 @@ class JciHitachiAWSMqttConnection:
 
         return self._mqtt_events
 
+    def _queue_publish(self, topic: str, payload: bytes, dup, qos, retain, **kwargs):
+        # {host_identity_id}/{thing_name}/{category}/{kind}
+        split_topic = topic.split("/", 4)
+        key = split_topic[1] if len(split_topic) >= 2 else topic
+        self._message_queue.put(
+            key,
+            self._on_publish,
+            topic,
+            payload,
+            dup,
+            qos,
+            retain,
+            drop_key=tuple(split_topic[1:4]) or topic,
+        )
+
+    def _queued(self, callback: Callable) -> Callable:
+        if self._message_queue is None:
+            return callback
+
+        def queue_callback(response):
+            self._message_queue.put(
+                getattr(response, "client_token", None), callback, response
+            )
+
+        return queue_callback
+
+    @staticmethod
+    def _decode_payload(payload: bytes) -> Any:
+        try:
+            # orjson parses the buffer directly if installed.
+            return _json_loads(payload)
+        except ValueError:
+            # Fall back to the lenient path for payloads which aren't valid UTF-8.
+            return json.loads(payload.decode(errors="replace"))
+
     def _on_publish(self, topic: str, payload: bytes, dup, qos, retain, **kwargs):
         try:
-            payload = json.loads(payload.decode(errors="replace"))
+            decoded = self._decode_payload(payload)
         except Exception as e:
             self._mqtt_events.mqtt_error = e.__class__.__name__
             self._mqtt_events.mqtt_error_event.set()
@@ -584,25 +2831,91 @@ class JciHitachiAWSMqttConnection:
             return
 
         if self._print_response:
-            print(f"Mqtt topic {topic} published with payload \n {payload}")
+            print(f"Mqtt topic {topic} published with payload \n {decoded}")
+
+        # {host_identity_id}/{thing_name}/{category}/{kind}
+        split_topic = topic.split("/", 4)
+        if len(split_topic) >= 4:
+            handler = self._publish_handlers.get((split_topic[2], split_topic[3]))
+            if handler is not None:
+                handler(split_topic[1], decoded)
+
+    def _on_status_response(self, thing_name: str, payload: Any) -> None:
+        result = JciHitachiAWSStatus(payload)
+        self._mqtt_events.device_status[thing_name] = result
+        self._set_event(self._mqtt_events.device_status_event, thing_name)
+        self._resolve(thing_name, "status", result, payload)
+        self._notify_status_listeners(thing_name, result)
+
+    def _on_registration_response(self, thing_name: str, payload: Any) -> None:
+        result = JciHitachiAWSStatusSupport(payload)
+        self._mqtt_events.device_support[thing_name] = result
+        self._set_event(self._mqtt_events.device_support_event, thing_name)
+        self._resolve(thing_name, "support", result, payload)
+
+    def _on_control_response(self, thing_name: str, payload: Any) -> None:
+        self._mqtt_events.device_control[thing_name] = payload
+        self._set_event(self._mqtt_events.device_control_event, thing_name)
+        self._resolve(thing_name, "control", payload, payload)
+
+    def add_status_listener(
+        self, callback: Callable[[str, JciHitachiAWSStatus], None]
+    ) -> Callable[[], None]:
+        """Add a listener called with every status response received.
+
+        This includes responses to requests from other clients, e.g. the official app.
+        Listeners are called on an MQTT thread, so they should return quickly.
 
-        split_topic = topic.split("/")
+        Parameters
+        ----------
+        callback : Callable
+            Callable which takes a thing name and its JciHitachiAWSStatus.
 
-        if len(split_topic) >= 4 and split_topic[3] != "shadow":
-            thing_name = split_topic[1]
-            if split_topic[2] == "status" and split_topic[3] == "response":
-                self._mqtt_events.device_status[thing_name] = JciHitachiAWSStatus(
-                    payload
-                )
-                self._mqtt_events.device_status_event[thing_name].set()
-            elif split_topic[2] == "registration" and split_topic[3] == "response":
-                self._mqtt_events.device_support[thing_name] = (
-                    JciHitachiAWSStatusSupport(payload)
-                )
-                self._mqtt_events.device_support_event[thing_name].set()
-            elif split_topic[2] == "control" and split_topic[3] == "response":
-                self._mqtt_events.device_control[thing_name] = payload
-                self._mqtt_events.device_control_event[thing_name].set()
+        Returns
+        -------
+        Callable
+            Callable which takes no arguments and removes the listener.
+        """
+
+        with self._status_listeners_lock:
+            self._status_listeners.append(callback)
+
+        def remove():
+            with self._status_listeners_lock:
+                if callback in self._status_listeners:
+                    self._status_listeners.remove(callback)
+
+        return remove
+
+    def _notify_status_listeners(
+        self, thing_name: str, status: JciHitachiAWSStatus
+    ) -> None:
+        with self._status_listeners_lock:
+            listeners = list(self._status_listeners)
+        for listener in listeners:
+            try:
+                listener(thing_name, status)
+            except Exception as e:
+                _LOGGER.error(f"A status listener raised an exception: {e}")
+
+    @staticmethod
+    def _set_event(events: dict[str, threading.Event], thing_name: str) -> None:
+        event = events.get(thing_name)
+        if event is not None:
+            event.set()
+
+    @staticmethod
+    def _correlation_token(payload: Any) -> Hashable:
+        if isinstance(payload, dict):
+            # Devices echo TaskID of control requests, but not Timestamp of other requests.
+            if "TaskID" in payload and isinstance(payload["TaskID"], Hashable):
+                return payload["TaskID"]
+        return None
+
+    def _resolve(self, thing_name: str, kind: str, result: Any, payload: Any) -> None:
+        self._correlator.resolve(
+            thing_name, kind, result, self._correlation_token(payload)
+        )
 
     def _on_update_named_shadow_accepted(self, response):
         try:
@@ -619,7 +2932,10 @@ class JciHitachiAWSMqttConnection:
         if response.state:
             if response.state.reported:
                 self._mqtt_events.device_control[thing_name] = response.state.reported
-                self._mqtt_events.device_control_event[thing_name].set()
+                self._set_event(self._mqtt_events.device_control_event, thing_name)
+                self._correlator.resolve(
+                    thing_name, "shadow", response.state.reported, response.client_token
+                )
 
     def _on_update_named_shadow_rejected(self, error):
         _LOGGER.error(
@@ -641,7 +2957,10 @@ class JciHitachiAWSMqttConnection:
         if response.state:
             if response.state.reported:
                 self._mqtt_events.device_shadow[thing_name] = response.state.reported
-                self._mqtt_events.device_shadow_event[thing_name].set()
+                self._set_event(self._mqtt_events.device_shadow_event, thing_name)
+                self._correlator.resolve(
+                    thing_name, "shadow", response.state.reported, response.client_token
+                )
 
     def _on_get_named_shadow_rejected(self, error):
         _LOGGER.error(
@@ -680,18 +2999,90 @@ class JciHitachiAWSMqttConnection:
             _LOGGER.info("Resubscribed successfully.")
         return
 
-    async def _wrap_async(self, identifier: str, fn: Callable) -> str:
-        await asyncio.sleep(
-            random() / 2
-        )  # randomly wait 0~0.5 seconds to prevent messages flooding to the broker.
-        await asyncio.to_thread(fn)
-        return identifier
+    async def _wrap_async(
+        self, identifier: str, fn: Callable, device_lock: bool = True
+    ) -> JciHitachiExecutionResult:
+        if not device_lock:
+            return await self._run_async(identifier, fn)
+
+        # Requests to the same device are sent one at a time, in the order they were queued.
+        if identifier not in self._device_locks:
+            self._device_locks[identifier] = asyncio.Lock()
+        async with self._device_locks[identifier]:
+            return await self._run_async(identifier, fn)
+
+    async def _run_async(
+        self, identifier: str, fn: Callable[[], Awaitable]
+    ) -> JciHitachiExecutionResult:
+        # Pace publishes to prevent messages flooding to the broker.
+        await self._rate_limiter.acquire(identifier, self._identity_id)
+        return JciHitachiExecutionResult(identifier, await fn())
+
+    @staticmethod
+    async def _wait_published(
+        publish_future: concurrent.futures.Future, timeout: float
+    ) -> None:
+        # Shielded so that a timeout does not cancel the future owned by awscrt.
+        await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(publish_future)), timeout
+        )
+
+    async def _send_request(
+        self,
+        thing_name: str,
+        kind: str,
+        token: Hashable,
+        send: Callable[[], concurrent.futures.Future],
+        timeout: float,
+    ) -> Any:
+        response_future = self._correlator.register(thing_name, kind, token)
+        try:
+            await self._wait_published(send(), timeout)
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(response_future)), timeout
+            )
+        finally:
+            self._correlator.discard(thing_name, kind, response_future)
+            if kind == "shadow":
+                # Shadow responses may never come, or be rejected without popping the token.
+                self._client_tokens.pop(token, None)
+
+    def _route(
+        self,
+        host_identity_id: str,
+        thing_name: str,
+        publish_type: str,
+        execution_pools: Optional[JciHitachiExecutionPools] = None,
+    ) -> tuple[str, dict[str, threading.Event], list]:
+        execution_pools = execution_pools or self._execution_pools
+        if publish_type == "support":
+            return (
+                f"{host_identity_id}/{thing_name}/registration/request",
+                self._mqtt_events.device_support_event,
+                execution_pools.support_execution_pool,
+            )
+        elif publish_type == "status":
+            return (
+                f"{host_identity_id}/{thing_name}/status/request",
+                self._mqtt_events.device_status_event,
+                execution_pools.status_execution_pool,
+            )
+        elif publish_type == "control":
+            return (
+                f"{host_identity_id}/{thing_name}/control/request",
+                self._mqtt_events.device_control_event,
+                execution_pools.control_execution_pool,
+            )
+        raise ValueError(f"Invalid publish_type: {publish_type}")
 
     def disconnect(self) -> None:
-        """Disconnect from the MQTT broker."""
+        """Disconnect from the MQTT broker and stop the event loop thread."""
 
         if self._mqttc is not None:
             self._mqttc.disconnect()
+        self._stop_loop()
+        if self._message_queue is not None and self._owns_message_queue:
+            self._message_queue.close()
 
     def configure(self, identity_id) -> None:
         """Configure MQTT.
@@ -702,21 +3093,46 @@ class JciHitachiAWSMqttConnection:
             Identity ID.
         """
 
+        self._identity_id = identity_id
         cred_provider = awscrt.auth.AwsCredentialsProvider.new_delegate(
             self._get_credentials_callable
         )
-        event_loop_group = awscrt.io.EventLoopGroup(1)
-        host_resolver = awscrt.io.DefaultHostResolver(event_loop_group)
-        client_bootstrap = awscrt.io.ClientBootstrap(event_loop_group, host_resolver)
-        self._mqttc = mqtt_connection_builder.websockets_with_default_aws_signing(
-            AWS_REGION,
-            cred_provider,
-            client_bootstrap=client_bootstrap,
-            endpoint=AWS_MQTT_ENDPOINT,
-            client_id=f"{identity_id}_{''.join(choices('abcdef0123456789', k=16))}",  # {identityid}_{64bit_hex}
-            on_connection_interrupted=self._on_connection_interrupted,
-            on_connection_resumed=self._on_connection_resumed,
-        )
+        crt_resources = self._crt_resources or JciHitachiAWSCrtResources.get_default()
+        client_id = f"{identity_id}_{''.join(choices('abcdef0123456789', k=16))}"  # {identityid}_{64bit_hex}
+
+        if self._mqtt5_options is None:
+            self._mqttc = mqtt_connection_builder.websockets_with_default_aws_signing(
+                AWS_REGION,
+                cred_provider,
+                client_bootstrap=crt_resources.client_bootstrap,
+                endpoint=AWS_MQTT_ENDPOINT,
+                client_id=client_id,
+                on_connection_interrupted=self._on_connection_interrupted,
+                on_connection_resumed=self._on_connection_resumed,
+            )
+        else:
+            options = self._mqtt5_options
+            self._mqtt5_client = mqtt5_client_builder.websockets_with_default_aws_signing(
+                AWS_REGION,
+                cred_provider,
+                client_bootstrap=crt_resources.client_bootstrap,
+                endpoint=AWS_MQTT_ENDPOINT,
+                client_id=client_id,
+                session_behavior=awscrt.mqtt5.ClientSessionBehaviorType.REJOIN_POST_SUCCESS,
+                session_expiry_interval_sec=options.session_expiry_interval_sec,
+                receive_maximum=options.receive_maximum,
+                topic_aliasing_options=awscrt.mqtt5.TopicAliasingOptions(
+                    outbound_behavior=awscrt.mqtt5.OutboundTopicAliasBehaviorType.LRU,
+                    outbound_cache_max_size=options.outbound_topic_alias_cache_size,
+                    inbound_behavior=awscrt.mqtt5.InboundTopicAliasBehaviorType.ENABLED,
+                    inbound_cache_max_size=options.inbound_topic_alias_cache_size,
+                ),
+            )
+            # The MQTT 3 style adapter keeps the rest of the connection transport agnostic.
+            self._mqttc = self._mqtt5_client.new_connection(
+                on_connection_interrupted=self._on_connection_interrupted,
+                on_connection_resumed=self._on_connection_resumed,
+            )
         self._mqttc.on_message(self._on_message)
         self._shadow_mqttc = iotshadow.IotShadowClient(self._mqttc)
 
@@ -725,9 +3141,12 @@ class JciHitachiAWSMqttConnection:
         host_identity_id: str,
         shadow_names: Optional[Union[str, list[str]]] = None,
         thing_names: Optional[Union[str, list[str]]] = None,
+        wildcard: bool = False,
     ) -> bool:
         """Connect to the MQTT broker and start loop.
 
+        All subscriptions are issued at once and then awaited together.
+
         Parameters
         ----------
         host_identity_id : str
@@ -736,6 +3155,9 @@ class JciHitachiAWSMqttConnection:
             Names to be subscribed in Shadow, by default None.
         thing_names : str or list of str, optional
             Things to be subscribed in Shadow, by default None.
+        wildcard : bool, optional
+            If set, Shadow topics of every thing are subscribed with a single-level
+            wildcard filter per topic instead of one subscription per thing, by default False.
 
         Returns
         -------
@@ -748,87 +3170,129 @@ class JciHitachiAWSMqttConnection:
             connect_future.result()
             _LOGGER.info("MQTT Connected.")
         except Exception as e:
-            self._mqtt_events.mqtt_error = e.__class__.__name__
-            self._mqtt_events.mqtt_error_event.set()
-            _LOGGER.error("MQTT connection failed with exception {}".format(e))
+            self._on_connect_error(e, "MQTT connection failed with exception {}")
             return False
 
         try:
-            subscribe_future, _ = self._mqttc.subscribe(
-                f"{host_identity_id}/+/+/response", QOS, callback=self._on_publish
+            subscribe_futures = self._subscribe_all(
+                host_identity_id, shadow_names, thing_names, wildcard
             )
-            subscribe_future.result()
 
-            if thing_names is not None and shadow_names is not None:
-                shadow_names = (
-                    [shadow_names] if isinstance(shadow_names, str) else shadow_names
-                )
-                thing_names = (
-                    [thing_names] if isinstance(thing_names, str) else thing_names
-                )
+            # Wait for subscriptions to succeed
+            concurrent.futures.wait(subscribe_futures)
+            for subscribe_future in subscribe_futures:
+                subscribe_future.result()
+
+        except Exception as e:
+            self._on_connect_error(e, "MQTT subscription failed with exception {}")
+            self.disconnect()
+            return False
+        return True
+
+    async def connect_async(
+        self,
+        host_identity_id: str,
+        shadow_names: Optional[Union[str, list[str]]] = None,
+        thing_names: Optional[Union[str, list[str]]] = None,
+        wildcard: bool = False,
+    ) -> bool:
+        """Asynchronously connect to the MQTT broker and start loop.
 
-                for shadow_name in shadow_names:
-                    for thing_name in thing_names:
-                        (
-                            update_accepted_subscribed_future,
-                            _,
-                        ) = self._shadow_mqttc.subscribe_to_update_named_shadow_accepted(
-                            request=iotshadow.UpdateNamedShadowSubscriptionRequest(
-                                shadow_name=shadow_name, thing_name=thing_name
-                            ),
-                            qos=QOS,
-                            callback=self._on_update_named_shadow_accepted,
-                        )
-
-                        (
-                            update_rejected_subscribed_future,
-                            _,
-                        ) = self._shadow_mqttc.subscribe_to_update_named_shadow_rejected(
-                            request=iotshadow.UpdateNamedShadowSubscriptionRequest(
-                                shadow_name=shadow_name, thing_name=thing_name
-                            ),
-                            qos=QOS,
-                            callback=self._on_update_named_shadow_rejected,
-                        )
-
-                        # Wait for subscriptions to succeed
-                        update_accepted_subscribed_future.result()
-                        update_rejected_subscribed_future.result()
-
-                        (
-                            get_accepted_subscribed_future,
-                            _,
-                        ) = self._shadow_mqttc.subscribe_to_get_named_shadow_accepted(
-                            request=iotshadow.GetNamedShadowSubscriptionRequest(
-                                shadow_name=shadow_name, thing_name=thing_name
-                            ),
-                            qos=QOS,
-                            callback=self._on_get_named_shadow_accepted,
-                        )
-
-                        (
-                            get_rejected_subscribed_future,
-                            _,
-                        ) = self._shadow_mqttc.subscribe_to_get_named_shadow_rejected(
-                            request=iotshadow.GetNamedShadowSubscriptionRequest(
-                                shadow_name=shadow_name, thing_name=thing_name
-                            ),
-                            qos=QOS,
-                            callback=self._on_get_named_shadow_rejected,
-                        )
-
-                        # Wait for subscriptions to succeed
-                        get_accepted_subscribed_future.result()
-                        get_rejected_subscribed_future.result()
+        Unlike `connect`, no thread is blocked while waiting for the broker. See `connect`.
+        """
 
+        try:
+            await asyncio.wrap_future(self._mqttc.connect())
+            _LOGGER.info("MQTT Connected.")
         except Exception as e:
-            self._mqtt_events.mqtt_error = e.__class__.__name__
-            self._mqtt_events.mqtt_error_event.set()
+            self._on_connect_error(e, "MQTT connection failed with exception {}")
+            return False
+
+        try:
+            subscribe_futures = self._subscribe_all(
+                host_identity_id, shadow_names, thing_names, wildcard
+            )
+            await asyncio.gather(
+                *(asyncio.wrap_future(future) for future in subscribe_futures)
+            )
+        except Exception as e:
+            self._on_connect_error(e, "MQTT subscription failed with exception {}")
             self.disconnect()
-            _LOGGER.error("MQTT subscription failed with exception {}".format(e))
             return False
         return True
 
+    def _on_connect_error(self, e: Exception, message: str) -> None:
+        self._mqtt_events.mqtt_error = e.__class__.__name__
+        self._mqtt_events.mqtt_error_event.set()
+        _LOGGER.error(message.format(e))
+
+    def _subscribe_all(
+        self,
+        host_identity_id: str,
+        shadow_names: Optional[Union[str, list[str]]],
+        thing_names: Optional[Union[str, list[str]]],
+        wildcard: bool,
+    ) -> list[concurrent.futures.Future]:
+        subscribe_future, _ = self._mqttc.subscribe(
+            f"{host_identity_id}/+/+/response",
+            QOS,
+            callback=(
+                self._on_publish if self._message_queue is None else self._queue_publish
+            ),
+        )
+        subscribe_futures = [subscribe_future]
+
+        if (thing_names is not None or wildcard) and shadow_names is not None:
+            shadow_names = (
+                [shadow_names] if isinstance(shadow_names, str) else shadow_names
+            )
+            if wildcard:
+                thing_names = ["+"]
+            else:
+                thing_names = (
+                    [thing_names] if isinstance(thing_names, str) else thing_names
+                )
+
+            for shadow_name in shadow_names:
+                for thing_name in thing_names:
+                    subscribe_futures.extend(
+                        self._subscribe_named_shadow(shadow_name, thing_name)
+                    )
+        return subscribe_futures
+
+    def _subscribe_named_shadow(
+        self, shadow_name: str, thing_name: str
+    ) -> list[concurrent.futures.Future]:
+        update_request = iotshadow.UpdateNamedShadowSubscriptionRequest(
+            shadow_name=shadow_name, thing_name=thing_name
+        )
+        get_request = iotshadow.GetNamedShadowSubscriptionRequest(
+            shadow_name=shadow_name, thing_name=thing_name
+        )
+        subscriptions = [
+            self._shadow_mqttc.subscribe_to_update_named_shadow_accepted(
+                request=update_request,
+                qos=QOS,
+                callback=self._queued(self._on_update_named_shadow_accepted),
+            ),
+            self._shadow_mqttc.subscribe_to_update_named_shadow_rejected(
+                request=update_request,
+                qos=QOS,
+                callback=self._queued(self._on_update_named_shadow_rejected),
+            ),
+            self._shadow_mqttc.subscribe_to_get_named_shadow_accepted(
+                request=get_request,
+                qos=QOS,
+                callback=self._queued(self._on_get_named_shadow_accepted),
+            ),
+            self._shadow_mqttc.subscribe_to_get_named_shadow_rejected(
+                request=get_request,
+                qos=QOS,
+                callback=self._queued(self._on_get_named_shadow_rejected),
+            ),
+        ]
+        return [subscribe_future for subscribe_future, _ in subscriptions]
+
     def publish(
         self,
         host_identity_id: str,
@@ -836,6 +3300,7 @@ class JciHitachiAWSMqttConnection:
         publish_type: str,
         timeout: float = 10.0,
         payload: Optional[dict] = None,
+        execution_pools: Optional[JciHitachiExecutionPools] = None,
     ) -> None:
         """Put messages to be published in the execution pool. execute() should be called to start async publish.
 
@@ -848,67 +3313,106 @@ class JciHitachiAWSMqttConnection:
         publish_type: str
             Publish type. There are three types available: `support`, `status`, and `control`.
         timeout: float, optional
-            Timeout for messages published, by default 10.0.
+            Timeout for the message published and its response, by default 10.0.
         payload : dict, optional
             Payload to publish, by default None.
+        execution_pools : JciHitachiExecutionPools, optional
+            Execution pools of the caller's own batch, executed by passing them to execute().
+            If None is given, the shared execution pools are used, by default None.
         """
 
-        default_payload = {"Timestamp": time.time()}
+        topic, events, execution_pool = self._route(
+            host_identity_id, thing_name, publish_type, execution_pools
+        )
+        if publish_type != "control":
+            payload = {"Timestamp": time.time()}
 
-        if publish_type == "support":
-            support_topic = f"{host_identity_id}/{thing_name}/registration/request"
-            if thing_name in self._mqtt_events.device_support_event:
-                self._mqtt_events.device_support_event[thing_name].clear()
-            else:
-                self._mqtt_events.device_support_event[thing_name] = threading.Event()
+        if thing_name in events:
+            events[thing_name].clear()
+        else:
+            events[thing_name] = threading.Event()
+
+        async def fn():
+            # Both the publish and its response timing out surface as the command's error.
+            return await self._send_request(
+                thing_name,
+                publish_type,
+                self._correlation_token(payload),
+                lambda: self._mqttc.publish(topic, json.dumps(payload), QOS)[0],
+                timeout,
+            )
 
-            def fn():
-                publish_future, _ = self._mqttc.publish(
-                    support_topic, json.dumps(default_payload), QOS
-                )
-                publish_future.result(timeout)
-                self._mqtt_events.device_support_event[thing_name].wait(timeout)
+        with self._execution_pools_lock:
+            execution_pool.append(self._wrap_async(thing_name, fn))
 
-            self._execution_pools.support_execution_pool.append(
-                self._wrap_async(thing_name, fn)
-            )
-        elif publish_type == "status":
-            status_topic = f"{host_identity_id}/{thing_name}/status/request"
-            if thing_name in self._mqtt_events.device_status_event:
-                self._mqtt_events.device_status_event[thing_name].clear()
-            else:
-                self._mqtt_events.device_status_event[thing_name] = threading.Event()
+    async def request_async(
+        self,
+        host_identity_id: str,
+        thing_name: str,
+        publish_type: str,
+        payload: Optional[dict] = None,
+        timeout: float = 10.0,
+    ) -> Union[JciHitachiAWSStatus, JciHitachiAWSStatusSupport, dict]:
+        """Publish a message and wait for its own response.
 
-            def fn():
-                publish_future, _ = self._mqttc.publish(
-                    status_topic, json.dumps(default_payload), QOS
-                )
-                publish_future.result(timeout)
-                self._mqtt_events.device_status_event[thing_name].wait(timeout)
+        Unlike `publish`, the request is sent right away without going through the
+        execution pools and lock, so several requests to the same thing can be in flight.
+        Its response is matched by the `TaskID` of the payload, or is the oldest response
+        if the request has none.
 
-            self._execution_pools.status_execution_pool.append(
-                self._wrap_async(thing_name, fn)
-            )
-        elif publish_type == "control":
-            control_topic = f"{host_identity_id}/{thing_name}/control/request"
-            if thing_name in self._mqtt_events.device_control_event:
-                self._mqtt_events.device_control_event[thing_name].clear()
-            else:
-                self._mqtt_events.device_control_event[thing_name] = threading.Event()
+        Parameters
+        ----------
+        host_identity_id : str
+            Host identity id.
+        thing_name : str
+            Thing name.
+        publish_type: str
+            Publish type. There are three types available: `support`, `status`, and `control`.
+        payload : dict, optional
+            Payload to publish. Only used by `control`, by default None.
+        timeout: float, optional
+            Timeout for the message published and its response, by default 10.0.
 
-            def fn():
-                publish_future, _ = self._mqttc.publish(
-                    control_topic, json.dumps(payload), QOS
-                )
-                publish_future.result(timeout)
-                self._mqtt_events.device_control_event[thing_name].wait(timeout)
+        Returns
+        -------
+        JciHitachiAWSStatus or JciHitachiAWSStatusSupport or dict
+            Response of status, support or control, respectively.
 
-            self._execution_pools.control_execution_pool.append(
-                self._wrap_async(thing_name, fn)
-            )
+        Raises
+        ------
+        asyncio.TimeoutError
+            If the response is not received in time.
+        """
 
-        else:
-            raise ValueError(f"Invalid publish_type: {publish_type}")
+        topic, _, _ = self._route(host_identity_id, thing_name, publish_type)
+        if publish_type != "control":
+            payload = {"Timestamp": time.time()}
+
+        await self._rate_limiter.acquire(thing_name, self._identity_id)
+        return await self._send_request(
+            thing_name,
+            publish_type,
+            self._correlation_token(payload),
+            lambda: self._mqttc.publish(topic, json.dumps(payload), QOS)[0],
+            timeout,
+        )
+
+    def request(
+        self,
+        host_identity_id: str,
+        thing_name: str,
+        publish_type: str,
+        payload: Optional[dict] = None,
+        timeout: float = 10.0,
+    ) -> Union[JciHitachiAWSStatus, JciHitachiAWSStatusSupport, dict]:
+        """Publish a message and wait for its own response. See `request_async`."""
+
+        return asyncio.run_coroutine_threadsafe(
+            self.request_async(
+                host_identity_id, thing_name, publish_type, payload, timeout
+            ),
+            self._ensure_loop(),
+        ).result()
 
     def publish_shadow(
         self,
@@ -917,6 +3421,7 @@ class JciHitachiAWSMqttConnection:
         payload: dict = {},
         shadow_name: Optional[str] = None,
         timeout: float = 10.0,
+        execution_pools: Optional[JciHitachiExecutionPools] = None,
     ) -> None:
         """Publish message to IoT Shadow Service.
 
@@ -931,21 +3436,25 @@ class JciHitachiAWSMqttConnection:
         shadow_name : str, optional
             Shadow name, by default None.
         timeout: float, optional
-            Timeout for messages published, by default 10.0.
+            Timeout for the message published and its response, by default 10.0.
+        execution_pools : JciHitachiExecutionPools, optional
+            Execution pools of the caller's own batch, executed by passing them to execute().
+            If None is given, the shared execution pools are used, by default None.
         """
 
         if command_name not in ["get", "update"]:  # we don't subscribe delete
             raise ValueError("command_name must be one of `get` or `update`.")
 
-        # The length of client token can't exceed 64 bytes, so we only use gateway mac address as the token.
-        client_token = thing_name.split("_")[1]
+        # The length of client token can't exceed 64 bytes, so we only use gateway mac address
+        # and a sequence number as the token.
+        client_token = f"{thing_name.split('_')[1]}-{next(self._shadow_token_counter)}"
         self._client_tokens.update({client_token: thing_name})
         if thing_name in self._mqtt_events.device_shadow_event:
             self._mqtt_events.device_shadow_event[thing_name].clear()
         else:
             self._mqtt_events.device_shadow_event[thing_name] = threading.Event()
 
-        def fn():
+        def send() -> concurrent.futures.Future:
             if shadow_name is None:
                 if command_name == "get":
                     publish_future = self._shadow_mqttc.publish_get_shadow(
@@ -1000,64 +3509,73 @@ class JciHitachiAWSMqttConnection:
                         ),
                         qos=QOS,
                     )
-            publish_future.result(timeout)
-            self._mqtt_events.device_shadow_event[thing_name].wait(timeout)
+            return publish_future
+
+        async def fn():
+            return await self._send_request(
+                thing_name,
+                "shadow",
+                client_token,
+                send,
+                timeout,
+            )
 
-        self._execution_pools.shadow_execution_pool.append(
-            self._wrap_async(thing_name, fn)
-        )
+        # Shadow requests are served by AWS IoT rather than the device.
+        execution_pools = execution_pools or self._execution_pools
+        with self._execution_pools_lock:
+            execution_pools.shadow_execution_pool.append(
+                self._wrap_async(thing_name, fn, device_lock=False)
+            )
 
     def execute(
-        self, control: bool = False
+        self,
+        control: bool = False,
+        concurrently: bool = False,
+        max_concurrency: Optional[int] = None,
+        execution_pools: Optional[JciHitachiExecutionPools] = None,
     ) -> list[
-        list[Union[str, BaseException]],
-        list[Union[str, BaseException]],
-        list[Union[str, BaseException]],
-        list[Union[str, BaseException]],
+        list[Union[JciHitachiExecutionResult, BaseException]],
+        list[Union[JciHitachiExecutionResult, BaseException]],
+        list[Union[JciHitachiExecutionResult, BaseException]],
+        list[Union[JciHitachiExecutionResult, BaseException]],
     ]:
         """Execute publish commands in the execution pools.
 
+        Commands run on the event loop thread of this connection, which is started on first use
+        and, unless it is shared with other connections, stopped by `disconnect`.
+
         Parameters
         ----------
         control : bool
             If True, commands in the `control_execution_pool` will be executed; otherwise, commands in other execution pools will be executed.
+        concurrently : bool, optional
+            If True, the support, shadow and status execution pools are executed at the same time
+            instead of one after another. Requests to the same device are still sent in the order
+            of support and status, by default False.
+        max_concurrency : int, optional
+            Maximum number of commands of a pool running at the same time, by default None (unbounded).
+        execution_pools : JciHitachiExecutionPools, optional
+            Execution pools of the caller's own batch. Unlike the shared execution pools,
+            they are only executed by this call and run alongside other executions.
+            If None is given, the shared execution pools are executed, by default None.
 
         Returns
         -------
         list
             Execution results of support, shadow, status, control, respectively.
-            Each result is a list containing thing names if the execution was successful or BaseException(s) if an error occurred during execution.
+            Each result is a list containing a JciHitachiExecutionResult, which carries the thing name and
+            the response correlated to the command, if the execution was successful or BaseException(s)
+            if an error occurred during execution.
+            A result is None if its pool was empty.
         """
 
-        async def runner():
-            a, b, c, d = None, None, None, None
-            if control and len(self._execution_pools.control_execution_pool) != 0:
-                d = await asyncio.gather(
-                    *self._execution_pools.control_execution_pool,
-                    return_exceptions=True,
-                )
-                self._execution_pools.control_execution_pool.clear()
-            else:
-                if len(self._execution_pools.support_execution_pool) != 0:
-                    a = await asyncio.gather(
-                        *self._execution_pools.support_execution_pool,
-                        return_exceptions=True,
-                    )
-                    self._execution_pools.support_execution_pool.clear()
-                if len(self._execution_pools.shadow_execution_pool) != 0:
-                    b = await asyncio.gather(
-                        *self._execution_pools.shadow_execution_pool,
-                        return_exceptions=True,
-                    )
-                    self._execution_pools.shadow_execution_pool.clear()
-                if len(self._execution_pools.status_execution_pool) != 0:
-                    c = await asyncio.gather(
-                        *self._execution_pools.status_execution_pool,
-                        return_exceptions=True,
-                    )
-                    self._execution_pools.status_execution_pool.clear()
-
-            return a, b, c, d
+        if execution_pools is not None:
+            return asyncio.run_coroutine_threadsafe(
+                self._execute_pools(
+                    execution_pools, control, concurrently, max_concurrency
+                ),
+                self._ensure_loop(),
+            ).result()
 
         locked = self._execution_lock.locked()
         if locked:
@@ -1066,6 +3584,91 @@ class JciHitachiAWSMqttConnection:
         with self._execution_lock:
             if locked:
                 _LOGGER.debug("Lock acquired.")
-            results = asyncio.run(runner())
+            results = asyncio.run_coroutine_threadsafe(
+                self._execute_pools(
+                    self._execution_pools, control, concurrently, max_concurrency
+                ),
+                self._ensure_loop(),
+            ).result()
 
         return results
+
+    async def execute_async(
+        self,
+        control: bool = False,
+        concurrently: bool = False,
+        max_concurrency: Optional[int] = None,
+        execution_pools: Optional[JciHitachiExecutionPools] = None,
+    ) -> list[
+        list[Union[JciHitachiExecutionResult, BaseException]],
+        list[Union[JciHitachiExecutionResult, BaseException]],
+        list[Union[JciHitachiExecutionResult, BaseException]],
+        list[Union[JciHitachiExecutionResult, BaseException]],
+    ]:
+        """Asynchronously execute publish commands in the execution pools.
+
+        Unlike `execute`, no thread is blocked while waiting for commands,
+        so it can be awaited from any event loop. See `execute`.
+        """
+
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(
+                self._execute_pools(
+                    execution_pools or self._execution_pools,
+                    control,
+                    concurrently,
+                    max_concurrency,
+                ),
+                self._ensure_loop(),
+            )
+        )
+
+    async def _execute_pools(
+        self,
+        execution_pools: JciHitachiExecutionPools,
+        control: bool,
+        concurrently: bool,
+        max_concurrency: Optional[int],
+    ) -> tuple:
+        async def bounded(coro, semaphore: asyncio.Semaphore):
+            async with semaphore:
+                return await coro
+
+        async def execute_pool(pool: list) -> Optional[list]:
+            if len(pool) == 0:
+                return None
+            # Commands queued while this pool is running are left for the next execution.
+            with self._execution_pools_lock:
+                coros = pool[:]
+                pool.clear()
+            if max_concurrency is not None:
+                semaphore = asyncio.Semaphore(max(1, max_concurrency))
+                coros = [bounded(coro, semaphore) for coro in coros]
+            return await asyncio.gather(*coros, return_exceptions=True)
+
+        async def runner():
+            a, b, c, d = None, None, None, None
+            if control and len(execution_pools.control_execution_pool) != 0:
+                d = await execute_pool(execution_pools.control_execution_pool)
+            elif concurrently:
+                a, b, c = await asyncio.gather(
+                    execute_pool(execution_pools.support_execution_pool),
+                    execute_pool(execution_pools.shadow_execution_pool),
+                    execute_pool(execution_pools.status_execution_pool),
+                )
+            else:
+                a = await execute_pool(execution_pools.support_execution_pool)
+                b = await execute_pool(execution_pools.shadow_execution_pool)
+                c = await execute_pool(execution_pools.status_execution_pool)
+
+            return a, b, c, d
+
+        # A caller's own batch cannot be drained by other executions, so it needs no lock.
+        if execution_pools is not self._execution_pools:
+            return await runner()
+
+        if self._execution_alock is None:
+            self._execution_alock = asyncio.Lock()
+
+        async with self._execution_alock:
+            return await runner()
@@ -2089,15 +2089,15 @@ class JciHitachiAWSStatus:
             raw_status["PowerConsumption"] /= 10.0
 
         status = {}
-        device_type = self.device_type_mapping[raw_status["DeviceType"]]
+        status_dict = STATUS_DICT[self.device_type_mapping[raw_status["DeviceType"]]]
         for key, value in raw_status.items():
-            if key in STATUS_DICT[device_type]:
-                if STATUS_DICT[device_type][key]["is_numeric"]:
-                    status[key] = value
-                else:
-                    status[key] = STATUS_DICT[device_type][key]["id2str"].get(
-                        value, "unknown"
-                    )
+            spec = status_dict.get(key)
+            if spec is None:
+                continue
+            if spec["is_numeric"]:
+                status[key] = value
+            else:
+                status[key] = spec["id2str"].get(value, "unknown")
 
         return status
 
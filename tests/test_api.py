@@ -1,10 +1,29 @@
+import asyncio
+import datetime
+import json
+import threading
 import time
-from unittest.mock import MagicMock, patch
+import zoneinfo
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
 
-from JciHitachi.api import AWSThing, JciHitachiAWSAPI
-from JciHitachi.aws_connection import AWSTokens, AWSIdentity
+from JciHitachi.api import (
+    AWSThing,
+    AsyncJciHitachiAWSAPI,
+    JciHitachiAWSAPI,
+    JciHitachiAWSHub,
+    MonthlyDataCache,
+)
+from JciHitachi.aws_connection import (
+    AWSTokens,
+    AWSIdentity,
+    InMemoryAWSTokenStore,
+    JciHitachiAWSMqttConnection,
+    JciHitachiExecutionResult,
+)
 from JciHitachi.model import JciHitachiAWSStatus, JciHitachiAWSStatusSupport
 
 from . import MOCK_GATEWAY_MAC, MOCK_DEVICE_AC, MOCK_DEVICE_DH, MOCK_DEVICE_HE
@@ -184,6 +203,104 @@ class TestAWSAPI:
             assert len(api._things) == 2
             assert len(api.device_names) == 2
 
+    def test_login_with_token_store(self, fixture_aws_mock_api, fixture_aws_identity):
+        api = fixture_aws_mock_api
+        api._token_store = InMemoryAWSTokenStore()
+        with (
+            patch(
+                "JciHitachi.aws_connection.GetUser.get_data"
+            ) as mock_get_data_get_user,
+            patch("JciHitachi.aws_connection.GetUser.login") as mock_login_get_user,
+            patch(
+                "JciHitachi.aws_connection.JciHitachiAWSCognitoConnection.login"
+            ) as mock_refresh,
+            patch(
+                "JciHitachi.aws_connection.GetAllDevice.get_data"
+            ) as mock_get_data_get_all_device,
+            patch(
+                "JciHitachi.aws_connection.JciHitachiAWSMqttConnection.connect"
+            ) as mock_connect_mqtt,
+        ):
+            aws_tokens = api._aws_tokens
+            mock_get_data_get_user.return_value = ("OK", fixture_aws_identity)
+            mock_login_get_user.return_value = ("OK", aws_tokens)
+            mock_get_data_get_all_device.return_value = ("OK", MOCK_THINGS_JSON)
+            mock_connect_mqtt.return_value = True
+            api.refresh_status = MagicMock()
+
+            # empty store, sign in with password and save tokens
+            api.login()
+            assert mock_login_get_user.call_count == 1
+            assert api._token_store.load(api.email) == (
+                aws_tokens,
+                fixture_aws_identity,
+            )
+
+            # valid stored tokens are reused
+            api.login()
+            assert mock_login_get_user.call_count == 1
+            assert mock_get_data_get_user.call_count == 1
+            mock_refresh.assert_not_called()
+
+            # expired stored tokens are renewed with the refresh token
+            expired_tokens = AWSTokens("a", "b", "c", time.time())
+            refreshed_tokens = AWSTokens("d", "e", "c", time.time() + 3600)
+            api._token_store.save(api.email, expired_tokens, fixture_aws_identity)
+            mock_refresh.return_value = ("OK", refreshed_tokens)
+            api.login()
+            mock_refresh.assert_called_once_with(use_refresh_token=True)
+            assert mock_login_get_user.call_count == 1
+            assert api._aws_tokens == refreshed_tokens
+            assert api._token_store.load(api.email)[0] == refreshed_tokens
+
+            # rejected refresh token falls back to password
+            api._token_store.save(api.email, expired_tokens, fixture_aws_identity)
+            mock_refresh.return_value = ("NotAuthorizedException", None)
+            api.login()
+            assert mock_login_get_user.call_count == 2
+            assert api._aws_tokens == aws_tokens
+
+            # revoked stored tokens are discarded
+            api._token_store.save(api.email, aws_tokens, fixture_aws_identity)
+            mock_get_data_get_all_device.side_effect = [
+                ("Invalid session token", {}),
+                ("OK", MOCK_THINGS_JSON),
+            ]
+            api.login()
+            assert mock_login_get_user.call_count == 3
+            mock_get_data_get_all_device.side_effect = None
+
+            # other failures keep stored tokens
+            api._token_store.save(api.email, aws_tokens, fixture_aws_identity)
+            mock_get_data_get_all_device.return_value = ("HTTP exception 503", {})
+            with pytest.raises(RuntimeError, match="HTTP exception 503"):
+                api.login()
+            assert api._token_store.load(api.email)[0] == aws_tokens
+
+            mock_get_data_get_all_device.side_effect = httpx.ConnectError("offline")
+            with pytest.raises(httpx.ConnectError):
+                api.login()
+            assert api._token_store.load(api.email)[0] == aws_tokens
+
+    def test_check_before_publish(self, fixture_aws_mock_api):
+        api = fixture_aws_mock_api
+        api._mqtt = MagicMock()
+        api._mqtt.mqtt_events.mqtt_error_event = threading.Event()
+        api._mqtt.mqtt_events.mqtt_error_event.set()
+
+        def reauth():
+            time.sleep(0.05)
+
+        with patch.object(api, "reauth", side_effect=reauth) as mock_reauth:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                for future in [
+                    executor.submit(api._check_before_publish) for _ in range(8)
+                ]:
+                    future.result()
+            # Callers seeing the same error reauthenticate once.
+            mock_reauth.assert_called_once()
+            assert not api._mqtt.mqtt_events.mqtt_error_event.is_set()
+
     def test_change_password(self, fixture_aws_mock_api):
         api = fixture_aws_mock_api
         with (
@@ -282,27 +399,26 @@ class TestAWSAPI:
         api._aws_identity = fixture_aws_identity
 
         thing_name = api.things[MOCK_DEVICE_AC].thing_name
+        result = JciHitachiExecutionResult(thing_name, "")
+        empty = JciHitachiExecutionResult(thing_name)
         with patch.object(api, "_mqtt") as mock_mqtt:
             mock_mqtt.publish.return_value = None
             mock_mqtt.execute.return_value = [
-                [thing_name],
-                [thing_name],
-                [thing_name],
+                [result],
+                [result],
+                [result],
                 [],
             ]
             mock_mqtt.mqtt_events.mqtt_error_event.is_set.return_value = False
 
-            mock_mqtt.mqtt_events.device_status = {thing_name: ""}
-            mock_mqtt.mqtt_events.device_support = {thing_name: ""}
-            mock_mqtt.mqtt_events.device_shadow = {thing_name: ""}
             api.refresh_status(
                 MOCK_DEVICE_AC, refresh_support_code=True, refresh_shadow=True
             )
 
             # status event timeout
             mock_mqtt.execute.return_value = [
-                [thing_name],
-                [thing_name],
+                [result],
+                [result],
                 [BaseException],
                 [],
             ]
@@ -314,12 +430,11 @@ class TestAWSAPI:
 
             # status not stored in dict
             mock_mqtt.execute.return_value = [
-                [thing_name],
-                [thing_name],
-                [thing_name],
+                [result],
+                [result],
+                [empty],
                 [],
             ]
-            mock_mqtt.mqtt_events.device_status = {}
             with pytest.raises(
                 RuntimeError,
                 match=f"An event occurred but wasn't accompanied with data when refreshing {MOCK_DEVICE_AC} status code.",
@@ -329,8 +444,8 @@ class TestAWSAPI:
             # support event timeout
             mock_mqtt.execute.return_value = [
                 [BaseException],
-                [thing_name],
-                [thing_name],
+                [result],
+                [result],
                 [],
             ]
             with pytest.raises(
@@ -341,12 +456,11 @@ class TestAWSAPI:
 
             # support not stored in dict
             mock_mqtt.execute.return_value = [
-                [thing_name],
-                [thing_name],
-                [thing_name],
+                [empty],
+                [result],
+                [result],
                 [],
             ]
-            mock_mqtt.mqtt_events.device_support = {}
             with pytest.raises(
                 RuntimeError,
                 match=f"An event occurred but wasn't accompanied with data when refreshing {MOCK_DEVICE_AC} support code.",
@@ -355,9 +469,9 @@ class TestAWSAPI:
 
             # shadow event timeout
             mock_mqtt.execute.return_value = [
-                [thing_name],
+                [result],
                 [BaseException],
-                [thing_name],
+                [result],
                 [],
             ]
             with pytest.raises(
@@ -368,12 +482,11 @@ class TestAWSAPI:
 
             # shadow not stored in dict
             mock_mqtt.execute.return_value = [
-                [thing_name],
-                [thing_name],
-                [thing_name],
+                [result],
+                [empty],
+                [result],
                 [],
             ]
-            mock_mqtt.mqtt_events.device_shadow = {}
             with pytest.raises(
                 RuntimeError,
                 match=f"An event occurred but wasn't accompanied with data when refreshing {MOCK_DEVICE_AC} shadow.",
@@ -387,9 +500,13 @@ class TestAWSAPI:
         thing_name = api.things[MOCK_DEVICE_AC].thing_name
         with patch.object(api, "_mqtt") as mock_mqtt:
             mock_mqtt.publish.return_value = None
-            mock_mqtt.execute.return_value = [[], [], [], [thing_name]]
+            mock_mqtt.execute.return_value = [
+                [],
+                [],
+                [],
+                [JciHitachiExecutionResult(thing_name, {"FanSpeed": 3})],
+            ]
             mock_mqtt.mqtt_events.mqtt_error_event.is_set.return_value = False
-            mock_mqtt.mqtt_events.device_control.get.return_value = {"FanSpeed": 3}
 
             assert api.set_status(
                 "FanSpeed", device_name=MOCK_DEVICE_AC, status_value=3
@@ -422,6 +539,304 @@ class TestAWSAPI:
                 "target_temp", device_name=MOCK_DEVICE_AC, status_value=25
             )
 
+    def test_refresh_status_partial_failure(
+        self, fixture_aws_mock_api, fixture_aws_identity
+    ):
+        api = fixture_aws_mock_api
+        api._aws_identity = fixture_aws_identity
+
+        ac_thing_name = api.things[MOCK_DEVICE_AC].thing_name
+        dh_thing_name = api.things[MOCK_DEVICE_DH].thing_name
+        he_thing_name = api.things[MOCK_DEVICE_HE].thing_name
+        with patch.object(api, "_mqtt") as mock_mqtt:
+            mock_mqtt.mqtt_events.mqtt_error_event.is_set.return_value = False
+            # AC timed out, HE answered without data.
+            mock_mqtt.execute.return_value = [
+                None,
+                None,
+                [
+                    TimeoutError(),
+                    JciHitachiExecutionResult(dh_thing_name, "dh status"),
+                    JciHitachiExecutionResult(he_thing_name),
+                ],
+                None,
+            ]
+            # The latest response of a thing, which might answer another request, is not used.
+            mock_mqtt.mqtt_events.device_status = {ac_thing_name: "stale"}
+
+            outcomes = api.refresh_status(raise_on_error=False)
+            assert set(outcomes) == {MOCK_DEVICE_AC, MOCK_DEVICE_DH, MOCK_DEVICE_HE}
+            assert "Timed out" in str(outcomes[MOCK_DEVICE_AC])
+            assert outcomes[MOCK_DEVICE_DH] is None
+            assert "wasn't accompanied with data" in str(outcomes[MOCK_DEVICE_HE])
+            assert api.things[MOCK_DEVICE_DH].status_code == "dh status"
+            assert api.things[MOCK_DEVICE_DH].available
+            assert not api.things[MOCK_DEVICE_AC].available
+            assert not api.things[MOCK_DEVICE_HE].available
+
+            # Recovered devices are available again.
+            mock_mqtt.execute.return_value = [
+                None,
+                None,
+                [JciHitachiExecutionResult(ac_thing_name, "ac status")],
+                None,
+            ]
+            assert api.refresh_status(MOCK_DEVICE_AC, raise_on_error=False) == {
+                MOCK_DEVICE_AC: None
+            }
+            assert api.things[MOCK_DEVICE_AC].available
+
+            mock_mqtt.execute.return_value = [None, None, [], None]
+            with pytest.raises(RuntimeError, match="Timed out refreshing"):
+                api.refresh_status(MOCK_DEVICE_AC)
+
+            # Pools which came back empty are timeouts of every device.
+            mock_mqtt.execute.return_value = [None, None, None, None]
+            outcomes = api.refresh_status(raise_on_error=False, refresh_shadow=True)
+            assert all("Timed out" in str(e) for e in outcomes.values())
+            assert not any(thing.available for thing in api.things.values())
+            with pytest.raises(RuntimeError, match="Timed out refreshing"):
+                api.refresh_status(MOCK_DEVICE_AC)
+
+    def test_refresh_status_response_timeout(
+        self, fixture_aws_mock_api, fixture_aws_identity
+    ):
+        api = fixture_aws_mock_api
+        api._aws_identity = fixture_aws_identity
+        api._mqtt_timeout = 0.05
+        api._mqtt = JciHitachiAWSMqttConnection(lambda: None)
+        ac_thing = api.things[MOCK_DEVICE_AC]
+        dh_thing = api.things[MOCK_DEVICE_DH]
+
+        def publish(topic, payload, qos):
+            publish_future = Future()
+            publish_future.set_result(None)
+            # Only DH answers.
+            if dh_thing.thing_name in topic:
+                threading.Timer(
+                    0.01,
+                    api._mqtt._on_publish,
+                    (
+                        f"/{dh_thing.thing_name}/status/response",
+                        json.dumps({"DeviceType": 2, **json.loads(payload)}).encode(),
+                        None,
+                        None,
+                        None,
+                    ),
+                ).start()
+            return publish_future, None
+
+        try:
+            with patch.object(api._mqtt, "_mqttc") as mock_mqttc:
+                mock_mqttc.publish.side_effect = publish
+                # A response received earlier is not the answer of a silent device.
+                api._mqtt.mqtt_events.device_status[ac_thing.thing_name] = (
+                    ac_thing.status_code
+                )
+                outcomes = api.refresh_status(raise_on_error=False)
+        finally:
+            api._mqtt.disconnect()
+
+        assert "Timed out" in str(outcomes[MOCK_DEVICE_AC])
+        assert "Timed out" in str(outcomes[MOCK_DEVICE_HE])
+        assert outcomes[MOCK_DEVICE_DH] is None
+        assert not ac_thing.available
+        assert ac_thing.status_updated_at is None
+        assert dh_thing.available
+        assert dh_thing.status_code.status["DeviceType"] == "DH"
+        assert dh_thing.status_updated_at is not None
+
+    def test_refresh_status_max_age(self, fixture_aws_mock_api, fixture_aws_identity):
+        api = fixture_aws_mock_api
+        api._aws_identity = fixture_aws_identity
+
+        ac_thing = api.things[MOCK_DEVICE_AC]
+        dh_thing = api.things[MOCK_DEVICE_DH]
+        ac_thing.status_updated_at = time.monotonic() - 100
+        dh_thing.status_updated_at = time.monotonic()
+        api.things[MOCK_DEVICE_HE].status_updated_at = time.monotonic()
+        with patch.object(api, "_mqtt") as mock_mqtt:
+            mock_mqtt.mqtt_events.mqtt_error_event.is_set.return_value = False
+            mock_mqtt.execute.return_value = [
+                None,
+                None,
+                [JciHitachiExecutionResult(ac_thing.thing_name, "ac status")],
+                None,
+            ]
+
+            # Only the stale AC is requested.
+            outcomes = api.refresh_status(max_age=60)
+            assert outcomes == dict.fromkeys(
+                [MOCK_DEVICE_AC, MOCK_DEVICE_DH, MOCK_DEVICE_HE]
+            )
+            assert [c.args[1] for c in mock_mqtt.publish.call_args_list] == [
+                ac_thing.thing_name
+            ]
+            assert ac_thing.status_code == "ac status"
+            assert time.monotonic() - ac_thing.status_updated_at < 60
+
+            # Nothing is published when every status is fresh.
+            mock_mqtt.reset_mock()
+            statuses = api.get_status(MOCK_DEVICE_DH, max_age=60)
+            assert statuses[MOCK_DEVICE_DH] is dh_thing.status_code
+            mock_mqtt.publish.assert_not_called()
+            mock_mqtt.execute.assert_not_called()
+
+            mock_mqtt.execute.return_value = [
+                None,
+                None,
+                [JciHitachiExecutionResult(dh_thing.thing_name, "dh status")],
+                None,
+            ]
+            api.refresh_status(MOCK_DEVICE_DH, max_age=0)
+            assert dh_thing.status_code == "dh status"
+
+            # get_status returns the last known status of devices failing to refresh.
+            dh_status = dh_thing.status_code = MagicMock()
+            dh_updated_at = dh_thing.status_updated_at
+            mock_mqtt.execute.return_value = [None, None, [], None]
+            statuses = api.get_status(MOCK_DEVICE_DH, max_age=0)
+            assert statuses[MOCK_DEVICE_DH] is dh_status
+            assert not dh_thing.available
+            # A status which was not refreshed is not taken as fresh.
+            assert dh_thing.status_updated_at == dh_updated_at
+
+            # Concurrent callers share one in-flight refresh of a thing.
+            executing, release = threading.Event(), threading.Event()
+
+            def execute(**kwargs):
+                executing.set()
+                release.wait(5)
+                return [
+                    None,
+                    None,
+                    [JciHitachiExecutionResult(dh_thing.thing_name, "dh status")],
+                    None,
+                ]
+
+            mock_mqtt.reset_mock()
+            mock_mqtt.execute.side_effect = execute
+            with ThreadPoolExecutor(2) as executor:
+                leader = executor.submit(api.refresh_status, MOCK_DEVICE_DH)
+                assert executing.wait(5)
+                follower = executor.submit(api.refresh_status, MOCK_DEVICE_DH)
+                while not follower.running():
+                    time.sleep(0.01)
+                time.sleep(0.05)
+                release.set()
+                assert leader.result() == follower.result() == {MOCK_DEVICE_DH: None}
+            mock_mqtt.execute.assert_called_once()
+
+    def test_set_statuses(self, fixture_aws_mock_api, fixture_aws_identity):
+        api = fixture_aws_mock_api
+        api._aws_identity = fixture_aws_identity
+
+        thing_name = api.things[MOCK_DEVICE_AC].thing_name
+        with patch.object(api, "_mqtt") as mock_mqtt:
+            mock_mqtt.execute.return_value = [
+                [],
+                [],
+                [],
+                [
+                    JciHitachiExecutionResult(
+                        thing_name, {"FanSpeed": 3, "TemperatureSetting": 24}
+                    )
+                ],
+            ]
+            mock_mqtt.mqtt_events.mqtt_error_event.is_set.return_value = False
+
+            assert api.set_statuses(
+                MOCK_DEVICE_AC,
+                {
+                    "air_speed": "moderate",
+                    "TemperatureSetting": 24,
+                    "invalid": 1,
+                },
+            ) == {
+                "air_speed": True,
+                "TemperatureSetting": True,
+                "invalid": False,
+            }
+            # One control payload carries every valid status.
+            mock_mqtt.publish.assert_called_once()
+            payload = mock_mqtt.publish.call_args.args[4]
+            assert payload["FanSpeed"] == 3
+            assert payload["TemperatureSetting"] == 24
+            assert "invalid" not in payload
+            status_code = api.things[MOCK_DEVICE_AC].status_code
+            assert status_code.FanSpeed == "moderate"
+            assert status_code.TemperatureSetting == 24
+
+            # Nothing is sent if no status is valid.
+            mock_mqtt.publish.reset_mock()
+            assert api.set_statuses(MOCK_DEVICE_AC, {"invalid": 1}) == {
+                "invalid": False
+            }
+            mock_mqtt.publish.assert_not_called()
+
+            # Statuses the device did not confirm are reported as failed.
+            assert api.set_statuses(
+                MOCK_DEVICE_AC, {"FanSpeed": 3, "TemperatureSetting": 25}
+            ) == {"FanSpeed": True, "TemperatureSetting": False}
+
+            mock_mqtt.execute.return_value = [[], [], [], []]
+            assert api.set_statuses(MOCK_DEVICE_AC, {"FanSpeed": 3}) == {
+                "FanSpeed": False
+            }
+
+    def test_set_status_many(self, fixture_aws_mock_api, fixture_aws_identity):
+        api = fixture_aws_mock_api
+        api._aws_identity = fixture_aws_identity
+
+        ac_thing_name = api.things[MOCK_DEVICE_AC].thing_name
+        dh_thing_name = api.things[MOCK_DEVICE_DH].thing_name
+        with patch.object(api, "_mqtt") as mock_mqtt:
+            mock_mqtt.execute.return_value = [
+                [],
+                [],
+                [],
+                [
+                    JciHitachiExecutionResult(
+                        ac_thing_name, {"FanSpeed": 3, "TemperatureSetting": 24}
+                    )
+                ],
+            ]
+            mock_mqtt.mqtt_events.mqtt_error_event.is_set.return_value = False
+
+            assert api.set_status_many(
+                [
+                    (MOCK_DEVICE_AC, "FanSpeed", 3),
+                    (MOCK_DEVICE_AC, "TemperatureSetting", 24),
+                    (MOCK_DEVICE_DH, "Mode", 1),
+                    (MOCK_DEVICE_HE, "invalid", 1),
+                ],
+                max_concurrency=4,
+            ) == {MOCK_DEVICE_AC: True, MOCK_DEVICE_DH: False, MOCK_DEVICE_HE: False}
+            # One request per device, all executed at once.
+            assert [c.args[1] for c in mock_mqtt.publish.call_args_list] == [
+                ac_thing_name,
+                dh_thing_name,
+            ]
+            # Requests are executed as a batch of their own.
+            execution_pools = mock_mqtt.publish.call_args.kwargs["execution_pools"]
+            mock_mqtt.execute.assert_called_once_with(
+                control=True, max_concurrency=4, execution_pools=execution_pools
+            )
+
+            mock_mqtt.reset_mock()
+            assert api.set_status_many([(MOCK_DEVICE_HE, "invalid", 1)]) == {
+                MOCK_DEVICE_HE: False
+            }
+            mock_mqtt.publish.assert_not_called()
+            mock_mqtt.execute.assert_not_called()
+
+            # An unknown device fails the call before anything is queued.
+            with pytest.raises(KeyError):
+                api.set_status_many(
+                    [(MOCK_DEVICE_AC, "FanSpeed", 3), ("unknown", "FanSpeed", 3)]
+                )
+            mock_mqtt.publish.assert_not_called()
+
     def test_refresh_monthly_data(self, fixture_aws_mock_api):
         api = fixture_aws_mock_api
         with patch(
@@ -455,8 +870,381 @@ class TestAWSAPI:
             ):
                 api.refresh_monthly_data(2, MOCK_DEVICE_AC)
 
+    def test_subscribe_status(self, fixture_aws_mock_api):
+        api = fixture_aws_mock_api
+        thing = api.things[MOCK_DEVICE_DH]
+        status = JciHitachiAWSStatus({"DeviceType": 2, "Mode": 0})
+        received = []
+
+        unsubscribe = api.subscribe_status(
+            lambda name, status: received.append((name, status))
+        )
+        api._on_status_update(thing.thing_name, status)
+        assert received == [(MOCK_DEVICE_DH, status)]
+        assert thing.status_code is status
+
+        unsubscribe()
+        api._on_status_update(thing.thing_name, status)
+        assert len(received) == 1
+
+    def test_status_updates(self, fixture_aws_mock_api):
+        api = fixture_aws_mock_api
+        thing = api.things[MOCK_DEVICE_AC]
+        statuses = [
+            JciHitachiAWSStatus({"DeviceType": 1, "TemperatureSetting": t})
+            for t in (20, 21)
+        ]
+
+        async def collect():
+            updates = api.status_updates()
+            first = asyncio.ensure_future(updates.__anext__())
+            await asyncio.sleep(0)
+            # Pushed from an MQTT thread.
+            for status in statuses:
+                await asyncio.to_thread(api._on_status_update, thing.thing_name, status)
+            results = [await first, await updates.__anext__()]
+            await updates.aclose()
+            return results
+
+        assert asyncio.run(collect()) == [
+            (MOCK_DEVICE_AC, statuses[0]),
+            (MOCK_DEVICE_AC, statuses[1]),
+        ]
+        assert len(api._status_callbacks) == 0
+
+    def test_refresh_monthly_data_all(self, fixture_aws_mock_api, tmp_path):
+        api = fixture_aws_mock_api
+        cache_path = str(tmp_path / "monthly.json")
+        api._monthly_data_cache = MonthlyDataCache(cache_path)
+        thing = api.things[MOCK_DEVICE_AC]
+
+        tz = datetime.timezone(datetime.timedelta(hours=8))
+        # Records stamped at month starts of the device, which are in the previous month in UTC.
+        jan_record, feb_record, mar_record = (
+            {
+                "Timestamp": int(
+                    datetime.datetime(2024, month, 1, tzinfo=tz).timestamp() * 1000
+                )
+            }
+            for month in (1, 2, 3)
+        )
+        # January is closed for more than the grace period, February is not.
+        now = datetime.datetime(2024, 3, 2, 12, tzinfo=tz)
+
+        with patch(
+            "JciHitachi.aws_connection.GetAvailableAggregationMonthlyData.get_data"
+        ) as mock_get_data:
+
+            def assert_fetched_from(month_start):
+                assert mock_get_data.call_args.args[1] == int(
+                    (month_start - datetime.timedelta(days=1)).timestamp() * 1000
+                )
+
+            # Final months without data are cached as well.
+            dh_thing = api.things[MOCK_DEVICE_DH]
+            mock_get_data.return_value = (
+                "OK",
+                {"results": {"Data": [feb_record, mar_record]}},
+            )
+            api._refresh_cached_monthly_data(dh_thing, 3, now)
+            assert_fetched_from(datetime.datetime(2024, 1, 1, tzinfo=tz))
+            assert dh_thing.monthly_data == [feb_record, mar_record]
+            api._refresh_cached_monthly_data(dh_thing, 3, now)
+            assert_fetched_from(datetime.datetime(2024, 2, 1, tzinfo=tz))
+            assert api._monthly_data_cache.get(dh_thing.thing_name) == {"2024-01": []}
+
+            mock_get_data.return_value = (
+                "OK",
+                {"results": {"Data": [jan_record, feb_record, mar_record]}},
+            )
+            api._refresh_cached_monthly_data(thing, 3, now)
+            assert_fetched_from(datetime.datetime(2024, 1, 1, tzinfo=tz))
+            assert thing.monthly_data == [jan_record, feb_record, mar_record]
+
+            # Final months are served from the cache, months within the grace period are fetched again.
+            api._monthly_data_cache = MonthlyDataCache(cache_path)
+            thing.monthly_data = None
+            api._refresh_cached_monthly_data(thing, 3, now)
+            assert_fetched_from(datetime.datetime(2024, 2, 1, tzinfo=tz))
+            assert thing.monthly_data == [jan_record, feb_record, mar_record]
+
+            now = datetime.datetime(2024, 3, 5, tzinfo=tz)
+            api._refresh_cached_monthly_data(thing, 3, now)
+            api._refresh_cached_monthly_data(thing, 3, now)
+            assert_fetched_from(datetime.datetime(2024, 3, 1, tzinfo=tz))
+            assert thing.monthly_data == [jan_record, feb_record, mar_record]
+
+            api.refresh_monthly_data_all(3, [MOCK_DEVICE_AC], tz=tz)
+            assert mock_get_data.call_args.args[2] <= time.time() * 1000
+
+            mock_get_data.return_value = ("Not OK", {})
+            with pytest.raises(
+                RuntimeError,
+                match="An error occurred when refreshing monthly data of devices",
+            ):
+                api.refresh_monthly_data_all(3)
+
+            with pytest.raises(ValueError, match="months must be at least 1."):
+                api.refresh_monthly_data_all(0)
+
+    @pytest.mark.skipif(not hasattr(time, "tzset"), reason="requires time.tzset")
+    def test_refresh_monthly_data_all_local_dst(
+        self, fixture_aws_mock_api, monkeypatch
+    ):
+        api = fixture_aws_mock_api
+        thing = api.things[MOCK_DEVICE_AC]
+        tz = zoneinfo.ZoneInfo("Europe/Berlin")
+        # Stamped in winter time, one hour before March starts.
+        feb_record = {
+            "Timestamp": int(
+                datetime.datetime(2024, 2, 29, 23, 30, tzinfo=tz).timestamp() * 1000
+            )
+        }
+
+        monkeypatch.setenv("TZ", "Europe/Berlin")
+        time.tzset()
+        try:
+            with patch(
+                "JciHitachi.aws_connection.GetAvailableAggregationMonthlyData.get_data",
+                return_value=("OK", {"results": {"Data": [feb_record]}}),
+            ):
+                # Local time in summer time, whose offset differs from the one of February.
+                api._refresh_cached_monthly_data(
+                    thing, 3, datetime.datetime(2024, 4, 20, 12)
+                )
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+        assert api._monthly_data_cache.get(thing.thing_name) == {
+            "2024-02": [feb_record],
+            "2024-03": [],
+        }
+
+
+class TestAsyncJciHitachiAWSAPI:
+    @pytest.fixture()
+    def api(
+        self,
+        fixture_aws_mock_ac_thing,
+        fixture_aws_mock_dh_thing,
+        fixture_aws_mock_he_thing,
+        fixture_aws_identity,
+    ):
+        api = AsyncJciHitachiAWSAPI("", "")
+        api.api._aws_tokens = AWSTokens("", "", "", time.time() + 3600)
+        api.api._aws_identity = fixture_aws_identity
+        api.api._things = {
+            MOCK_DEVICE_AC: fixture_aws_mock_ac_thing,
+            MOCK_DEVICE_DH: fixture_aws_mock_dh_thing,
+            MOCK_DEVICE_HE: fixture_aws_mock_he_thing,
+        }
+        return api
+
+    def test_login(self, api):
+        aws_tokens = api.api._aws_tokens
+        api.api._aws_tokens = None
+        user_response = {
+            "Username": "username",
+            "UserAttributes": [
+                {"Name": "custom:cognito_identity_id", "Value": "id"},
+                {"Name": "custom:host_identity_id", "Value": "host_id"},
+            ],
+        }
+        with (
+            patch(
+                "JciHitachi.aws_connection.AsyncGetUser.login",
+                new_callable=AsyncMock,
+                return_value=("OK", aws_tokens),
+            ),
+            patch(
+                "JciHitachi.aws_connection.AsyncGetUser._send",
+                new_callable=AsyncMock,
+                return_value=("OK", user_response),
+            ),
+            patch(
+                "JciHitachi.aws_connection.AsyncGetAllDevice.get_data",
+                new_callable=AsyncMock,
+                return_value=("OK", MOCK_THINGS_JSON),
+            ),
+            patch.object(
+                api.api, "_configure_mqtt", return_value=["thing"]
+            ) as mock_configure,
+            patch.object(api.api, "_mqtt", create=True) as mock_mqtt,
+            patch.object(api.api, "_token_manager") as mock_token_manager,
+            patch.object(api, "refresh_status", new_callable=AsyncMock) as mock_refresh,
+        ):
+            mock_mqtt.connect_async = AsyncMock(return_value=True)
+            asyncio.run(api.login())
+            assert api.api._aws_tokens == aws_tokens
+            assert api.api._aws_identity.host_identity_id == "host_id"
+            mock_configure.assert_called_once_with(MOCK_THINGS_JSON)
+            # The MQTT connection is awaited instead of blocking a worker thread.
+            mock_mqtt.connect.assert_not_called()
+            mock_mqtt.connect_async.assert_awaited_once()
+            mock_token_manager.start.assert_called_once()
+            mock_refresh.assert_awaited_once_with(
+                refresh_support_code=True, refresh_shadow=True
+            )
+
+    def test_check_before_publish(self, api):
+        manager = api.api._token_manager
+        # Within renew_before, but not within retry_interval.
+        manager.aws_tokens = AWSTokens("", "", "", time.time() + 100)
+        with (
+            patch.object(api.api, "_mqtt") as mock_mqtt,
+            patch.object(api.api, "_check_before_publish") as mock_check,
+        ):
+            mock_mqtt.mqtt_events.mqtt_error_event.is_set.return_value = False
+            # The background renewal is expected to handle it, so no thread is used.
+            manager._running = True
+            try:
+                asyncio.run(api._check_before_publish())
+            finally:
+                manager._running = False
+            mock_check.assert_not_called()
+
+            asyncio.run(api._check_before_publish())
+            mock_check.assert_called_once()
+
+    def test_refresh_status(self, api):
+        thing_name = api.things[MOCK_DEVICE_AC].thing_name
+        with patch.object(api.api, "_mqtt") as mock_mqtt:
+            mock_mqtt.mqtt_events.mqtt_error_event.is_set.return_value = False
+            mock_mqtt.execute_async = AsyncMock(
+                return_value=(
+                    None,
+                    None,
+                    [JciHitachiExecutionResult(thing_name, "status")],
+                    None,
+                )
+            )
+
+            asyncio.run(api.refresh_status(MOCK_DEVICE_AC))
+            mock_mqtt.execute.assert_not_called()
+            execution_pools = mock_mqtt.publish.call_args.kwargs["execution_pools"]
+            mock_mqtt.execute_async.assert_awaited_once_with(
+                concurrently=True, execution_pools=execution_pools
+            )
+            assert api.things[MOCK_DEVICE_AC].status_code == "status"
+
+            mock_mqtt.execute_async.return_value = (None, None, [], None)
+            with pytest.raises(RuntimeError, match="Timed out refreshing"):
+                asyncio.run(api.refresh_status(MOCK_DEVICE_AC))
+
+    def test_set_status(self, api):
+        thing_name = api.things[MOCK_DEVICE_AC].thing_name
+        with patch.object(api.api, "_mqtt") as mock_mqtt:
+            mock_mqtt.mqtt_events.mqtt_error_event.is_set.return_value = False
+            mock_mqtt.execute_async = AsyncMock(
+                return_value=(
+                    None,
+                    None,
+                    None,
+                    [JciHitachiExecutionResult(thing_name, {"FanSpeed": 3})],
+                )
+            )
+
+            assert asyncio.run(
+                api.set_status("FanSpeed", MOCK_DEVICE_AC, status_str_value="moderate")
+            )
+            assert not asyncio.run(api.set_status("invalid", MOCK_DEVICE_AC, 1))
+            assert asyncio.run(
+                api.set_status_many([(MOCK_DEVICE_AC, "FanSpeed", 3)])
+            ) == {MOCK_DEVICE_AC: True}
+            mock_mqtt.execute.assert_not_called()
+            assert mock_mqtt.publish.call_count == 2
+
+    def test_refresh_monthly_data(self, api):
+        with patch(
+            "JciHitachi.aws_connection.AsyncGetAvailableAggregationMonthlyData.get_data",
+            new_callable=AsyncMock,
+            return_value=(
+                "OK",
+                {"results": {"Data": [{"Timestamp": 2}, {"Timestamp": 1}]}},
+            ),
+        ):
+            asyncio.run(api.refresh_monthly_data(2, MOCK_DEVICE_AC))
+            assert api.things[MOCK_DEVICE_AC].monthly_data == [
+                {"Timestamp": 1},
+                {"Timestamp": 2},
+            ]
+
+
+class TestJciHitachiAWSHub:
+    def test_hub(self):
+        hub = JciHitachiAWSHub(max_concurrency=4)
+        api_a = hub.add_account("a@example.com", "password").api
+        api_b = hub.add_account("b@example.com", "password").api
+        assert hub.accounts == ["a@example.com", "b@example.com"]
+        assert api_a._http_session is api_b._http_session is hub._http_session
+        assert api_a._rate_limiter is api_b._rate_limiter
+        # Accounts share one loop thread and message queue instead of starting their own.
+        assert api_a._event_loop is api_b._event_loop is hub._event_loop
+        assert api_a._message_queue is api_b._message_queue is hub._message_queue
+        assert api_a._crt_resources is None
+        hub_threads = JciHitachiAWSHub(crt_threads=2)
+        api_c = hub_threads.add_account("c@example.com", "password").api
+        assert api_c._crt_resources is hub_threads._crt_resources is not None
+        with pytest.raises(ValueError):
+            hub.add_account("a@example.com", "password")
+
+        async def login(self):
+            if self.api.email == "b@example.com":
+                raise RuntimeError("failed")
+
+        async def run():
+            with (
+                patch.object(
+                    AsyncJciHitachiAWSAPI, "login", autospec=True
+                ) as mock_login,
+                patch.object(
+                    AsyncJciHitachiAWSAPI, "refresh_status", new_callable=AsyncMock
+                ) as mock_refresh,
+                patch.object(
+                    AsyncJciHitachiAWSAPI,
+                    "get_status",
+                    new_callable=AsyncMock,
+                    return_value={"device": "status"},
+                ),
+                patch.object(
+                    AsyncJciHitachiAWSAPI,
+                    "set_status",
+                    new_callable=AsyncMock,
+                    return_value=True,
+                ) as mock_set,
+            ):
+                mock_login.side_effect = login
+                login_results = await hub.login()
+                assert login_results["a@example.com"] is None
+                assert isinstance(login_results["b@example.com"], RuntimeError)
+
+                assert await hub.refresh("a@example.com", "device") == {
+                    "device": "status"
+                }
+                mock_refresh.assert_awaited_once_with("device")
+                assert await hub.set("a@example.com", "device", "power", 1)
+                mock_set.assert_awaited_once_with("power", "device", 1, None)
+            await hub.close()
+
+        asyncio.run(run())
+        assert hub.accounts == []
+        metrics = hub.metrics
+        assert metrics["login"]["calls"] == 2
+        assert metrics["login"]["failures"] == 1
+        assert metrics["refresh"]["calls"] == metrics["set"]["calls"] == 1
+        assert all(m["in_flight"] == 0 for m in metrics.values())
+
 
 class TestAWSThing:
+    def test_status_updated_at(self, fixture_aws_mock_ac_thing):
+        thing = AWSThing(fixture_aws_mock_ac_thing.picked_thing)
+        thing.status_code = fixture_aws_mock_ac_thing.status_code
+        # Setting a status code does not tell when it was received.
+        assert thing.status_updated_at is None
+        thing.status_updated_at = 1.0
+        assert thing.status_updated_at == 1.0
+
     def test_repr(
         self,
         fixture_aws_mock_ac_thing,
@@ -1,11 +1,15 @@
+import asyncio
 import concurrent
 import datetime
+import json
 import time
 import threading
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import awscrt
+import awscrt.mqtt5
 import awsiot
+import httpx
 import pytest
 
 from JciHitachi.aws_connection import (
@@ -14,7 +18,17 @@ from JciHitachi.aws_connection import (
     AWS_IOT_ENDPOINT,
     AWSIdentity,
     AWSTokens,
+    AsyncChangePassword,
+    AsyncGetAllDevice,
+    AsyncGetAllGroup,
+    AsyncGetAllRegion,
+    AsyncGetAvailableAggregationMonthlyData,
+    AsyncGetCredentials,
+    AsyncGetHistoryEventByUser,
+    AsyncGetUser,
+    AsyncListSubUser,
     ChangePassword,
+    FileAWSTokenStore,
     GetAllDevice,
     GetAllGroup,
     GetAllRegion,
@@ -22,8 +36,22 @@ from JciHitachi.aws_connection import (
     GetCredentials,
     GetHistoryEventByUser,
     GetUser,
+    InMemoryAWSTokenStore,
     JciHitachiAWSCognitoConnection,
+    JciHitachiAWSCredentialsCache,
+    JciHitachiAWSCrtResources,
+    JciHitachiAWSEventLoop,
+    JciHitachiAWSCircuitOpenError,
+    JciHitachiAWSHttpSession,
+    JciHitachiAWSMessageQueue,
+    JciHitachiAWSMqtt5Options,
     JciHitachiAWSMqttConnection,
+    JciHitachiAWSRateLimiter,
+    JciHitachiAWSRetryPolicy,
+    JciHitachiAWSTokenManager,
+    JciHitachiExecutionPools,
+    JciHitachiExecutionResult,
+    JciHitachiSingleFlight,
     ListSubUser,
 )
 from JciHitachi.model import JciHitachiAWSStatus, JciHitachiAWSStatusSupport
@@ -88,6 +116,46 @@ class TestJciHitachiAWSMqttConnection:
         assert mqtt._mqtt_events.mqtt_error == "JSONDecodeError"
         assert mqtt._mqtt_events.mqtt_error_event.is_set()
 
+    def test_decode_payload(self, fixture_aws_mock_mqtt_connection):
+        mqtt = fixture_aws_mock_mqtt_connection
+        assert mqtt._decode_payload(b'{"DeviceType": 1}') == {"DeviceType": 1}
+        # Invalid UTF-8 is replaced rather than rejected.
+        assert mqtt._decode_payload(b'{"Name": "\xff"}') == {"Name": "\ufffd"}
+
+        # Topics without a handler are ignored.
+        with patch.object(mqtt, "_on_status_response") as mock_handler:
+            mqtt._publish_handlers[("status", "response")] = mock_handler
+            mqtt._on_publish("/thing/status/request", b"{}", None, None, None)
+            mqtt._on_publish("/thing/shadow/response", b"{}", None, None, None)
+            mock_handler.assert_not_called()
+            mqtt._on_publish("/thing/status/response", b"{}", None, None, None)
+            mock_handler.assert_called_once_with("thing", {})
+
+    def test_status_listener(self, fixture_aws_mock_mqtt_connection):
+        mqtt = fixture_aws_mock_mqtt_connection
+        received = []
+
+        def failing_listener(thing_name, status):
+            raise ValueError()
+
+        mqtt.add_status_listener(failing_listener)
+        remove = mqtt.add_status_listener(
+            lambda thing_name, status: received.append((thing_name, status))
+        )
+        # Status responses to requests from other clients are also delivered.
+        mqtt._on_publish(
+            "/thing/status/response", b'{"DeviceType": 1}', None, None, None
+        )
+        assert len(received) == 1
+        assert received[0][0] == "thing"
+        assert isinstance(received[0][1], JciHitachiAWSStatus)
+
+        remove()
+        mqtt._on_publish(
+            "/thing/status/response", b'{"DeviceType": 1}', None, None, None
+        )
+        assert len(received) == 1
+
     def test_on_get_named_shadow_accepted_callback(
         self, fixture_aws_mock_mqtt_connection
     ):
@@ -143,6 +211,41 @@ class TestJciHitachiAWSMqttConnection:
         assert isinstance(mqtt._mqttc, awscrt.mqtt.Connection)
         assert isinstance(mqtt._shadow_mqttc, awsiot.iotshadow.IotShadowClient)
 
+    def test_configure_mqtt5(self, fixture_aws_mock_mqtt_connection):
+        mqtt = JciHitachiAWSMqttConnection(
+            fixture_aws_mock_mqtt_connection._get_credentials_callable,
+            mqtt5_options=JciHitachiAWSMqtt5Options(receive_maximum=10),
+        )
+        mqtt.configure(identity_id="identity_id")
+
+        assert isinstance(mqtt._mqtt5_client, awscrt.mqtt5.Client)
+        assert isinstance(mqtt._mqttc, awscrt.mqtt.Connection)
+        assert isinstance(mqtt._shadow_mqttc, awsiot.iotshadow.IotShadowClient)
+
+    def test_configure_shared_resources(self):
+        resources = JciHitachiAWSCrtResources(num_threads=1)
+        connections = [
+            JciHitachiAWSMqttConnection(lambda: None, crt_resources=resources)
+            for _ in range(2)
+        ]
+        with (
+            patch(
+                "JciHitachi.aws_connection.mqtt_connection_builder.websockets_with_default_aws_signing"
+            ) as mock_builder,
+            patch("JciHitachi.aws_connection.iotshadow.IotShadowClient"),
+        ):
+            for connection in connections:
+                connection.configure(identity_id="identity_id")
+            assert all(
+                call.kwargs["client_bootstrap"] is resources.client_bootstrap
+                for call in mock_builder.call_args_list
+            )
+
+        assert (
+            JciHitachiAWSCrtResources.get_default()
+            is JciHitachiAWSCrtResources.get_default()
+        )
+
     def test_connect(self, fixture_aws_mock_mqtt_connection):
         mqtt = fixture_aws_mock_mqtt_connection
 
@@ -154,6 +257,7 @@ class TestJciHitachiAWSMqttConnection:
             subscribe_future.set_result(None)
             mock_mqttc.subscribe.return_value = (subscribe_future, None)
             assert mqtt.connect("")
+            assert asyncio.run(mqtt.connect_async(""))
 
         with patch.object(mqtt, "_mqttc") as mock_mqttc:
             connect_future = concurrent.futures.Future()
@@ -174,6 +278,58 @@ class TestJciHitachiAWSMqttConnection:
             assert not mqtt.connect("")
             assert mqtt._mqtt_events.mqtt_error == "RuntimeError"
             assert mqtt._mqtt_events.mqtt_error_event.is_set()
+            mqtt._mqtt_events.mqtt_error_event.clear()
+            assert not asyncio.run(mqtt.connect_async(""))
+            assert mqtt._mqtt_events.mqtt_error_event.is_set()
+
+    @pytest.mark.parametrize("wildcard", [False, True])
+    def test_connect_shadow_subscriptions(
+        self, fixture_aws_mock_mqtt_connection, wildcard
+    ):
+        mqtt = fixture_aws_mock_mqtt_connection
+        thing_names = [f"thing_{i}" for i in range(3)]
+        pending = []
+
+        def subscribe(*args, **kwargs):
+            future = concurrent.futures.Future()
+            pending.append(future)
+            return future, None
+
+        def complete_all():
+            # Complete subscriptions only after all of them were issued.
+            time.sleep(0.05)
+            for future in pending:
+                future.set_result(None)
+
+        with (
+            patch.object(mqtt, "_mqttc") as mock_mqttc,
+            patch.object(mqtt, "_shadow_mqttc") as mock_shadow_mqttc,
+        ):
+            connect_future = concurrent.futures.Future()
+            connect_future.set_result(None)
+            mock_mqttc.connect.return_value = connect_future
+            mock_mqttc.subscribe.side_effect = subscribe
+            for name in [
+                "subscribe_to_update_named_shadow_accepted",
+                "subscribe_to_update_named_shadow_rejected",
+                "subscribe_to_get_named_shadow_accepted",
+                "subscribe_to_get_named_shadow_rejected",
+            ]:
+                getattr(mock_shadow_mqttc, name).side_effect = subscribe
+
+            threading.Thread(target=complete_all).start()
+            assert mqtt.connect("", "info", thing_names, wildcard=wildcard)
+
+            subscribed_things = {
+                call.kwargs["request"].thing_name
+                for call in mock_shadow_mqttc.subscribe_to_get_named_shadow_accepted.call_args_list
+            }
+            if wildcard:
+                assert len(pending) == 1 + 4
+                assert subscribed_things == {"+"}
+            else:
+                assert len(pending) == 1 + 4 * len(thing_names)
+                assert subscribed_things == set(thing_names)
 
     def test_publish(self, fixture_aws_mock_mqtt_connection):
         mqtt = fixture_aws_mock_mqtt_connection
@@ -253,6 +409,25 @@ class TestJciHitachiAWSMqttConnection:
                     )
                     assert not mqtt._mqtt_events.mqtt_error_event.is_set()
 
+        # Client tokens of requests which are never answered are not kept.
+        mqtt._client_tokens.clear()
+        batch = JciHitachiExecutionPools()
+        with patch.object(mqtt, "_shadow_mqttc") as mock_shadow_mqttc:
+            publish_future = concurrent.futures.Future()
+            publish_future.set_result(None)
+            mock_shadow_mqttc.publish_get_named_shadow.return_value = publish_future
+            mqtt.publish_shadow(
+                thing_name,
+                "get",
+                shadow_name="info",
+                timeout=0.01,
+                execution_pools=batch,
+            )
+            assert len(mqtt._client_tokens) == 1
+            mqtt.execute(execution_pools=batch)
+            assert len(mqtt._client_tokens) == 0
+        mqtt.disconnect()
+
         # Test invalid command name.
         with pytest.raises(
             ValueError, match="command_name must be one of `get` or `update`."
@@ -261,25 +436,29 @@ class TestJciHitachiAWSMqttConnection:
 
     def test_execute(self, fixture_aws_mock_mqtt_connection):
         mqtt = fixture_aws_mock_mqtt_connection
+
         # The executed functions are no-op.
+        async def fn():
+            return None
+
         mqtt._execution_pools.support_execution_pool.append(
-            mqtt._wrap_async("support_identifier", lambda: None)
+            mqtt._wrap_async("support_identifier", fn)
         )
         mqtt._execution_pools.shadow_execution_pool.append(
-            mqtt._wrap_async("shadow_identifier", lambda: None)
+            mqtt._wrap_async("shadow_identifier", fn)
         )
         mqtt._execution_pools.status_execution_pool.append(
-            mqtt._wrap_async("status_identifier", lambda: None)
+            mqtt._wrap_async("status_identifier", fn)
         )
         mqtt._execution_pools.control_execution_pool.append(
-            mqtt._wrap_async("control_identifier", lambda: None)
+            mqtt._wrap_async("control_identifier", fn)
         )
 
         results = mqtt.execute()
         assert results == (
-            ["support_identifier"],
-            ["shadow_identifier"],
-            ["status_identifier"],
+            [JciHitachiExecutionResult("support_identifier")],
+            [JciHitachiExecutionResult("shadow_identifier")],
+            [JciHitachiExecutionResult("status_identifier")],
             None,
         )
         assert len(mqtt._execution_pools.support_execution_pool) == 0
@@ -287,9 +466,902 @@ class TestJciHitachiAWSMqttConnection:
         assert len(mqtt._execution_pools.status_execution_pool) == 0
 
         results = mqtt.execute(control=True)
-        assert results == (None, None, None, ["control_identifier"])
+        assert results == (
+            None,
+            None,
+            None,
+            [JciHitachiExecutionResult("control_identifier")],
+        )
         assert len(mqtt._execution_pools.control_execution_pool) == 0
 
+    def test_execute_concurrently(self, fixture_aws_mock_mqtt_connection):
+        mqtt = fixture_aws_mock_mqtt_connection
+        mqtt._rate_limiter = JciHitachiAWSRateLimiter(rate=None, thing_rate=None)
+        order = []
+
+        def make_fn(name):
+            async def fn():
+                order.append(f"{name} start")
+                await asyncio.sleep(0.05)
+                order.append(f"{name} end")
+
+            return fn
+
+        pools = mqtt._execution_pools
+        pools.support_execution_pool.append(
+            mqtt._wrap_async("thing", make_fn("support"))
+        )
+        pools.shadow_execution_pool.append(
+            mqtt._wrap_async("thing", make_fn("shadow"), device_lock=False)
+        )
+        pools.status_execution_pool.append(mqtt._wrap_async("thing", make_fn("status")))
+
+        results = mqtt.execute(concurrently=True)
+        assert results == tuple(
+            [JciHitachiExecutionResult("thing")] for _ in range(3)
+        ) + (None,)
+        # Shadow runs alongside, while the device handles support before status.
+        assert order.index("shadow start") < order.index("support end")
+        assert order.index("support end") < order.index("status start")
+        mqtt.disconnect()
+
+    def test_execute_execution_pools(self, fixture_aws_mock_mqtt_connection):
+        mqtt = fixture_aws_mock_mqtt_connection
+        batch_a, batch_b = JciHitachiExecutionPools(), JciHitachiExecutionPools()
+
+        with patch.object(mqtt, "_mqttc") as mock_mqttc:
+
+            def publish(topic, payload, qos):
+                # Each thing answers with its own name.
+                thing_name = topic.split("/")[1]
+                threading.Timer(
+                    0.01,
+                    mqtt._correlator.resolve,
+                    (thing_name, "status", thing_name),
+                ).start()
+                publish_future = concurrent.futures.Future()
+                publish_future.set_result(None)
+                return publish_future, None
+
+            mock_mqttc.publish.side_effect = publish
+
+            mqtt.publish("", "thing_a", "status", 5.0, execution_pools=batch_a)
+            mqtt.publish("", "thing_b", "status", 5.0, execution_pools=batch_b)
+            mqtt.publish("", "thing_c", "status", 5.0)
+            # Each execution only runs its own batch.
+            assert mqtt.execute(execution_pools=batch_a)[2] == [
+                JciHitachiExecutionResult("thing_a", "thing_a")
+            ]
+            assert len(batch_b.status_execution_pool) == 1
+            assert len(mqtt._execution_pools.status_execution_pool) == 1
+            assert mqtt.execute(execution_pools=batch_b)[2] == [
+                JciHitachiExecutionResult("thing_b", "thing_b")
+            ]
+            assert mqtt.execute()[2] == [
+                JciHitachiExecutionResult("thing_c", "thing_c")
+            ]
+        mqtt.disconnect()
+
+    def test_execute_max_concurrency(self, fixture_aws_mock_mqtt_connection):
+        mqtt = fixture_aws_mock_mqtt_connection
+        mqtt._rate_limiter = JciHitachiAWSRateLimiter(rate=None, thing_rate=None)
+        running, peak = 0, 0
+
+        async def fn():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        pool = mqtt._execution_pools.control_execution_pool
+        for i in range(6):
+            pool.append(mqtt._wrap_async(f"thing{i}", fn))
+
+        results = mqtt.execute(control=True, max_concurrency=2)
+        assert [result.thing_name for result in results[3]] == [
+            f"thing{i}" for i in range(6)
+        ]
+        assert peak == 2
+        assert len(pool) == 0
+        mqtt.disconnect()
+
+    def test_execute_async(self, fixture_aws_mock_mqtt_connection):
+        mqtt = fixture_aws_mock_mqtt_connection
+        mqtt._rate_limiter = JciHitachiAWSRateLimiter(rate=None, thing_rate=None)
+        ticks = []
+
+        async def fn():
+            await asyncio.sleep(0.05)
+
+        async def tick():
+            for _ in range(3):
+                ticks.append(None)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            pool = mqtt._execution_pools.control_execution_pool
+            pool.append(mqtt._wrap_async("thing", fn))
+            # The caller's event loop keeps running while commands are executed.
+            results, _ = await asyncio.gather(mqtt.execute_async(control=True), tick())
+            return results
+
+        assert asyncio.run(run()) == (
+            None,
+            None,
+            None,
+            [JciHitachiExecutionResult("thing")],
+        )
+        assert len(ticks) == 3
+        mqtt.disconnect()
+
+    def test_execute_on_loop_thread(self, fixture_aws_mock_mqtt_connection):
+        mqtt = fixture_aws_mock_mqtt_connection
+        thing_name = (
+            f"ap-northeast-1:8916b515-8394-4ccd-95b8-4f553c13dafa_{MOCK_GATEWAY_MAC}"
+        )
+        threads = []
+
+        with patch.object(mqtt, "_mqttc") as mock_mqttc:
+
+            def publish(topic, payload, qos):
+                threads.append(threading.current_thread().name)
+                publish_future = concurrent.futures.Future()
+                # Responses arrive on awscrt threads.
+                threading.Timer(
+                    0.01,
+                    lambda: (
+                        publish_future.set_result(None),
+                        mqtt._on_publish(
+                            f"/{thing_name}/status/response",
+                            json.dumps(
+                                {"DeviceType": 1, **json.loads(payload)}
+                            ).encode(),
+                            None,
+                            None,
+                            None,
+                        ),
+                    ),
+                ).start()
+                return publish_future, None
+
+            mock_mqttc.publish.side_effect = publish
+            for _ in range(2):
+                mqtt.publish("", thing_name, "status", timeout=5.0)
+                results = mqtt.execute()[2]
+                assert results[0].thing_name == thing_name
+                # The result carries the response to this request.
+                assert isinstance(results[0].response, JciHitachiAWSStatus)
+                assert mqtt._mqtt_events.device_status_event[thing_name].is_set()
+            assert threads == ["JciHitachiAWSMqttLoop"] * 2
+
+            loop = mqtt._event_loop._loop
+            mqtt.disconnect()
+            assert loop.is_closed()
+            assert mqtt._event_loop._loop is None
+
+    def test_shared_resources(self):
+        event_loop = JciHitachiAWSEventLoop()
+        message_queue = JciHitachiAWSMessageQueue()
+        limiter = JciHitachiAWSRateLimiter(global_rate=20.0, global_burst=1)
+        mqtt_a, mqtt_b = (
+            JciHitachiAWSMqttConnection(
+                lambda: None,
+                rate_limiter=limiter,
+                message_queue=message_queue,
+                event_loop=event_loop,
+            )
+            for _ in range(2)
+        )
+        mqtt_a._identity_id, mqtt_b._identity_id = "identity_a", "identity_b"
+        threads = []
+
+        async def fn():
+            threads.append(threading.current_thread())
+
+        start = time.monotonic()
+        for mqtt in (mqtt_a, mqtt_b):
+            mqtt._execution_pools.control_execution_pool.append(
+                mqtt._wrap_async("thing", fn)
+            )
+            mqtt.execute(control=True)
+        # The second account waits for the global budget, and both run on one thread.
+        assert time.monotonic() - start >= 0.04
+        assert threads[0] is threads[1]
+        assert mqtt_a.message_queue is mqtt_b.message_queue is message_queue
+
+        # Disconnecting an account leaves the shared resources to the others.
+        loop = event_loop.get()
+        mqtt_a.disconnect()
+        assert loop.is_running()
+        assert not message_queue._closed
+        event_loop.stop()
+        assert loop.is_closed()
+
+    def test_request_correlation(self, fixture_aws_mock_mqtt_connection):
+        mqtt = fixture_aws_mock_mqtt_connection
+        thing_name = (
+            f"ap-northeast-1:8916b515-8394-4ccd-95b8-4f553c13dafa_{MOCK_GATEWAY_MAC}"
+        )
+        control_topic = f"/{thing_name}/control/response"
+        published = []
+
+        with patch.object(mqtt, "_mqttc") as mock_mqttc:
+
+            def publish(topic, payload, qos):
+                published.append(json.loads(payload))
+                publish_future = concurrent.futures.Future()
+                publish_future.set_result(None)
+                return publish_future, None
+
+            mock_mqttc.publish.side_effect = publish
+
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                futures = [
+                    executor.submit(
+                        mqtt.request,
+                        "",
+                        thing_name,
+                        "control",
+                        {"Power": task_id, "TaskID": task_id},
+                        5.0,
+                    )
+                    for task_id in (1, 2)
+                ]
+                while mqtt._correlator.pending(thing_name, "control") < 2:
+                    time.sleep(0.01)
+                # Responses arrive in reverse order.
+                for task_id in (2, 1):
+                    mqtt._on_publish(
+                        control_topic,
+                        json.dumps({"Power": task_id, "TaskID": task_id}).encode(),
+                        None,
+                        None,
+                        None,
+                    )
+                assert [f.result()["Power"] for f in futures] == [1, 2]
+
+            # Responses without a known token resolve the oldest request.
+            future = concurrent.futures.ThreadPoolExecutor(1).submit(
+                mqtt.request, "", thing_name, "status", None, 5.0
+            )
+            while mqtt._correlator.pending(thing_name, "status") < 1:
+                time.sleep(0.01)
+            mqtt._on_publish(
+                f"/{thing_name}/status/response",
+                b'{"DeviceType": 1}',
+                None,
+                None,
+                None,
+            )
+            assert isinstance(future.result(), JciHitachiAWSStatus)
+
+            with pytest.raises(TimeoutError):
+                mqtt.request("", thing_name, "status", timeout=0.05)
+            assert mqtt._correlator.pending(thing_name, "status") == 0
+
+            # Responses with an unknown token resolve nothing.
+            future = mqtt._correlator.register(thing_name, "control", 1)
+            assert not mqtt._correlator.resolve(thing_name, "control", {}, 2)
+            assert not future.done()
+            assert mqtt._correlator.resolve(thing_name, "control", {}, 1)
+            assert future.done()
+
+            # Pooled publishes surface both missing responses and publish timeouts.
+            mqtt.publish("", thing_name, "status", timeout=0.05)
+            assert isinstance(mqtt.execute()[2][0], asyncio.TimeoutError)
+            mock_mqttc.publish.side_effect = lambda *args: (
+                concurrent.futures.Future(),
+                None,
+            )
+            mqtt.publish("", thing_name, "status", timeout=0.05)
+            assert isinstance(mqtt.execute()[2][0], asyncio.TimeoutError)
+        mqtt.disconnect()
+
+
+class TestJciHitachiAWSMessageQueue:
+    def test_put(self):
+        queue = JciHitachiAWSMessageQueue(maxsize=3, workers=2)
+        release = threading.Event()
+        processed = []
+
+        def process(key, value):
+            release.wait(5)
+            processed.append((key, value))
+
+        # Blocks both workers, so later messages stay queued.
+        queue.put("blocker_a", process, "blocker_a", 0)
+        queue.put("blocker_b", process, "blocker_b", 0)
+        while queue.depth:
+            time.sleep(0.01)
+
+        queue.put("thing_a", process, "thing_a", 1)
+        queue.put("thing_b", process, "thing_b", 1)
+        queue.put("thing_a", process, "thing_a", 2)
+        # Full: the oldest message of thing_a is dropped and the latest one wins.
+        queue.put("thing_a", process, "thing_a", 3)
+        assert queue.depth == 3
+        assert queue.dropped == 1
+
+        release.set()
+        assert queue.join(5)
+        assert queue.processed == 5
+        assert [v for k, v in processed if k == "thing_a"] == [2, 3]
+        assert ("thing_a", 1) not in processed
+
+        # Messages of another kind of the same thing are not dropped in favour of the latest one.
+        release.clear()
+        processed.clear()
+        queue.put("blocker_a", process, "blocker_a", 0)
+        queue.put("blocker_b", process, "blocker_b", 0)
+        while queue.depth:
+            time.sleep(0.01)
+        queue.put("thing_a", process, "thing_a", 1, drop_key=("thing_a", "control"))
+        queue.put("thing_a", process, "thing_a", 2, drop_key=("thing_a", "status"))
+        queue.put("thing_a", process, "thing_a", 3, drop_key=("thing_a", "status"))
+        queue.put("thing_a", process, "thing_a", 4, drop_key=("thing_a", "status"))
+        assert queue.dropped == 2
+
+        release.set()
+        assert queue.join(5)
+        assert [v for k, v in processed if k == "thing_a"] == [1, 3, 4]
+        queue.close()
+
+    def test_connection_queue(self, fixture_aws_mock_mqtt_connection):
+        mqtt = fixture_aws_mock_mqtt_connection
+        mqtt._mqtt_events.device_status_event["thing"] = threading.Event()
+        mqtt._queue_publish(
+            "/thing/status/response", b'{"DeviceType": 1}', None, None, None
+        )
+        assert mqtt._mqtt_events.device_status_event["thing"].wait(5)
+        assert mqtt.message_queue.processed == 1
+
+        mqtt = JciHitachiAWSMqttConnection(lambda: None, message_workers=0)
+        assert mqtt.message_queue is None
+
+
+class TestJciHitachiAWSRateLimiter:
+    def test_reserve(self):
+        limiter = JciHitachiAWSRateLimiter(
+            rate=10.0, burst=3, thing_rate=1.0, thing_burst=2
+        )
+        with patch("time.monotonic", return_value=100.0):
+            # Within the burst, publishes go out immediately.
+            assert limiter.reserve("thing_a", "identity_a") == 0
+            assert limiter.reserve("thing_b", "identity_a") == 0
+            # The thing bucket of thing_a is empty after its burst.
+            assert limiter.reserve("thing_a", "identity_a") == 0
+            assert limiter.reserve("thing_a", "identity_a") == pytest.approx(1.0)
+            # The account bucket is empty after its burst.
+            assert limiter.reserve("thing_c", "identity_a") == pytest.approx(0.2)
+            # Other accounts have their own buckets.
+            assert limiter.reserve("thing_d", "identity_b") == 0
+        with patch("time.monotonic", return_value=110.0):
+            # Buckets are refilled over time.
+            assert limiter.reserve("thing_a") == 0
+
+        unlimited = JciHitachiAWSRateLimiter()
+        assert all(unlimited.reserve("thing_a") == 0 for _ in range(100))
+
+        for kwargs in (
+            {"rate": 0},
+            {"thing_rate": -1.0},
+            {"global_rate": 0},
+            {"burst": 0},
+            {"global_burst": 0},
+        ):
+            with pytest.raises(ValueError):
+                JciHitachiAWSRateLimiter(**kwargs)
+
+    def test_reserve_global(self):
+        limiter = JciHitachiAWSRateLimiter(
+            rate=10.0, burst=2, global_rate=5.0, global_burst=3
+        )
+        with patch("time.monotonic", return_value=100.0):
+            # Every account is within its own burst, but they share the global one.
+            assert limiter.reserve("thing_a", "identity_a") == 0
+            assert limiter.reserve("thing_b", "identity_b") == 0
+            assert limiter.reserve("thing_c", "identity_c") == 0
+            assert limiter.reserve("thing_d", "identity_d") == pytest.approx(0.2)
+
+    def test_acquire(self):
+        limiter = JciHitachiAWSRateLimiter(burst=1, rate=100.0, thing_rate=None)
+
+        async def acquire():
+            start = time.monotonic()
+            await limiter.acquire()
+            await limiter.acquire()
+            return time.monotonic() - start
+
+        assert asyncio.run(acquire()) >= 0.009
+
+
+class TestJciHitachiSingleFlight:
+    @pytest.mark.parametrize("raise_exception", [False, True])
+    def test_do(self, raise_exception):
+        single_flight = JciHitachiSingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(None)
+            started.set()
+            release.wait(5)
+            if raise_exception:
+                raise RuntimeError("failed")
+            return "result"
+
+        def caller():
+            try:
+                return single_flight.do("key", fn)
+            except RuntimeError as e:
+                return e
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+            leader = executor.submit(caller)
+            assert started.wait(5)
+            assert single_flight.in_flight("key")
+            followers = [executor.submit(caller) for _ in range(9)]
+            # other keys are not blocked
+            assert single_flight.do("other_key", lambda: "other") == "other"
+            time.sleep(0.1)
+            release.set()
+            results = [leader.result()] + [f.result() for f in followers]
+
+        assert len(calls) == 1
+        assert not single_flight.in_flight("key")
+        if raise_exception:
+            assert all(isinstance(r, RuntimeError) for r in results)
+        else:
+            assert results == ["result"] * 10
+
+        # a new call is made once the previous one has finished
+        release.set()
+        single_flight.do("key", lambda: None)
+
+    def test_do_check(self):
+        single_flight = JciHitachiSingleFlight()
+        fn = MagicMock(return_value="called")
+        assert single_flight.do("key", fn, check=lambda: "done") == "done"
+        fn.assert_not_called()
+        assert single_flight.do("key", fn, check=lambda: None) == "called"
+        fn.assert_called_once()
+
+
+class TestAWSTokenStore:
+    @pytest.mark.parametrize("store_type", ["memory", "file"])
+    def test_save_load_clear(self, store_type, tmp_path, fixture_aws_tokens):
+        if store_type == "memory":
+            store = InMemoryAWSTokenStore()
+        else:
+            store = FileAWSTokenStore(str(tmp_path / "tokens.json"))
+        aws_identity = AWSIdentity("id", "host_id", "user", {"attr": "value"})
+
+        assert store.load("a@a.com") == (None, None)
+        store.save("a@a.com", fixture_aws_tokens, aws_identity)
+        store.save("b@b.com", fixture_aws_tokens, None)
+        assert store.load("a@a.com") == (fixture_aws_tokens, aws_identity)
+        assert store.load("b@b.com") == (fixture_aws_tokens, None)
+
+        store.clear("a@a.com")
+        assert store.load("a@a.com") == (None, None)
+        assert store.load("b@b.com") == (fixture_aws_tokens, None)
+
+    def test_file_store_invalid_file(self, tmp_path):
+        path = tmp_path / "tokens.json"
+        path.write_text("not json")
+        store = FileAWSTokenStore(str(path))
+        assert store.load("a@a.com") == (None, None)
+
+        path.write_text('{"a@a.com": {"aws_tokens": {"unknown": 1}}}')
+        assert store.load("a@a.com") == (None, None)
+
+
+class TestJciHitachiAWSTokenManager:
+    def test_renew(self, fixture_aws_tokens):
+        renewed_tokens = AWSTokens("a", "b", "refresh_token", time.time() + 3600)
+        on_renewed = MagicMock()
+        manager = JciHitachiAWSTokenManager(
+            "abc@abc.com", "password", fixture_aws_tokens, on_renewed=on_renewed
+        )
+        with patch.object(JciHitachiAWSCognitoConnection, "login") as mock_login:
+            # refresh token accepted
+            mock_login.return_value = ("OK", renewed_tokens)
+            assert manager.renew() == renewed_tokens
+            mock_login.assert_called_once_with(use_refresh_token=True)
+            on_renewed.assert_called_once_with(renewed_tokens)
+
+            # refresh token rejected, fall back to password
+            mock_login.reset_mock()
+            mock_login.side_effect = [
+                ("NotAuthorizedException Invalid Refresh Token", None),
+                ("OK", fixture_aws_tokens),
+            ]
+            assert manager.renew() == fixture_aws_tokens
+            assert mock_login.call_args_list[1].kwargs == {"use_refresh_token": False}
+
+            # both rejected
+            mock_login.side_effect = None
+            mock_login.return_value = ("NotAuthorizedException", None)
+            with pytest.raises(
+                RuntimeError,
+                match="An error occurred when reauthenticating with AWS Cognito Service",
+            ):
+                manager.renew()
+            assert manager.aws_tokens == fixture_aws_tokens
+
+            # Transient failures of the refresh token do not fall back to password.
+            for conn_status in (
+                "TooManyRequestsException",
+                "HTTP exception 503",
+                "ConnectError",
+            ):
+                mock_login.reset_mock()
+                mock_login.return_value = (conn_status, None)
+                with pytest.raises(RuntimeError, match=conn_status):
+                    manager.renew()
+                mock_login.assert_called_once_with(use_refresh_token=True)
+
+    def test_ensure_valid(self, fixture_aws_tokens):
+        manager = JciHitachiAWSTokenManager(
+            "abc@abc.com", "password", fixture_aws_tokens
+        )
+        with patch.object(manager, "_renew") as mock_renew:
+            assert manager.ensure_valid() == fixture_aws_tokens
+            mock_renew.assert_not_called()
+
+            manager.aws_tokens = AWSTokens("", "", "", time.time() + 100)
+            manager.ensure_valid()
+            mock_renew.assert_called_once()
+
+            # The background renewal is expected to handle it.
+            mock_renew.reset_mock()
+            manager._running = True
+            manager.ensure_valid()
+            mock_renew.assert_not_called()
+            manager._running = False
+
+            # Tokens renewed by a call finishing just before are not renewed again.
+            mock_renew.reset_mock()
+            stale = AWSTokens("", "", "", time.time() + 100)
+            manager.aws_tokens = stale
+            with patch.object(
+                manager,
+                "needs_renewal",
+                side_effect=[True, False],
+            ):
+                assert manager.ensure_valid() is stale
+            mock_renew.assert_not_called()
+
+    def test_background_renewal(self, fixture_aws_tokens):
+        renewed = threading.Event()
+        manager = JciHitachiAWSTokenManager(
+            "abc@abc.com",
+            "password",
+            AWSTokens("", "", "", time.time() + 300),
+            on_renewed=lambda aws_tokens: renewed.set(),
+        )
+        with patch.object(JciHitachiAWSCognitoConnection, "login") as mock_login:
+            mock_login.return_value = ("OK", fixture_aws_tokens)
+            manager.start()
+            assert manager.running
+            assert renewed.wait(5)
+            assert manager.aws_tokens == fixture_aws_tokens
+            # rescheduled according to the new expiration
+            assert manager._timer.interval > 3000
+            manager.stop()
+            assert not manager.running
+            assert manager._timer is None
+
+            # No timer is scheduled once stopped.
+            manager.aws_tokens = fixture_aws_tokens
+            manager._background_renew()
+            assert manager._timer is None
+
+
+class TestJciHitachiAWSCredentialsCache:
+    @staticmethod
+    def make_credentials(expires_in):
+        return awscrt.auth.AwsCredentials(
+            access_key_id="acc",
+            secret_access_key="sec",
+            session_token="ses",
+            expiration=datetime.datetime.fromtimestamp(time.time() + expires_in),
+        )
+
+    def test_get(self):
+        aws_identity = AWSIdentity("id", "host_id", "user", {})
+        fetch = MagicMock(return_value=self.make_credentials(3600))
+        cache = JciHitachiAWSCredentialsCache(fetch)
+
+        credentials = cache.get(aws_identity)
+        assert cache.get(aws_identity) is credentials
+        assert fetch.call_count == 1
+
+        # other identities are cached separately
+        cache.get(AWSIdentity("id2", "host_id", "user", {}))
+        assert fetch.call_count == 2
+
+        # expiring credentials are fetched synchronously
+        fetch.return_value = self.make_credentials(30)
+        cache.invalidate("id")
+        cache.get(aws_identity)
+        assert fetch.call_count == 3
+        cache.get(aws_identity)
+        assert fetch.call_count == 4
+
+        # failed fetches are not cached
+        fetch.return_value = None
+        cache.invalidate()
+        assert cache.get(aws_identity) is None
+
+    def test_prefetch(self):
+        aws_identity = AWSIdentity("id", "host_id", "user", {})
+        prefetched = threading.Event()
+        expiring_credentials = self.make_credentials(200)
+        new_credentials = self.make_credentials(3600)
+
+        def fetch(identity):
+            if fetch.calls:
+                prefetched.set()
+                return new_credentials
+            fetch.calls += 1
+            return expiring_credentials
+
+        fetch.calls = 0
+        cache = JciHitachiAWSCredentialsCache(fetch)
+
+        assert cache.get(aws_identity) is expiring_credentials
+        # still valid, returned while the next one is prefetched
+        assert cache.get(aws_identity) is expiring_credentials
+        assert prefetched.wait(5)
+        for _ in range(50):
+            if cache.get(aws_identity) is new_credentials:
+                break
+            time.sleep(0.01)
+        assert cache.get(aws_identity) is new_credentials
+
+    def test_scheduled_prefetch(self):
+        aws_identity = AWSIdentity("id", "host_id", "user", {})
+        new_credentials = self.make_credentials(3600)
+        fetch = MagicMock(side_effect=[self.make_credentials(301), new_credentials])
+        cache = JciHitachiAWSCredentialsCache(fetch, prefetch_before=300)
+
+        cache.get(aws_identity)
+        # Fetched by the timer without anyone asking for credentials.
+        for _ in range(300):
+            if fetch.call_count == 2:
+                break
+            time.sleep(0.01)
+        assert fetch.call_count == 2
+        assert cache.get(aws_identity) is new_credentials
+        assert fetch.call_count == 2
+
+        cache.close()
+        assert cache._timers == {}
+
+
+class TestJciHitachiAWSHttpSession:
+    def test_get_client(self):
+        session = JciHitachiAWSHttpSession(max_connections=2, timeout=5.0)
+        client = session.get_client(AWS_IOT_ENDPOINT)
+        assert client is session.get_client(AWS_IOT_ENDPOINT)
+        assert client is not session.get_client(AWS_COGNITO_ENDPOINT)
+        assert str(client.base_url) == f"https://{AWS_IOT_ENDPOINT}"
+        assert client.timeout.read == 5.0
+
+        session.close()
+        assert client.is_closed
+        assert session.get_client(AWS_IOT_ENDPOINT) is not client
+        session.close()
+
+    def test_send_with_session(self, fixture_aws_tokens):
+        session = JciHitachiAWSHttpSession()
+        c = GetAllDevice(fixture_aws_tokens, session=session)
+        response_json = {"status": {"code": 0}}
+        with (
+            patch("httpx.post") as mock_post,
+            patch.object(
+                session.get_client(AWS_IOT_ENDPOINT), "post"
+            ) as mock_client_post,
+        ):
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = response_json
+            mock_client_post.return_value = response
+
+            assert c.get_data() == ("OK", response_json)
+            mock_post.assert_not_called()
+            mock_client_post.assert_called_once()
+            assert mock_client_post.call_args.args[0] == "/GetAllDevice"
+        session.close()
+
+
+class TestJciHitachiAWSRetryPolicy:
+    @staticmethod
+    def _response(status_code, response_json=None):
+        response = MagicMock()
+        response.status_code = status_code
+        response.json.return_value = response_json or {"status": {"code": 0}}
+        return response
+
+    def test_retry(self, fixture_aws_tokens):
+        policy = JciHitachiAWSRetryPolicy(max_retries=2, backoff_base=0)
+        c = GetAllDevice(fixture_aws_tokens, retry_policy=policy)
+        with patch("httpx.post") as mock_post:
+            mock_post.side_effect = [
+                httpx.ConnectError("error"),
+                self._response(503),
+                self._response(200),
+            ]
+            assert c.get_data() == ("OK", {"status": {"code": 0}})
+            assert mock_post.call_count == 3
+
+            mock_post.reset_mock()
+            mock_post.side_effect = [self._response(503)] * 3
+            assert c.get_data()[0] == "HTTP exception 503"
+            assert mock_post.call_count == 3
+
+            mock_post.reset_mock()
+            mock_post.side_effect = [self._response(400)]
+            assert c.get_data()[0] == "HTTP exception 400"
+            assert mock_post.call_count == 1
+
+    def test_no_retry_after_sent(self):
+        policy = JciHitachiAWSRetryPolicy(max_retries=2, backoff_base=0)
+        c = ChangePassword(
+            "abc@abc.com",
+            "password",
+            aws_tokens=AWSTokens("", "", "", time.time() + 3600),
+            retry_policy=policy,
+        )
+        with patch("httpx.post") as mock_post:
+            # The host may have acted on a request which timed out while reading.
+            mock_post.side_effect = httpx.ReadTimeout("timeout")
+            with pytest.raises(httpx.ReadTimeout):
+                c.get_data("new_password")
+            assert mock_post.call_count == 1
+
+            # Non-idempotent requests are not retried on server errors.
+            mock_post.reset_mock()
+            mock_post.side_effect = [
+                httpx.ConnectError("error"),
+                self._response(
+                    500, {"__type": "InternalErrorException", "message": ""}
+                ),
+            ]
+            assert c.get_data("new_password")[0] == "InternalErrorException "
+            assert mock_post.call_count == 2
+
+    def test_circuit_breaker(self, fixture_aws_tokens):
+        policy = JciHitachiAWSRetryPolicy(
+            max_retries=2, backoff_base=0, failure_threshold=2, reset_timeout=30.0
+        )
+        c = GetAllDevice(fixture_aws_tokens, retry_policy=policy)
+        with patch("httpx.post") as mock_post:
+            mock_post.side_effect = httpx.ConnectError("error")
+            # Failed requests are counted, not attempts.
+            with pytest.raises(httpx.ConnectError):
+                c.get_data()
+            assert mock_post.call_count == 3
+            assert not policy.is_open(AWS_IOT_ENDPOINT)
+            with pytest.raises(httpx.ConnectError):
+                c.get_data()
+            assert mock_post.call_count == 6
+            assert policy.is_open(AWS_IOT_ENDPOINT)
+
+            mock_post.reset_mock()
+            with pytest.raises(JciHitachiAWSCircuitOpenError):
+                c.get_data()
+            mock_post.assert_not_called()
+
+            # Half-open after reset_timeout, a successful trial closes the circuit.
+            policy.reset_timeout = 0
+            mock_post.side_effect = [self._response(200)]
+            assert c.get_data()[0] == "OK"
+            assert not policy.is_open(AWS_IOT_ENDPOINT)
+
+    def test_token_refresh_and_replay(self, fixture_aws_tokens):
+        new_tokens = AWSTokens(
+            "new_access_token", "new_id_token", "new_refresh_token", time.time() + 3600
+        )
+        token_refresher = MagicMock(return_value=new_tokens)
+        c = GetAllDevice(
+            fixture_aws_tokens,
+            retry_policy=JciHitachiAWSRetryPolicy(),
+            token_refresher=token_refresher,
+        )
+        with patch("httpx.post") as mock_post:
+            mock_post.side_effect = [
+                self._response(200, {"status": {"code": 12}}),
+                self._response(200),
+            ]
+            assert c.get_data()[0] == "OK"
+            token_refresher.assert_called_once()
+            assert (
+                mock_post.call_args.kwargs["headers"]["authorization"]
+                == "Bearer new_id_token"
+            )
+
+            # Replayed only once.
+            mock_post.side_effect = [self._response(401)] * 2
+            assert c.get_data()[0] == "HTTP exception 401"
+            assert token_refresher.call_count == 2
+
+        # Replayed without a retry policy as well.
+        token_refresher.reset_mock()
+        c = GetAllDevice(fixture_aws_tokens, token_refresher=token_refresher)
+        with patch("httpx.post") as mock_post:
+            mock_post.side_effect = [self._response(401), self._response(200)]
+            assert c.get_data()[0] == "OK"
+            token_refresher.assert_called_once()
+            assert mock_post.call_count == 2
+
+        token_refresher.reset_mock()
+        c = AsyncGetAllDevice(fixture_aws_tokens, token_refresher=token_refresher)
+        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+            mock_post.side_effect = [
+                self._response(200, {"status": {"code": 12}}),
+                self._response(200),
+            ]
+            assert asyncio.run(c.get_data())[0] == "OK"
+            token_refresher.assert_called_once()
+            assert mock_post.call_count == 2
+
+    def test_async_retry(self, fixture_aws_tokens):
+        policy = JciHitachiAWSRetryPolicy(max_retries=1, backoff_base=0)
+        c = AsyncGetAllDevice(fixture_aws_tokens, retry_policy=policy)
+        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+            mock_post.side_effect = [self._response(502), self._response(200)]
+            assert asyncio.run(c.get_data())[0] == "OK"
+            assert mock_post.call_count == 2
+
+
+class TestGetHistoryEventByUser:
+    @staticmethod
+    def _get_data(time_start, time_end):
+        # One event per 10 ms, returned out of order.
+        events = [
+            {"Timestamp": t} for t in range(-(-time_start // 10) * 10, time_end, 10)
+        ]
+        return "OK", {"results": {"Data": events[::-1]}}
+
+    def test_iter_events(self, fixture_aws_tokens):
+        c = GetHistoryEventByUser(fixture_aws_tokens)
+        with patch.object(c, "get_data", side_effect=self._get_data) as mock_get_data:
+            events = list(c.iter_events(0, 100, window=25, max_concurrency=2))
+            assert [e["Timestamp"] for e in events] == list(range(0, 100, 10))
+            assert mock_get_data.call_count == 4
+
+            events = list(c.iter_events(0, 100, window=25, checkpoint=50))
+            assert [e["Timestamp"] for e in events] == [60, 70, 80, 90]
+
+            mock_get_data.side_effect = [("Not OK", {})] * 4
+            with pytest.raises(
+                RuntimeError,
+                match="An error occurred when getting history events: Not OK",
+            ):
+                list(c.iter_events(0, 100, window=25))
+
+    def test_async_iter_events(self, fixture_aws_tokens):
+        c = AsyncGetHistoryEventByUser(fixture_aws_tokens)
+
+        async def get_data(time_start, time_end):
+            await asyncio.sleep(0.001 * (time_end - time_start))
+            return self._get_data(time_start, time_end)
+
+        async def collect():
+            return [
+                e["Timestamp"]
+                async for e in c.iter_events(
+                    0, 100, window=30, max_concurrency=3, checkpoint=20
+                )
+            ]
+
+        with patch.object(c, "get_data", side_effect=get_data):
+            assert asyncio.run(collect()) == list(range(30, 100, 10))
+
 
 class TestJciHitachiAWSCognitoConnection:
     # (class name, get data args, header_target, response json, response type)
@@ -515,3 +1587,98 @@ class TestJciHitachiIoTConnection:
                             f"HTTP exception {http_status_code}",
                             response_json,
                         )
+
+
+class TestAsyncJciHitachiAWSCognitoConnection:
+    # (class name, get data args, header_target, response json, response type)
+    classes_to_test = [
+        (AsyncChangePassword,)
+        + TestJciHitachiAWSCognitoConnection.classes_to_test[1][1:],
+        (AsyncGetUser,) + TestJciHitachiAWSCognitoConnection.classes_to_test[2][1:],
+        (AsyncGetCredentials,)
+        + TestJciHitachiAWSCognitoConnection.classes_to_test[3][1:],
+    ]
+
+    @pytest.mark.parametrize("test_class", classes_to_test)
+    def test_get_data(self, test_class):
+        (
+            test_class,
+            get_data_args,
+            header_target,
+            response_json,
+            response_type,
+        ) = test_class
+        c = test_class("abc@abc.com", "password", print_response=True)
+
+        def mock_post_func(endpoint, headers=None, json=None, **kwargs):
+            if headers["X-Amz-Target"] == header_target and isinstance(
+                c, AsyncGetCredentials
+            ):
+                assert endpoint == f"https://{AWS_COGNITO_ENDPOINT}/"
+            response = MagicMock()
+            response.headers = ""
+            response.status_code = 200
+            if headers["X-Amz-Target"] == header_target:
+                response.json.return_value = response_json
+            else:
+                response.json.return_value = (
+                    TestJciHitachiAWSCognitoConnection.login_response_json
+                )
+            return response
+
+        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+            mock_post.side_effect = mock_post_func
+            response_msg, response = asyncio.run(c.get_data(**get_data_args))
+
+            # The first request logs in lazily.
+            assert mock_post.call_count == 2
+            assert c.aws_tokens.access_token == "abc"
+            assert response_msg == "OK"
+            assert isinstance(response, response_type)
+
+    def test_login_failure(self):
+        c = AsyncGetUser("abc@abc.com", "password")
+        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+            response = MagicMock()
+            response.status_code = 400
+            response.json.return_value = (
+                TestJciHitachiAWSCognitoConnection.error_response_json
+            )
+            mock_post.return_value = response
+            with pytest.raises(
+                RuntimeError,
+                match="An error occurred when signing into AWS Cognito Service",
+            ):
+                asyncio.run(c.get_data())
+
+
+class TestAsyncJciHitachiIoTConnection:
+    # (class name, get data args)
+    classes_to_test = [
+        (AsyncGetAllDevice, {}),
+        (AsyncGetAllGroup, {}),
+        (AsyncGetAllRegion, {}),
+        (
+            AsyncGetAvailableAggregationMonthlyData,
+            {"thing_name": "", "time_start": "", "time_end": ""},
+        ),
+        (AsyncGetHistoryEventByUser, {"time_start": "", "time_end": ""}),
+        (AsyncListSubUser, {}),
+    ]
+
+    @pytest.mark.parametrize("test_class", classes_to_test)
+    def test_get_data(self, test_class, fixture_aws_tokens):
+        test_class, get_data_args = test_class
+        c = test_class(fixture_aws_tokens)
+        api_name = test_class.__name__.removeprefix("Async")
+        response_json = {"status": {"code": 0}}
+        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = response_json
+            mock_post.return_value = response
+
+            assert asyncio.run(c.get_data(**get_data_args)) == ("OK", response_json)
+            assert (
+                mock_post.call_args.args[0] == f"https://{AWS_IOT_ENDPOINT}/{api_name}"
+            )